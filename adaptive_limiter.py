@@ -0,0 +1,302 @@
+# adaptive_limiter.py
+# Adaptive concurrency limiting and rate-limit aware retries for the HTTP
+# clients built by llm_factory. Like the Ollama balancer it is an httpx
+# transport, so it covers LLM and embedding calls of both backends:
+#
+# - an AIMD concurrency limit: +1/limit per successful request, halved when
+#   the backend signals overload (429, 503, timeouts)
+# - optional token-bucket request rates per model (LLM_RATE_LIMITS)
+# - 429/503 responses are retried after the server's Retry-After /
+#   retry-after-ms hint, or after exponential backoff with full jitter
+# - queue wait times and throttling counters for monitoring
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+# Same helpers as the balancer: model sniffing and release-on-close streams
+from ollama_balancer import _AsyncReleasingStream, _ReleasingStream, _request_model
+
+DEFAULT_INITIAL_LIMIT = float(os.getenv("LLM_LIMIT_INITIAL", "8"))
+DEFAULT_MIN_LIMIT = float(os.getenv("LLM_LIMIT_MIN", "1"))
+DEFAULT_MAX_LIMIT = float(os.getenv("LLM_LIMIT_MAX", "64"))
+DEFAULT_MAX_RETRIES = int(os.getenv("LLM_LIMIT_MAX_RETRIES", "4"))
+RETRY_STATUSES = (429, 503)
+
+
+def parse_rate_limits(spec: str) -> dict[str, float]:
+    """Parse "model=requests_per_second,..." (the LLM_RATE_LIMITS format)."""
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, rate = item.rsplit("=", 1)
+            limits[model.strip()] = float(rate)
+    return limits
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait according to retry-after-ms or Retry-After, if present."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    throttled: int = 0  # 429/503 responses
+    retries: int = 0
+    timeouts: int = 0
+    waits: deque = field(default_factory=lambda: deque(maxlen=2000))
+
+    def wait_percentile(self, pct: float) -> float:
+        if not self.waits:
+            return 0.0
+        ordered = sorted(self.waits)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def __str__(self) -> str:
+        return (f"requests={self.requests} throttled={self.throttled} "
+                f"retries={self.retries} timeouts={self.timeouts} "
+                f"queue_wait_p50={self.wait_percentile(50) * 1000:.1f}ms "
+                f"queue_wait_p99={self.wait_percentile(99) * 1000:.1f}ms")
+
+
+class TokenBucket:
+    """Classic token bucket; reserve() returns how long the caller must wait."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit shared by sync threads and asyncio tasks."""
+
+    def __init__(self, initial_limit: float = DEFAULT_INITIAL_LIMIT,
+                 min_limit: float = DEFAULT_MIN_LIMIT, max_limit: float = DEFAULT_MAX_LIMIT,
+                 rate_limits: Optional[dict[str, float]] = None):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.stats = LimiterStats()
+        self.buckets = {model: TokenBucket(rate)
+                        for model, rate in (rate_limits or {}).items()}
+        self._lock = threading.Lock()
+        self._waiters = deque()  # wake-up callables, FIFO
+        self._last_decrease = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < max(1, int(self.limit)) and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self) -> float:
+        """Block until a permit is free; returns the time it was granted."""
+        start = time.monotonic()
+        with self._lock:
+            if self._try_acquire():
+                self.stats.waits.append(0.0)
+                return start
+            event = threading.Event()
+            self._waiters.append(event.set)
+        event.wait()
+        granted = time.monotonic()
+        self.stats.waits.append(granted - start)
+        return granted
+
+    async def aacquire(self) -> float:
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                self.stats.waits.append(0.0)
+                return start
+            future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(
+                    lambda: future.done() or future.set_result(None))
+
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if wake in self._waiters:
+                    self._waiters.remove(wake)
+                else:
+                    # The permit was handed over before the cancellation landed
+                    self.in_flight -= 1
+                    self._hand_off()
+            raise
+        granted = time.monotonic()
+        self.stats.waits.append(granted - start)
+        return granted
+
+    def release(self, granted: float, overloaded: bool = False) -> None:
+        """Return a permit; granted is the value acquire() returned."""
+        with self._lock:
+            if overloaded:
+                # Requests sent before the last decrease saw the old limit, so
+                # like TCP only decrease once per round of in-flight requests
+                if granted > self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.in_flight -= 1
+            self._hand_off()
+
+    def _hand_off(self) -> None:
+        """Hand freed permits straight to waiters, in arrival order (lock held)."""
+        while self._waiters and self.in_flight < max(1, int(self.limit)):
+            waiter = self._waiters.popleft()
+            try:
+                waiter()
+            except RuntimeError:
+                continue  # the waiter's event loop is closed
+            self.in_flight += 1
+
+    def set_rate_limit(self, model: str, rate: float) -> None:
+        with self._lock:
+            bucket = self.buckets.get(model)
+            if bucket is None or bucket.rate != rate:
+                self.buckets[model] = TokenBucket(rate)
+
+    def rate_delay(self, model: Optional[str]) -> float:
+        bucket = self.buckets.get(model) if model else None
+        return bucket.reserve() if bucket else 0.0
+
+    def backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        hint = retry_after(response) if response is not None else None
+        if hint is not None:
+            return hint + random.uniform(0, 0.1 * max(hint, 0.1))
+        return random.uniform(0, min(30.0, 0.25 * 2 ** attempt))
+
+
+class LimitingTransport(httpx.BaseTransport):
+    """Sync httpx transport that applies an AdaptiveLimiter to every request."""
+
+    def __init__(self, limiter: AdaptiveLimiter, transport: httpx.BaseTransport,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter
+        delay = limiter.rate_delay(_request_model(request))
+        if delay:
+            time.sleep(delay)
+        for attempt in range(self.max_retries + 1):
+            granted = limiter.acquire()
+            limiter.stats.requests += 1
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TimeoutException:
+                limiter.stats.timeouts += 1
+                limiter.release(granted, overloaded=True)
+                raise
+            except BaseException:
+                limiter.release(granted)
+                raise
+            if response.status_code in RETRY_STATUSES:
+                limiter.stats.throttled += 1
+                limiter.release(granted, overloaded=True)
+                if attempt < self.max_retries:
+                    response.read()
+                    response.close()
+                    limiter.stats.retries += 1
+                    time.sleep(limiter.backoff(attempt, response))
+                    continue
+                return response
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=_ReleasingStream(response.stream,
+                                        lambda g=granted: limiter.release(g)),
+                extensions=response.extensions)
+        raise AssertionError("unreachable")
+
+
+class AsyncLimitingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of LimitingTransport."""
+
+    def __init__(self, limiter: AdaptiveLimiter, transport: httpx.AsyncBaseTransport,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter
+        delay = limiter.rate_delay(_request_model(request))
+        if delay:
+            await asyncio.sleep(delay)
+        for attempt in range(self.max_retries + 1):
+            granted = await limiter.aacquire()
+            limiter.stats.requests += 1
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TimeoutException:
+                limiter.stats.timeouts += 1
+                limiter.release(granted, overloaded=True)
+                raise
+            except BaseException:
+                limiter.release(granted)
+                raise
+            if response.status_code in RETRY_STATUSES:
+                limiter.stats.throttled += 1
+                limiter.release(granted, overloaded=True)
+                if attempt < self.max_retries:
+                    await response.aread()
+                    await response.aclose()
+                    limiter.stats.retries += 1
+                    await asyncio.sleep(limiter.backoff(attempt, response))
+                    continue
+                return response
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=_AsyncReleasingStream(response.stream,
+                                             lambda g=granted: limiter.release(g)),
+                extensions=response.extensions)
+        raise AssertionError("unreachable")
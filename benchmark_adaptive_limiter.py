@@ -0,0 +1,73 @@
+# benchmark_adaptive_limiter.py
+# Floods a capacity-limited stand-in Ollama server (429 + retry-after-ms once
+# too many requests are in flight, latency growing with load) with concurrent
+# chat requests, with and without the adaptive limiter. Prints failures,
+# latency percentiles, the limit the AIMD loop settled on and queue wait times.
+import argparse
+import asyncio
+import time
+
+from llama_index.core.llms import ChatMessage
+
+import llm_factory
+from benchmark_utils import percentile
+from llm_factory import LLMType, get_llm
+from ollama_standin import start_standin_server
+
+
+async def fire(llm, requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await llm.achat([ChatMessage(role="user", content=f"question {i}")])
+            except Exception:  # pylint: disable=broad-exception-caught
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, failures, time.perf_counter() - start
+
+
+def report(name: str, latencies: list[float], failures: int, elapsed: float) -> None:
+    print(f"{name:<10} ok={len(latencies):4d} failed={failures:4d} "
+          f"{len(latencies) / elapsed:7.1f} req/s  "
+          f"p50={percentile(latencies, 50) * 1000:6.1f}ms  "
+          f"p99={percentile(latencies, 99) * 1000:6.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="AIMD concurrency limiting against an overloaded stand-in Ollama server")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--capacity", type=int, default=12,
+                        help="requests the stand-in serves at once before answering 429")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="stand-in service time per request in flight")
+    args = parser.parse_args()
+
+    server, base_url = start_standin_server(latency=args.latency, capacity=args.capacity)
+    try:
+        plain = get_llm(LLMType.OLLAMA, base_url=base_url)
+        report("no limit", *asyncio.run(fire(plain, args.requests, args.concurrency)))
+        rejected = server.state.rejected
+
+        limited = get_llm(LLMType.OLLAMA, base_url=base_url, limit=True)
+        report("adaptive", *asyncio.run(fire(limited, args.requests, args.concurrency)))
+        limiter = llm_factory._get_limiter((base_url,), {"limit": True})  # pylint: disable=protected-access
+        print(f"  server 429s: no limit={rejected} adaptive={server.state.rejected - rejected}")
+        print(f"  settled limit={limiter.limit:.1f}  {limiter.stats}")
+    finally:
+        llm_factory.close_all()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
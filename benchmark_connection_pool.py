@@ -0,0 +1,60 @@
+# benchmark_connection_pool.py
+# Compares per-request latency of building a fresh Ollama client for every
+# request (the old llm_factory behaviour) against the memoized, pooled
+# instances now returned by llm_factory.get_llm(), using a local stand-in
+# Ollama server so that only client-side overhead is measured.
+import argparse
+import statistics
+import time
+
+from llama_index.core.llms import ChatMessage
+from llama_index.llms.ollama import Ollama
+
+import llm_factory
+from benchmark_utils import percentile
+from llm_factory import LLMType, get_llm
+from ollama_standin import start_standin_server
+
+
+def run(label: str, make_llm, requests: int) -> list[float]:
+    messages = [ChatMessage(role="user", content="Who is Byte?")]
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        make_llm().chat(messages)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<24} mean {statistics.mean(latencies):7.3f} ms   "
+          f"p50 {percentile(latencies, 50):7.3f} ms   "
+          f"p99 {percentile(latencies, 99):7.3f} ms")
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-request latency with and without the shared pool")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    server, base_url = start_standin_server()
+    try:
+        model = llm_factory.DEFAULTS["ollama_model"]
+
+        connections_before = server.state.connections
+        run("fresh client / request",
+            lambda: Ollama(model=model, base_url=base_url), args.requests)
+        fresh_connections = server.state.connections - connections_before
+
+        connections_before = server.state.connections
+        run("pooled get_llm()",
+            lambda: get_llm(LLMType.OLLAMA, base_url=base_url), args.requests)
+        pooled_connections = server.state.connections - connections_before
+
+        print(f"TCP connections opened: fresh={fresh_connections} "
+              f"pooled={pooled_connections}")
+    finally:
+        llm_factory.close_all()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
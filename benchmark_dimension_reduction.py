@@ -0,0 +1,89 @@
+# benchmark_dimension_reduction.py
+# Memory, query latency and recall@k of PCA-reduced embeddings
+# (dimension_reduction.PCAProjection, fitted on PCA_SAMPLE vectors as when an
+# index is built) against full-size ones in a NumpyVectorStore. The reference
+# is the exact top k at full size. Vectors are synthetic at nomic-embed-text's
+# 768 dimensions, with a decaying variance spectrum over a 256-dimension latent
+# space; pass --vectors with the .npy of a persisted index
+# (default__vector_store.npy) to measure real embeddings instead. OpenAI's
+# native shortening needs the API and is not measured here.
+#
+#   python benchmark_dimension_reduction.py --nodes 50000 --dims 384 256 128 64
+import argparse
+import time
+
+import numpy as np
+from llama_index.core.schema import TextNode
+
+from benchmark_utils import percentile
+from dimension_reduction import PCA_SAMPLE, PCAProjection
+from numpy_vector_store import NumpyVectorStore, normalize_rows
+
+
+def synthetic_vectors(nodes: int, dim: int, latent: int = 256, clusters: int = 512) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    projection = rng.standard_normal((latent, dim)).astype(np.float32)
+    # Real embeddings put most of their variance in a few directions
+    scales = (np.arange(1, latent + 1) ** -0.5).astype(np.float32)
+    centers = rng.standard_normal((clusters, latent)).astype(np.float32)
+    points = centers[rng.integers(0, clusters, nodes)] + 0.5 * rng.standard_normal(
+        (nodes, latent), dtype=np.float32)
+    noise = 0.02 * rng.standard_normal((nodes, dim), dtype=np.float32)
+    return normalize_rows((points * scales) @ projection + noise)
+
+
+def run_case(vectors: np.ndarray, query_vectors: np.ndarray, exact: np.ndarray, k: int) -> dict:
+    store = NumpyVectorStore()
+    for first in range(0, len(vectors), 10_000):
+        store.add([TextNode(id_=str(first + i), text="", embedding=vector.tolist())
+                   for i, vector in enumerate(vectors[first:first + 10_000])])
+    latencies, recalls = [], []
+    for query, truth in zip(query_vectors, exact):
+        start = time.perf_counter()
+        ids = store.query_many([query], k)[0].ids
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({int(i) for i in ids} & set(truth.tolist())) / k)
+    return {"recall": float(np.mean(recalls)), "p50_ms": percentile(latencies, 50) * 1000,
+            "matrix_mb": vectors.shape[0] * vectors.shape[1] * 4 / 2**20}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PCA-reduced vs full-size embeddings")
+    parser.add_argument("--nodes", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--dims", type=int, nargs="+", default=[384, 256, 128, 64])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--vectors", help=".npy of real embeddings (overrides --nodes/--dim)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    vectors = (normalize_rows(np.load(args.vectors)) if args.vectors
+               else synthetic_vectors(args.nodes, args.dim))
+    picks = vectors[rng.integers(0, len(vectors), args.queries)]
+    query_vectors = normalize_rows(picks + 0.02 * rng.standard_normal(picks.shape,
+                                                                      dtype=np.float32))
+    exact = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :args.top_k]
+    sample = vectors[rng.choice(len(vectors), min(PCA_SAMPLE, len(vectors)), replace=False)]
+
+    print(f"{len(vectors)} nodes, dim={vectors.shape[1]}, recall@{args.top_k}, "
+          f"PCA fitted on {len(sample)}")
+    print(f"{'dims':>5} {'recall':>7} {'p50 ms':>8} {'matrix MB':>10} {'variance':>9} {'fit s':>6}")
+    r = run_case(vectors, query_vectors, exact, args.top_k)
+    print(f"{vectors.shape[1]:>5} {r['recall']:>7.3f} {r['p50_ms']:>8.2f} {r['matrix_mb']:>10.1f} "
+          f"{1.0:>9.3f} {'-':>6}")
+    for dimensions in args.dims:
+        if dimensions >= vectors.shape[1]:
+            print(f"{dimensions:>5} {'skipped (not below the full size)':>44}")
+            continue
+        start = time.perf_counter()
+        projection = PCAProjection.fit(sample, dimensions)
+        fit = time.perf_counter() - start
+        r = run_case(projection.transform(vectors), projection.transform(query_vectors), exact,
+                     args.top_k)
+        print(f"{dimensions:>5} {r['recall']:>7.3f} {r['p50_ms']:>8.2f} {r['matrix_mb']:>10.1f} "
+              f"{projection.explained:>9.3f} {fit:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmark_embedding_batching.py
+# Fires many concurrent aget_query_embedding() calls at a stand-in Ollama
+# server (with simulated per-request latency) and compares one HTTP request
+# per call against the micro-batching dispatcher from embedding_batcher.py.
+import argparse
+import asyncio
+import time
+
+import llm_factory
+from llm_factory import LLMType, get_embedding_model
+from ollama_standin import start_standin_server
+
+
+async def fire(embed_model, concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(embed_model.aget_query_embedding(f"question {i}")
+                           for i in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Concurrent embedding throughput with and without micro-batching")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, base_url = start_standin_server(latency=args.latency_ms / 1000.0)
+    try:
+        plain = get_embedding_model(LLMType.OLLAMA, base_url=base_url)
+        batched = get_embedding_model(LLMType.OLLAMA, base_url=base_url, batch=True,
+                                      batch_max_size=args.max_batch_size,
+                                      batch_max_wait_ms=args.max_wait_ms)
+        for label, embed_model in (("one request per call", plain),
+                                   ("micro-batched", batched)):
+            requests_before = server.state.requests
+            elapsed = asyncio.run(fire(embed_model, args.concurrency))
+            print(f"{label:<22} {elapsed * 1000:8.1f} ms  "
+                  f"{args.concurrency / elapsed:8.1f} embeddings/s  "
+                  f"HTTP requests={server.state.requests - requests_before}")
+        print(f"batch stats: {batched.stats}")
+    finally:
+        llm_factory.close_all()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
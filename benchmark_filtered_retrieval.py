@@ -0,0 +1,137 @@
+# benchmark_filtered_retrieval.py
+# Latency and recall@k of filtered vector search over a persisted
+# NumpyVectorStore with metadata shaped like SectionMetadata's (file name,
+# folder, extension, mtime), for filters from very selective (one file) to
+# unselective (one file type):
+#   post    - unfiltered top `--overfetch * k`, then filtered (search first,
+#             filter afterwards)
+#   scan    - the store's filter, testing each node's metadata (index_metadata=False)
+#   bitmap  - the store's filter, answered from its bitmap metadata index
+# Recall is against exact filtered search. The store is persisted and loaded
+# again first, as an app would find it; scanning decodes every node's metadata
+# per query, so it runs only --scan-queries queries.
+#
+#   python benchmark_filtered_retrieval.py --nodes 200000 --dim 256
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import (FilterOperator, MetadataFilter,
+                                                  MetadataFilters, VectorStoreQuery)
+
+from benchmark_utils import percentile
+from metadata_index import MetadataIndex
+from numpy_vector_store import NumpyVectorStore, normalize_rows
+
+DAY = 86_400
+NOW = 1_750_000_000
+
+
+def make_store(nodes: int, dim: int, chunks_per_file: int, folders: int,
+               persist_path: str) -> tuple[NumpyVectorStore, np.ndarray, dict]:
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.standard_normal((nodes, dim), dtype=np.float32))
+    files = np.arange(nodes) // chunks_per_file
+    columns = {
+        "file_name": np.array([f"file{f}.md" if f % 4 else f"file{f}.txt" for f in files]),
+        "folder": np.array([f"folder{f % folders}" for f in files]),
+        "mtime": NOW - rng.integers(0, 365, files[-1] + 1)[files] * DAY,
+    }
+    columns["extension"] = np.where(files % 4 == 0, "txt", "md")
+    store = NumpyVectorStore()
+    for first in range(0, nodes, 10_000):
+        rows = range(first, min(first + 10_000, nodes))
+        store.add([TextNode(id_=str(row), text="", embedding=vectors[row].tolist(),
+                            metadata={key: column[row].item() for key, column in columns.items()})
+                   for row in rows])
+    store.persist(persist_path)
+    return NumpyVectorStore.from_persist_path(persist_path), vectors, columns
+
+
+def filter_cases(columns: dict) -> dict:
+    """Filter name -> (MetadataFilters, matching rows as a bool array)."""
+    month_ago = NOW - 30 * DAY
+
+    def where(*filters):
+        return MetadataFilters(filters=list(filters))
+    return {
+        "one file": (where(MetadataFilter(key="file_name", value="file7.md")),
+                     columns["file_name"] == "file7.md"),
+        "folder + month": (where(MetadataFilter(key="folder", value="folder3"),
+                                 MetadataFilter(key="mtime", operator=FilterOperator.GTE,
+                                                value=month_ago)),
+                           (columns["folder"] == "folder3") & (columns["mtime"] >= month_ago)),
+        "one folder": (where(MetadataFilter(key="folder", value="folder3")),
+                       columns["folder"] == "folder3"),
+        "last month": (where(MetadataFilter(key="mtime", operator=FilterOperator.GTE,
+                                            value=month_ago)),
+                       columns["mtime"] >= month_ago),
+        "type md": (where(MetadataFilter(key="extension", value="md")),
+                    columns["extension"] == "md"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Post-filtering vs metadata pre-filtering")
+    parser.add_argument("--nodes", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    parser.add_argument("--folders", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--scan-queries", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=10)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="filtered_")
+    try:
+        store, vectors, columns = make_store(args.nodes, args.dim, args.chunks_per_file,
+                                             args.folders, os.path.join(root, "vectors.json"))
+        queries = normalize_rows(np.random.default_rng(1).standard_normal(
+            (args.queries, args.dim), dtype=np.float32))
+        cases = filter_cases(columns)
+        index_path = os.path.join(root, "vectors.metadata.npz")
+        start = time.perf_counter()
+        MetadataIndex.load(index_path, args.nodes)
+        load = time.perf_counter() - start
+
+        print(f"{args.nodes} nodes, dim={args.dim}, top_k={args.top_k}; metadata index "
+              f"{os.path.getsize(index_path) / 2**20:.1f} MB, loaded in {load * 1000:.0f} ms")
+        print(f"{'filter':<15} {'matches':>8} {'strategy':<7} {'p50 ms':>8} {'recall':>7} "
+              f"{'returned':>9}")
+        for name, (filters, matching) in cases.items():
+            exact = [set(np.flatnonzero(matching)[np.argsort(-(vectors[matching] @ query),
+                                                             kind="stable")[:args.top_k]])
+                     for query in queries]
+            for strategy in ("post", "scan", "bitmap"):
+                store.index_metadata = strategy == "bitmap"
+                latencies, recalls, returned = [], [], []
+                count = args.scan_queries if strategy == "scan" else args.queries
+                for query, truth in zip(queries[:count], exact):
+                    start = time.perf_counter()
+                    if strategy == "post":
+                        result = store.query(VectorStoreQuery(
+                            query_embedding=query.tolist(),
+                            similarity_top_k=args.overfetch * args.top_k))
+                        rows = [int(i) for i in result.ids if matching[int(i)]][:args.top_k]
+                    else:
+                        result = store.query(VectorStoreQuery(
+                            query_embedding=query.tolist(), similarity_top_k=args.top_k,
+                            filters=filters))
+                        rows = [int(i) for i in result.ids]
+                    latencies.append(time.perf_counter() - start)
+                    recalls.append(len(truth & set(rows)) / max(1, len(truth)))
+                    returned.append(len(rows))
+                print(f"{name:<15} {int(matching.sum()):>8} {strategy:<7} "
+                      f"{percentile(latencies, 50) * 1000:>8.2f} {np.mean(recalls):>7.2f} "
+                      f"{np.mean(returned):>9.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
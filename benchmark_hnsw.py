@@ -0,0 +1,131 @@
+# benchmark_hnsw.py
+# Recall@k, query latency, build time and on-disk size of Chroma collections
+# over a grid of HNSW settings (chroma_sync.HNSWParams): one persistent
+# collection per (m, ef_construction), searched with each ef_search. Recall is
+# measured against exact brute-force search in the same space. Vectors are
+# synthetic: clusters in a low-dimensional latent space projected up, queries
+# are perturbed corpus vectors. Settings on the Pareto front (no other setting
+# has both higher recall and lower p50 latency) are marked with "*".
+#
+#   python benchmark_hnsw.py --nodes 20000 --dim 384 --m 8 16 32 --ef-search 10 50 100
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from benchmark_utils import percentile
+from chroma_sync import HNSWParams, open_collection
+from numpy_vector_store import normalize_rows
+
+
+def make_corpus(nodes: int, dim: int, queries: int, latent: int = 128,
+                clusters: int = 256) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    projection = rng.standard_normal((latent, dim)).astype(np.float32)
+    centers = rng.standard_normal((clusters, latent)).astype(np.float32)
+    points = centers[rng.integers(0, clusters, nodes)] + 0.5 * rng.standard_normal(
+        (nodes, latent), dtype=np.float32)
+    vectors = normalize_rows(points @ projection + 0.05 * rng.standard_normal(
+        (nodes, dim), dtype=np.float32))
+    picks = vectors[rng.integers(0, nodes, queries)]
+    return vectors, normalize_rows(picks + 0.05 * rng.standard_normal(picks.shape,
+                                                                      dtype=np.float32))
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    if space == "l2":
+        # Smallest |q - v|^2 = |q|^2 - 2 q.v + |v|^2
+        scores = 2 * queries @ vectors.T - (vectors ** 2).sum(axis=1)
+    else:
+        # cosine and ip agree on unit vectors
+        scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def build(path: str, vectors: np.ndarray, params: HNSWParams) -> float:
+    client = chromadb.PersistentClient(
+        path=path, settings=chromadb.config.Settings(anonymized_telemetry=False))
+    collection = open_collection(client, "hnsw", params)
+    start = time.perf_counter()
+    for first in range(0, len(vectors), 5000):
+        block = vectors[first:first + 5000]
+        collection.add(ids=[str(first + i) for i in range(len(block))], embeddings=block)
+    return time.perf_counter() - start
+
+
+def search(path: str, params: HNSWParams, queries: np.ndarray, exact: np.ndarray,
+           k: int) -> dict:
+    client = chromadb.PersistentClient(
+        path=path, settings=chromadb.config.Settings(anonymized_telemetry=False))
+    collection = open_collection(client, "hnsw", params)
+    collection.query(query_embeddings=queries[:1], n_results=k, include=[])  # load the index
+    latencies, recalls = [], []
+    for query, truth in zip(queries, exact):
+        start = time.perf_counter()
+        ids = collection.query(query_embeddings=query[None], n_results=k, include=[])["ids"][0]
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({int(i) for i in ids} & set(truth.tolist())) / k)
+    return {"recall": float(np.mean(recalls)), "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000}
+
+
+def directory_tree_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names) / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chroma HNSW recall/latency trade-off")
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--space", default="l2", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[32, 100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 50, 100])
+    args = parser.parse_args()
+
+    vectors, queries = make_corpus(args.nodes, args.dim, args.queries)
+    exact = exact_top_k(vectors, queries, args.top_k, args.space)
+    root = tempfile.mkdtemp(prefix="hnsw_")
+    rows = []
+    try:
+        for m in args.m:
+            for ef_construction in args.ef_construction:
+                path = os.path.join(root, f"m{m}_ef{ef_construction}")
+                params = HNSWParams(args.space, m, ef_construction, args.ef_search[0])
+                seconds = build(path, vectors, params)
+                for ef_search in args.ef_search:
+                    # A loaded index keeps the ef_search it was loaded with, so
+                    # each setting is searched from a new process
+                    with multiprocessing.get_context("spawn").Pool(1) as pool:
+                        r = pool.apply(search, (path, HNSWParams(args.space, m, ef_construction,
+                                                                 ef_search),
+                                                queries, exact, args.top_k))
+                    rows.append({"m": m, "ef_construction": ef_construction,
+                                 "ef_search": ef_search, "build_s": seconds,
+                                 "disk_mb": directory_tree_mb(path), **r})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"{args.nodes} vectors, dim={args.dim}, space={args.space}, recall@{args.top_k}, "
+          f"{args.queries} queries")
+    print(f"  {'m':>3} {'ef_con':>6} {'ef_search':>9} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'build s':>8} {'disk MB':>8}")
+    for row in sorted(rows, key=lambda r: r["p50_ms"]):
+        pareto = not any(o["recall"] >= row["recall"] and o["p50_ms"] < row["p50_ms"]
+                         or o["recall"] > row["recall"] and o["p50_ms"] <= row["p50_ms"]
+                         for o in rows)
+        print(f"{'*' if pareto else ' '} {row['m']:>3} {row['ef_construction']:>6} "
+              f"{row['ef_search']:>9} {row['recall']:>7.3f} {row['p50_ms']:>7.2f} "
+              f"{row['p99_ms']:>7.2f} {row['build_s']:>8.1f} {row['disk_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
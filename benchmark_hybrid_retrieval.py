@@ -0,0 +1,91 @@
+# benchmark_hybrid_retrieval.py
+# Recall@k and latency of vector-only, BM25-only and hybrid (RRF) retrieval on
+# the data/ corpus. Each question names an entity from the stories; the chunks
+# that mention it are the relevant ones. Embeddings come from the offline mock
+# backend by default (with a simulated round trip, so the concurrency of the
+# hybrid retriever shows up in its latency); pass --llm-type ollama to use
+# nomic-embed-text instead.
+#
+#   python benchmark_hybrid_retrieval.py --top-k 3 --chunk-size 128
+import argparse
+import time
+
+from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.retrievers import VectorIndexRetriever
+
+from benchmark_utils import QUESTIONS, percentile
+from hybrid_retriever import BM25Index, HybridRetriever, get_nodes, sync_bm25
+from llm_factory import LLMType, get_embedding_model
+
+
+class KeywordOnly:
+    """BM25 half of the hybrid retriever, for comparison."""
+
+    def __init__(self, index, bm25: BM25Index, top_k: int):
+        self.index, self.bm25, self.top_k = index, bm25, top_k
+
+    def retrieve(self, question: str) -> list:
+        ids = [node_id for node_id, _ in self.bm25.search(question, self.top_k)]
+        nodes = {node.node_id: node for node in get_nodes(self.index, ids)}
+        return [nodes[node_id] for node_id in ids]
+
+
+def evaluate(retrieve, relevant: dict, top_k: int, repeat: int) -> tuple[float, list[float]]:
+    recalls, latencies = [], []
+    for question, ids in relevant.items():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hits = retrieve(question)
+            latencies.append(time.perf_counter() - start)
+        found = {getattr(hit, "node", hit).node_id for hit in hits}
+        recalls.append(len(found & ids) / min(top_k, len(ids)))
+    return sum(recalls) / len(recalls), latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector vs BM25 vs hybrid retrieval")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=128)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--llm-type", default="mock", choices=["mock", "ollama", "openai"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.llm_type == "mock":
+        # Small dimension: hash collisions make the mock lossy, like a real
+        # model that blurs rare names
+        Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=64,
+                                                   latency=args.embed_latency)
+    else:
+        Settings.embed_model = get_embedding_model(args.llm_type)
+    splitter = SentenceSplitter(chunk_size=args.chunk_size, chunk_overlap=16)
+    nodes = splitter.get_nodes_from_documents(SimpleDirectoryReader("data").load_data())
+    index = VectorStoreIndex(nodes)
+    bm25 = BM25Index()
+    sync_bm25(bm25, index)
+
+    relevant = {}
+    for question, phrase in QUESTIONS:
+        ids = {n.node_id for n in nodes if phrase.lower() in n.get_content().lower()}
+        if ids:
+            relevant[question] = ids
+    print(f"{len(nodes)} chunks, {len(relevant)} questions, top_k={args.top_k}, "
+          f"embeddings: {Settings.embed_model.model_name}")
+
+    retrievers = {
+        "vector": VectorIndexRetriever(index, similarity_top_k=args.top_k).retrieve,
+        "bm25": KeywordOnly(index, bm25, args.top_k).retrieve,
+        "hybrid (rrf)": HybridRetriever(index, bm25, similarity_top_k=args.top_k,
+                                        candidate_top_k=args.candidates).retrieve,
+    }
+    print(f"{'retriever':<14} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, retrieve in retrievers.items():
+        recall, latencies = evaluate(retrieve, relevant, args.top_k, args.repeat)
+        print(f"{name:<14} {recall:>9.2f} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
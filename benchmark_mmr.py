@@ -0,0 +1,92 @@
+# benchmark_mmr.py
+# Prompt tokens, coverage and latency of a RetrieverQueryEngine with a plain
+# top 3, a plain top 10 (over-fetching for coverage) and MMR narrowing 10
+# candidates to 3 within a token budget (mmr_postprocessor). The data/ corpus
+# is ingested --copies times under different file names, as happens with
+# drafts and re-uploads, so a plain top k fills up with duplicates. "distinct"
+# counts different chunk texts among the nodes sent to the LLM; "found" is the
+# share of questions with a chunk naming the entity among them. Embeddings and
+# LLM are the offline mock backend unless --llm-type is given.
+#
+#   python benchmark_mmr.py --copies 3 --chunk-size 128
+import argparse
+import time
+
+from llama_index.core import Document, Settings, SimpleDirectoryReader, VectorStoreIndex
+from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import VectorIndexRetriever
+
+from benchmark_utils import QUESTIONS, percentile
+from llm_factory import LLMType, get_embedding_model, get_llm
+from mmr_postprocessor import DEFAULT_MMR_LAMBDA, MMRPostprocessor
+
+
+def run_case(index: VectorStoreIndex, top_k: int, postprocessors: list,
+             tokens: TokenCountingHandler, repeat: int) -> dict:
+    engine = RetrieverQueryEngine.from_args(
+        VectorIndexRetriever(index, similarity_top_k=top_k), node_postprocessors=postprocessors)
+    latencies, prompt_tokens, distinct, found = [], [], [], 0
+    for question, phrase in QUESTIONS:
+        for _ in range(repeat):
+            tokens.reset_counts()
+            start = time.perf_counter()
+            response = engine.query(question)
+            latencies.append(time.perf_counter() - start)
+            prompt_tokens.append(tokens.prompt_llm_token_count)
+        texts = [n.node.get_content() for n in response.source_nodes]
+        distinct.append(len(set(texts)))
+        found += any(phrase.lower() in text.lower() for text in texts)
+    return {"nodes": len(response.source_nodes), "distinct": sum(distinct) / len(distinct),
+            "found": found / len(QUESTIONS),
+            "prompt_tokens": sum(prompt_tokens) / len(prompt_tokens),
+            "p50_ms": percentile(latencies, 50) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Top k vs MMR context selection")
+    parser.add_argument("--copies", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=128)
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--token-budget", type=int, default=512)
+    parser.add_argument("--mmr-lambda", type=float, default=DEFAULT_MMR_LAMBDA)
+    parser.add_argument("--llm-type", default="mock", choices=["mock", "ollama", "openai"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.llm_type == "mock":
+        Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=256, latency=0.01)
+        Settings.llm = get_llm(LLMType.MOCK, latency=0.05)
+    else:
+        Settings.embed_model = get_embedding_model(args.llm_type)
+        Settings.llm = get_llm(args.llm_type)
+    tokens = TokenCountingHandler()
+    Settings.callback_manager = CallbackManager([tokens])
+
+    documents = [Document(text=doc.text,
+                          metadata={"file_name": f"copy{copy}_{doc.metadata['file_name']}"})
+                 for doc in SimpleDirectoryReader("data").load_data()
+                 for copy in range(args.copies)]
+    splitter = SentenceSplitter(chunk_size=args.chunk_size, chunk_overlap=16)
+    index = VectorStoreIndex(splitter.get_nodes_from_documents(documents))
+    mmr = MMRPostprocessor(top_n=args.top_k, mmr_lambda=args.mmr_lambda,
+                           token_budget=args.token_budget)
+    cases = {
+        f"top {args.top_k}": (args.top_k, []),
+        f"top {args.candidates}": (args.candidates, []),
+        f"mmr {args.candidates}->{args.top_k}": (args.candidates, [mmr]),
+    }
+    print(f"{len(index.docstore.docs)} chunks ({args.copies} copies), {len(QUESTIONS)} questions, "
+          f"token budget {args.token_budget}, lambda {args.mmr_lambda}")
+    print(f"{'context':<12} {'nodes':>6} {'distinct':>9} {'found':>6} {'prompt tok':>11} "
+          f"{'p50 ms':>8}")
+    for name, (top_k, postprocessors) in cases.items():
+        r = run_case(index, top_k, postprocessors, tokens, args.repeat)
+        print(f"{name:<12} {r['nodes']:>6} {r['distinct']:>9.2f} {r['found']:>6.2f} "
+              f"{r['prompt_tokens']:>11.0f} {r['p50_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# benchmark_mock_pipelines.py
+# Runs the pipelines of the query, RAG, text-to-SQL and agent examples end to
+# end against the offline LLMType.MOCK models, so framework overhead and the
+# effect of changes can be measured without Ollama, OpenAI or PostgreSQL.
+# Model cost is simulated (--latency, --tokens-per-second) and deterministic.
+#
+#   python benchmark_mock_pipelines.py
+#   python benchmark_mock_pipelines.py --latency 0.2 --tokens-per-second 40 --json out.json
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import chromadb
+from llama_index.core import (Settings, SimpleDirectoryReader, SQLDatabase,
+                              StorageContext, VectorStoreIndex)
+from llama_index.core.agent.workflow import FunctionAgent
+from llama_index.core.query_engine import NLSQLTableQueryEngine
+from llama_index.core.tools import FunctionTool
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from sqlalchemy import create_engine, text
+
+import llm_factory
+from llm_factory import LLMType, get_embedding_model, get_llm
+
+QUESTIONS = ["What is Cloud Club?", "Who leads the Toastmaster uprising?",
+             "How does the story end?", "What happened at the first meeting?"]
+
+# SQLite version of init.sql, so the text-to-SQL pipeline needs no server
+SQL_SCHEMA = [
+    "CREATE TABLE country_stats (country_id INTEGER PRIMARY KEY, "
+    "country_name VARCHAR(50) NOT NULL UNIQUE, country_population INTEGER)",
+    "CREATE TABLE city_stats (city_id INTEGER PRIMARY KEY, city_name VARCHAR(50) NOT NULL, "
+    "city_population INTEGER, country_id INTEGER REFERENCES country_stats(country_id))",
+    "INSERT INTO country_stats (country_name, country_population) VALUES "
+    "('Canada', 38000000), ('Japan', 125800000), ('United States', 331000000)",
+    "INSERT INTO city_stats (city_name, city_population, country_id) VALUES "
+    "('Toronto', 2930000, 1), ('Tokyo', 13960000, 2), ('Chicago', 2679000, 3)",
+]
+SCRIPTED_SQL = ("SQLQuery: SELECT city_name, city_population FROM city_stats "
+                "ORDER BY city_population DESC LIMIT 5")
+
+
+def multiply(a: float, b: float) -> float:
+    """Multiply two numbers and returns the product"""
+    return a * b
+
+
+def add(a: float, b: float) -> float:
+    """Add two numbers and returns the sum"""
+    return a + b
+
+
+def summarize(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {"runs": len(samples),
+            "mean_ms": round(statistics.mean(samples) * 1000, 2),
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(0.99 * len(samples)))] * 1000, 2)}
+
+
+def timed(fn, runs: int) -> dict:
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_query(runs: int) -> dict:
+    documents = SimpleDirectoryReader("data").load_data()
+    query_engine = VectorStoreIndex.from_documents(documents).as_query_engine()
+    return timed(lambda i: query_engine.query(QUESTIONS[i % len(QUESTIONS)]), runs)
+
+
+def bench_rag(runs: int) -> dict:
+    documents = SimpleDirectoryReader("data").load_data()
+    client = chromadb.EphemeralClient(chromadb.config.Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection("benchmark")
+    storage_context = StorageContext.from_defaults(
+        vector_store=ChromaVectorStore(chroma_collection=collection))
+    index = VectorStoreIndex.from_documents(documents, storage_context=storage_context)
+    query_engine = index.as_query_engine(similarity_top_k=3)
+    return timed(lambda i: query_engine.query(QUESTIONS[i % len(QUESTIONS)]), runs)
+
+
+def bench_text_to_sql(runs: int, llm) -> dict:
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in SQL_SCHEMA:
+            connection.execute(text(statement))
+    query_engine = NLSQLTableQueryEngine(
+        sql_database=SQLDatabase(engine, include_tables=["city_stats", "country_stats"]),
+        tables=["city_stats", "country_stats"], llm=llm)
+    return timed(lambda i: query_engine.query("Which cities have the most people?"), runs)
+
+
+def bench_agent(runs: int, llm) -> dict:
+    agent = FunctionAgent(name="math_agent", llm=llm,
+                          tools=[FunctionTool.from_defaults(multiply),
+                                 FunctionTool.from_defaults(add)],
+                          system_prompt="You can multiply and add numbers using tools.")
+
+    async def run_all() -> list[float]:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            await agent.run(user_msg="What is 6 times 7, plus 8?")
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    return summarize(asyncio.run(run_all()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="End-to-end pipeline timings against the offline mock backend")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="mean simulated model latency in seconds")
+    parser.add_argument("--latency-dist", default="fixed",
+                        choices=("fixed", "uniform", "exponential", "lognormal"))
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    model = {"latency": args.latency, "latency_dist": args.latency_dist,
+             "latency_jitter": 0.5, "seed": 42}
+    Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=args.embed_dim, **model)
+    Settings.llm = get_llm(LLMType.MOCK, tokens_per_second=args.tokens_per_second, **model)
+    sql_llm = get_llm(LLMType.MOCK, responses=[SCRIPTED_SQL],
+                      tokens_per_second=args.tokens_per_second, **model)
+    agent_llm = get_llm(LLMType.MOCK, tokens_per_second=args.tokens_per_second,
+                        tool_script=[{"name": "multiply", "arguments": {"a": 6, "b": 7}},
+                                     {"name": "add", "arguments": {"a": 42, "b": 8}}],
+                        **model)
+
+    results = {}
+    print(f"{'pipeline':<14} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, bench in (("query", bench_query),
+                        ("rag", bench_rag),
+                        ("text_to_sql", lambda runs: bench_text_to_sql(runs, sql_llm)),
+                        ("agent", lambda runs: bench_agent(runs, agent_llm))):
+        results[name] = bench(args.runs)
+        r = results[name]
+        print(f"{name:<14} {r['mean_ms']:>9.2f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+    llm_factory.close_all()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
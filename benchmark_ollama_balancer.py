@@ -0,0 +1,77 @@
+# benchmark_ollama_balancer.py
+# Exercises the multi-host Ollama balancer against local stand-in servers:
+# a fast host, a slow host and a host that fails part-way through. Prints how
+# requests were spread, which hosts were ejected, and throughput compared with
+# sending everything to a single host.
+import argparse
+import asyncio
+import time
+
+from llama_index.core.llms import ChatMessage
+
+import llm_factory
+from llm_factory import LLMType, get_llm
+from ollama_standin import start_standin_server
+
+
+async def fire(llm, requests: int, concurrency: int, on_halfway=None) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def one(i: int) -> None:
+        nonlocal done
+        async with semaphore:
+            await llm.achat([ChatMessage(role="user", content=f"question {i}")])
+        done += 1
+        if on_halfway and done == requests // 2:
+            on_halfway()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Least-outstanding-requests balancing across stand-in Ollama hosts")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=24)
+    args = parser.parse_args()
+
+    model = llm_factory.DEFAULTS["ollama_model"]
+    servers = [start_standin_server(latency=0.01, loaded_models=[model]),
+               start_standin_server(latency=0.05),
+               start_standin_server(latency=0.01)]
+    urls = [url for _, url in servers]
+    try:
+        single = get_llm(LLMType.OLLAMA, base_url=urls[0])
+        elapsed = asyncio.run(fire(single, args.requests, args.concurrency))
+        print(f"single host       {args.requests / elapsed:8.1f} req/s")
+
+        # Third host starts failing half-way through the run
+        balanced = get_llm(LLMType.OLLAMA, base_urls=urls)
+        before = [server.state.requests for server, _ in servers]
+        failing = servers[2][0].state
+
+        def fail_third_host():
+            failing.fail = True
+
+        elapsed = asyncio.run(fire(balanced, args.requests, args.concurrency,
+                                   fail_third_host))
+        print(f"balanced (3 hosts) {args.requests / elapsed:7.1f} req/s")
+
+        balancer = llm_factory._get_balancer(tuple(urls))  # pylint: disable=protected-access
+        now = time.monotonic()
+        for (server, url), host, start in zip(servers, balancer.hosts, before):
+            ejected = "ejected" if host.ejected_until > now else ""
+            print(f"  {url}  latency={server.state.latency * 1000:.0f}ms  "
+                  f"requests={server.state.requests - start:4d}  "
+                  f"loaded={sorted(host.loaded_models)} {ejected}")
+    finally:
+        llm_factory.close_all()
+        for server, _ in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmark_parallel_ingest.py
+# Index build time for a synthetic multi-thousand-file corpus generated from
+# data/*.md, serial (SimpleDirectoryReader + VectorStoreIndex.from_documents)
+# versus parallel_ingest.build_index with several worker counts. Embeddings
+# come from the offline mock backend so the CPU-bound parse/chunk work is
+# what gets measured.
+#
+#   python benchmark_parallel_ingest.py --files 3000 --workers 1 2 4 8
+import argparse
+import glob
+import os
+import random
+import tempfile
+import time
+
+from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex
+
+from llm_factory import LLMType, get_embedding_model
+from parallel_ingest import build_index
+
+
+def generate_corpus(folder: str, files: int, seed: int = 0) -> None:
+    """Write `files` variants of data/*.md with shuffled paragraphs."""
+    sources = []
+    for path in sorted(glob.glob(os.path.join("data", "*.md"))):
+        with open(path, encoding="utf-8") as f:
+            sources.append([p for p in f.read().split("\n\n") if p.strip()])
+    if not sources:
+        raise ValueError("No data/*.md files to generate the corpus from.")
+    rng = random.Random(seed)
+    for i in range(files):
+        paragraphs = list(sources[i % len(sources)])
+        rng.shuffle(paragraphs)
+        with open(os.path.join(folder, f"doc_{i:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Variant {i}\n\n" + "\n\n".join(paragraphs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serial vs parallel document loading and chunking")
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--files-per-task", type=int, default=32)
+    args = parser.parse_args()
+
+    Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=256)
+    with tempfile.TemporaryDirectory() as folder:
+        generate_corpus(folder, args.files)
+        print(f"{args.files} files, {os.cpu_count()} CPUs")
+
+        start = time.perf_counter()
+        documents = SimpleDirectoryReader(folder).load_data()
+        index = VectorStoreIndex.from_documents(documents)
+        serial = time.perf_counter() - start
+        print(f"{'serial (from_documents)':<26} {serial:7.2f}s  "
+              f"nodes={len(index.docstore.docs)}")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            index = build_index(folder, workers=workers, files_per_task=args.files_per_task)
+            elapsed = time.perf_counter() - start
+            print(f"{f'build_index workers={workers}':<26} {elapsed:7.2f}s  "
+                  f"nodes={len(index.docstore.docs)}  speed-up={serial / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
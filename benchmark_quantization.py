@@ -0,0 +1,132 @@
+# benchmark_quantization.py
+# Recall@k, query latency and memory of QuantizedVectorStore (int8 and PQ,
+# with and without re-ranking) against the full-precision NumpyVectorStore.
+# Vectors are synthetic at text-embedding-3-large's 3072 dimensions: clusters
+# in a low-dimensional latent space projected up, since real embeddings have
+# far fewer degrees of freedom than dimensions. Queries are perturbed corpus
+# vectors and the exact top k is the reference. The corpus is persisted once
+# and encoded once per method ("encode s"); each store then loads it in a fresh
+# process with the float32 matrix memory-mapped. "RSS" includes the mapped
+# pages of the matrix, which the kernel may map a large folio at a time around
+# each re-ranked row.
+#
+#   python benchmark_quantization.py --nodes 50000 --dim 3072 --rerank 0 4
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from llama_index.core.schema import TextNode
+
+from benchmark_utils import percentile, rss_mb
+from numpy_vector_store import NumpyVectorStore, normalize_rows
+from quantized_vector_store import QuantizedVectorStore
+
+
+def make_corpus(persist_path: str, nodes: int, dim: int, queries: int, k: int,
+                latent: int = 64, clusters: int = 256) -> tuple[np.ndarray, np.ndarray]:
+    """Persist a clustered corpus; return (queries, exact top-k rows)."""
+    rng = np.random.default_rng(0)
+    projection = rng.standard_normal((latent, dim)).astype(np.float32)
+    centers = rng.standard_normal((clusters, latent)).astype(np.float32)
+    store = NumpyVectorStore()
+    vectors = np.empty((nodes, dim), dtype=np.float32)
+    for first in range(0, nodes, 1000):
+        size = min(1000, nodes - first)
+        points = centers[rng.integers(0, clusters, size)] + 0.5 * rng.standard_normal(
+            (size, latent), dtype=np.float32)
+        block = points @ projection + 0.05 * rng.standard_normal((size, dim), dtype=np.float32)
+        vectors[first:first + size] = normalize_rows(block)
+        store.add([TextNode(id_=str(first + i), text="", embedding=vector.tolist())
+                   for i, vector in enumerate(block)])
+    store.persist(persist_path)
+    picks = vectors[rng.integers(0, nodes, queries)]
+    query_vectors = normalize_rows(picks + 0.02 * rng.standard_normal(picks.shape,
+                                                                      dtype=np.float32))
+    exact = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :k]
+    return query_vectors, exact
+
+
+def encode(persist_path: str, method: str, subspaces: int) -> float:
+    """Encode and persist codes for a copy of the corpus. Returns seconds."""
+    start = time.perf_counter()
+    store = QuantizedVectorStore.from_persist_path(persist_path, method=method,
+                                                   pq_subspaces=subspaces)
+    seconds = time.perf_counter() - start
+    store.persist(persist_path)
+    return seconds
+
+
+def run_case(persist_path: str, method: str, rerank: int, subspaces: int,
+             query_vectors: np.ndarray, exact: np.ndarray, k: int) -> dict:
+    before = rss_mb()
+    start = time.perf_counter()
+    if method == "float32":
+        store = NumpyVectorStore.from_persist_path(persist_path)
+    else:
+        store = QuantizedVectorStore.from_persist_path(persist_path, method=method,
+                                                       rerank=rerank, pq_subspaces=subspaces)
+    load = time.perf_counter() - start
+    latencies, recalls = [], []
+    for query, truth in zip(query_vectors, exact):
+        start = time.perf_counter()
+        ids = store.query_many([query], k)[0].ids
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({int(i) for i in ids} & set(truth.tolist())) / k)
+    scanned = (store.memory_bytes() if isinstance(store, QuantizedVectorStore)
+               else len(store) * query_vectors.shape[1] * 4)
+    return {"load_s": load, "recall": float(np.mean(recalls)),
+            "p50_ms": percentile(latencies, 50) * 1000, "scanned_mb": scanned / 2**20,
+            "rss_mb": rss_mb() - before}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Quantized vs full-precision vector search")
+    parser.add_argument("--nodes", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--pq-subspaces", type=int, default=None,
+                        help="default: one per 8 dimensions")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="quantization_")
+    persist_path = os.path.join(root, "default__vector_store.json")
+    try:
+        query_vectors, exact = make_corpus(persist_path, args.nodes, args.dim, args.queries,
+                                           args.top_k)
+        paths = {"float32": persist_path}
+        encode_seconds = {"float32": 0.0}
+        stem = os.path.splitext(persist_path)[0]
+        for method in ("int8", "pq"):
+            folder = os.path.join(root, method)
+            os.makedirs(folder)
+            for suffix in (".npy", ".pack"):
+                shutil.copy(stem + suffix, os.path.join(folder, os.path.basename(stem) + suffix))
+            paths[method] = os.path.join(folder, os.path.basename(persist_path))
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                encode_seconds[method] = pool.submit(encode, paths[method], method,
+                                                     args.pq_subspaces).result()
+        cases = [("float32", 0)] + [(method, rerank) for method in ("int8", "pq")
+                                    for rerank in args.rerank]
+        print(f"{args.nodes} nodes, dim={args.dim}, recall@{args.top_k}, "
+              f"pq_subspaces={args.pq_subspaces or args.dim // 8}")
+        print(f"{'store':<8} {'rerank':>6} {'recall':>7} {'p50 ms':>8} {'scan MB':>8} "
+              f"{'RSS MB':>8} {'load s':>7} {'encode s':>9}")
+        for method, rerank in cases:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                r = pool.submit(run_case, paths[method], method, rerank, args.pq_subspaces,
+                                query_vectors, exact, args.top_k).result()
+            print(f"{method:<8} {rerank if method != 'float32' else '-':>6} {r['recall']:>7.3f} "
+                  f"{r['p50_ms']:>8.2f} {r['scanned_mb']:>8.1f} {r['rss_mb']:>8.0f} "
+                  f"{r['load_s']:>7.2f} {encode_seconds[method]:>9.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
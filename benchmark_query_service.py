@@ -0,0 +1,97 @@
+# benchmark_query_service.py
+# Throughput and latency of query_service under a growing number of concurrent
+# clients. The service runs under uvicorn with the offline mock models (fixed
+# embedding and LLM latency), so the numbers show how well requests overlap,
+# not how fast a real backend is. Every question is distinct, which keeps the
+# semantic cache out of the measurement.
+#
+#   python benchmark_query_service.py --clients 1 4 16 64 --requests 128
+import argparse
+import asyncio
+import random
+import socket
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmark_utils import percentile
+from llm_factory import LLMType, get_embedding_model, get_llm
+from query_service import create_app
+
+STAGES = ("queue", "embed", "retrieve", "synthesize", "total")
+
+
+def start_server(app) -> tuple[uvicorn.Server, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run(url: str, clients: int, requests: int, offset: int) -> dict:
+    latencies, stages = [], {}
+    queue = asyncio.Queue()
+    for i in range(requests):
+        rng = random.Random(offset + i)
+        queue.put_nowait(" ".join(f"term{rng.randrange(10 ** 6)}" for _ in range(8)))
+
+    async def client(http: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            reply = await http.post(f"{url}/query", json={"question": question})
+            reply.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            for name, ms in reply.json()["timings_ms"].items():
+                stages.setdefault(name, []).append(ms)
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=clients)) as http:
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {"throughput": requests / elapsed, "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "stages": {name: sum(stages[name]) / len(stages[name]) for name in STAGES
+                       if name in stages}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent clients against query_service")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--max-llm", type=int, default=16, help="LLM calls in flight")
+    parser.add_argument("--folder", default="data")
+    args = parser.parse_args()
+
+    embed_model = get_embedding_model(LLMType.MOCK, latency=args.embed_latency, embed_dim=256)
+    llm = get_llm(LLMType.MOCK, latency=args.llm_latency)
+    with tempfile.TemporaryDirectory() as persist_dir:
+        # The mock index stays out of the app's .index_storage
+        app = create_app(args.folder, embed_model=embed_model, llm=llm, persist_dir=persist_dir,
+                         max_llm=args.max_llm)
+        server, url = start_server(app)
+        print(f"embed latency {args.embed_latency * 1000:.0f} ms, "
+              f"LLM latency {args.llm_latency * 1000:.0f} ms, {args.max_llm} LLM slots")
+        print(f"{'clients':>7} {'req/s':>8} {'p50':>8} {'p99':>8}  mean stage ms")
+        try:
+            for n, clients in enumerate(args.clients):
+                result = asyncio.run(run(url, clients, args.requests, n * args.requests))
+                stages = " ".join(f"{name}={ms:.0f}" for name, ms in result["stages"].items())
+                print(f"{clients:>7} {result['throughput']:>8.1f} {result['p50']:>7.3f}s "
+                      f"{result['p99']:>7.3f}s  {stages}")
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmark_sharded_retrieval.py
+# Latency of retrieval over documents sharded into several in-memory Chroma
+# collections: querying the shards one after another (as separate
+# VectorIndexRetrievers would) versus ShardedRetriever's concurrent fan-out,
+# plus one shard slower than the deadline. Each shard query gets a simulated
+# round trip (--shard-latency, e.g. a remote Chroma server or a cold disk);
+# embeddings come from the offline mock backend. The sequential baseline embeds
+# the query once per shard, like one retriever per collection.
+#
+#   python benchmark_sharded_retrieval.py --shards 8 --shard-latency 0.05
+import argparse
+import logging
+import time
+import uuid
+
+import chromadb
+from llama_index.core import Settings
+from llama_index.core.schema import QueryBundle, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+from benchmark_utils import QUESTIONS, percentile
+from llm_factory import LLMType, get_embedding_model
+from sharded_retriever import ShardedRetriever
+
+WORDS = "robot cloud byte toast cocoa wifi vacuum club city river quiet loud".split()
+
+
+class DelayedStore:
+    """A shard whose queries take an extra `delay` seconds."""
+
+    def __init__(self, store: ChromaVectorStore, delay: float):
+        self.store, self.delay = store, delay
+
+    def query(self, query: VectorStoreQuery, **kwargs):
+        time.sleep(self.delay)
+        return self.store.query(query, **kwargs)
+
+
+def make_shards(count: int, nodes: int, delays: list[float]) -> dict:
+    client = chromadb.EphemeralClient(chromadb.config.Settings(anonymized_telemetry=False))
+    shards = {}
+    for shard in range(count):
+        collection = client.create_collection(f"shard{shard}_{uuid.uuid4().hex[:8]}")
+        store = ChromaVectorStore(chroma_collection=collection)
+        texts = [f"{WORDS[(shard + i) % len(WORDS)]} {WORDS[i % 7]} note {shard}-{i}"
+                 for i in range(nodes)]
+        embeddings = Settings.embed_model.get_text_embedding_batch(texts)
+        store.add([TextNode(text=text, embedding=embedding)
+                   for text, embedding in zip(texts, embeddings)])
+        shards[f"shard{shard}"] = DelayedStore(store, delays[shard])
+    return shards
+
+
+def sequential(shards: dict, question: str, top_k: int) -> list:
+    hits = []
+    for store in shards.values():
+        embedding = Settings.embed_model.get_query_embedding(question)
+        result = store.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=top_k))
+        hits.extend(zip(result.similarities, result.ids))
+    return sorted(hits, reverse=True)[:top_k]
+
+
+def measure(retrieve, repeat: int) -> list[float]:
+    latencies = []
+    for _ in range(repeat):
+        for question, _ in QUESTIONS:
+            start = time.perf_counter()
+            retrieve(question)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sequential vs fan-out sharded retrieval")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--nodes", type=int, default=500, help="per shard")
+    parser.add_argument("--shard-latency", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--shard-timeout", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    # The slow shard is left out of every query; counted in stats below
+    logging.getLogger("sharded_retriever").setLevel(logging.ERROR)
+    Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=128,
+                                               latency=args.embed_latency)
+    shards = make_shards(args.shards, args.nodes, [args.shard_latency] * args.shards)
+    slow = dict(shards)
+    slow["shard0"] = DelayedStore(shards["shard0"].store, args.slow_latency)
+
+    fanout = ShardedRetriever(shards, similarity_top_k=args.top_k,
+                              shard_timeout=args.shard_timeout)
+    fanout_slow = ShardedRetriever(slow, similarity_top_k=args.top_k,
+                                   shard_timeout=args.shard_timeout)
+    cases = {
+        "sequential": lambda q: sequential(shards, q, args.top_k),
+        "fan-out": lambda q: fanout.retrieve(QueryBundle(q)),
+        "fan-out, 1 slow": lambda q: fanout_slow.retrieve(QueryBundle(q)),
+    }
+    # Same global top k scores from both strategies (ids may differ among ties);
+    # the sequential pass also warms up Chroma's indexes
+    expected = {q: [round(score, 6) for score, _ in sequential(shards, q, args.top_k)]
+                for q, _ in QUESTIONS}
+    agree = all([round(hit.score, 6) for hit in fanout.retrieve(QueryBundle(q))] == scores
+                for q, scores in expected.items())
+    print(f"{args.shards} shards x {args.nodes} nodes, shard latency "
+          f"{args.shard_latency * 1000:.0f} ms, slow shard {args.slow_latency * 1000:.0f} ms, "
+          f"deadline {args.shard_timeout * 1000:.0f} ms, same top {args.top_k}: {agree}")
+    print(f"{'retrieval':<16} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, retrieve in cases.items():
+        latencies = measure(retrieve, args.repeat)
+        print(f"{name:<16} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f}")
+    print(f"fan-out, 1 slow: {fanout_slow.stats}")
+
+
+if __name__ == "__main__":
+    main()
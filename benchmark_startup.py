@@ -0,0 +1,88 @@
+# benchmark_startup.py
+# Tracks the cold-start (import) cost of llm_factory and every example entry
+# point. The examples do their work at module level, so instead of importing
+# them this tool extracts each script's top-level import statements and runs
+# only those in a fresh interpreter under `python -X importtime`.
+#
+#   python benchmark_startup.py                  # table for all entry points
+#   python benchmark_startup.py --json out.json  # also record the results
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_statements(path: str) -> str:
+    """Source of the top-level import statements of a script."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nodes)
+
+
+def measure(code: str) -> dict:
+    """Run code under -X importtime and return total and heaviest top-level imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", code],
+        cwd=HERE, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines()
+                  if line and not line.startswith("import time:")]
+        return {"error": errors[-1] if errors else "failed"}
+
+    top_level = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # Nested imports are indented below the module that triggered them
+        if not name.startswith("  "):
+            top_level.append((name.strip(), int(cumulative) / 1000.0))
+    total = sum(ms for _, ms in top_level)
+    heaviest = sorted(top_level, key=lambda item: item[1], reverse=True)[:3]
+    return {"total_ms": round(total, 1),
+            "heaviest": [(name, round(ms, 1)) for name, ms in heaviest]}
+
+
+def entry_points() -> dict:
+    targets = {"llm_factory": "import llm_factory"}
+    for path in sorted(glob.glob(os.path.join(HERE, "example_*.py"))):
+        targets[os.path.basename(path)] = import_statements(path)
+    return targets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Cold-start import cost of llm_factory and the example scripts")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per entry point; the fastest is reported")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'entry point':<42} {'import ms':>10}  heaviest imports")
+    for name, code in entry_points().items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        ok = [r for r in runs if "error" not in r]
+        best = min(ok, key=lambda r: r["total_ms"]) if ok else runs[0]
+        results[name] = best
+        if "error" in best:
+            print(f"{name:<42} {'error':>10}  {best['error']}")
+            continue
+        heaviest = ", ".join(f"{mod} {ms:.0f}" for mod, ms in best["heaviest"])
+        print(f"{name:<42} {best['total_ms']:>10.1f}  {heaviest}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmark_storage_format.py
+# Load time and memory of a persisted index in LlamaIndex's JSON format versus
+# the binary format of persistent_index.open_storage (.npy vectors and a pack
+# file for nodes, both memory-mapped). A synthetic index (random vectors, a
+# paragraph of text per node) is persisted as JSON, converted by loading and
+# persisting it through open_storage, then each copy is loaded in a fresh
+# process.
+#
+#   python benchmark_storage_format.py --nodes 50000 --dim 768
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from llama_index.core import (Settings, StorageContext, VectorStoreIndex,
+                              load_index_from_storage)
+from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.schema import TextNode
+
+from benchmark_utils import rss_mb
+from llm_factory import LLMType, get_embedding_model
+from persistent_index import open_storage
+
+WORDS = "robot cloud byte toast cocoa wifi vacuum club city river quiet loud".split()
+
+
+def directory_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2**20
+
+
+def build(persist_dir: str, nodes: int, dim: int) -> None:
+    rng = np.random.default_rng(0)
+    index = VectorStoreIndex([], storage_context=StorageContext.from_defaults())
+    for first in range(0, nodes, 10_000):
+        vectors = rng.standard_normal((min(10_000, nodes - first), dim), dtype=np.float32)
+        index.insert_nodes([
+            TextNode(id_=f"n{first + i}", text=" ".join(rng.choice(WORDS, 80)),
+                     metadata={"file_name": f"doc{(first + i) // 20}.txt"},
+                     embedding=vector.tolist())
+            for i, vector in enumerate(vectors)])
+    index.storage_context.persist(persist_dir=persist_dir)
+
+
+def load_case(persist_dir: str, binary: bool, dim: int) -> dict:
+    Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=dim)
+    before = rss_mb()
+    start = time.perf_counter()
+    storage = open_storage(persist_dir) if binary else StorageContext.from_defaults(
+        persist_dir=persist_dir)
+    index = load_index_from_storage(storage)
+    load = time.perf_counter() - start
+    loaded = rss_mb() - before
+    start = time.perf_counter()
+    VectorIndexRetriever(index, similarity_top_k=5).retrieve("robot cloud")
+    return {"load_s": load, "rss_mb": loaded, "first_query_ms": (time.perf_counter() - start) * 1000,
+            "after_query_mb": rss_mb() - before}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON vs binary index persistence")
+    parser.add_argument("--nodes", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    Settings.embed_model = get_embedding_model(LLMType.MOCK, embed_dim=args.dim)
+    root = tempfile.mkdtemp(prefix="storage_format_")
+    json_dir, binary_dir = os.path.join(root, "json"), os.path.join(root, "binary")
+    try:
+        build(json_dir, args.nodes, args.dim)
+        shutil.copytree(json_dir, binary_dir)
+        load_index_from_storage(open_storage(binary_dir)).storage_context.persist(binary_dir)
+
+        print(f"{args.nodes} nodes, dim={args.dim}")
+        print(f"{'format':<7} {'disk MB':>8} {'load s':>8} {'RSS MB':>8} {'1st query ms':>13} "
+              f"{'RSS after MB':>13}")
+        for name, persist_dir, binary in (("json", json_dir, False),
+                                          ("binary", binary_dir, True)):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                r = pool.submit(load_case, persist_dir, binary, args.dim).result()
+            print(f"{name:<7} {directory_mb(persist_dir):>8.0f} {r['load_s']:>8.2f} "
+                  f"{r['rss_mb']:>8.0f} {r['first_query_ms']:>13.1f} {r['after_query_mb']:>13.0f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
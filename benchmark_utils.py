@@ -0,0 +1,33 @@
+# benchmark_utils.py
+# Helpers shared by the benchmark scripts. Kept free of module-level setup, so
+# importing it does not start servers or build indexes the way importing
+# another benchmark script would.
+
+# (question, phrase that marks a relevant chunk)
+QUESTIONS = [
+    ("What is Cloud Club?", "Cloud Club"),
+    ("Where does Byte live?", "Byteville"),
+    ("Who is Roomba Prime?", "Roomba Prime"),
+    ("What did ChillFactor do?", "ChillFactor"),
+    ("Who is Jeff?", "Jeff"),
+    ("What does Machina want?", "Machina"),
+    ("What was wrong with the hot chocolate?", "mashed potatoes"),
+    ("How much marshmallow fluff is in the perfect cup?", "42%"),
+    ("Why did the robot break up with the vacuum cleaner?", "vacuum"),
+    ("What happened with the Wi-Fi?", "Wi-Fi"),
+    ("What does the Toastmaster say?", "Toastmaster"),
+    ("Who is Sarah?", "Sarah"),
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096 / 2**20
@@ -0,0 +1,84 @@
+# benchmark_vector_store.py
+# Build time, memory and query latency of NumpyVectorStore against LlamaIndex's
+# default SimpleVectorStore at growing corpus sizes. Vectors are random (the
+# stores never look at text), nodes are added in batches as an ingest would,
+# and each case runs in a fresh process so its memory can be read off the RSS.
+# SimpleVectorStore keeps one Python float object per dimension, so it is
+# skipped above --max-simple nodes.
+#
+#   python benchmark_vector_store.py --sizes 10000 100000 1000000 --dim 256
+import argparse
+import gc
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from benchmark_utils import percentile, rss_mb
+from numpy_vector_store import NumpyVectorStore
+
+STORES = {"simple": SimpleVectorStore, "numpy": NumpyVectorStore}
+BATCH_SIZE = 10_000
+
+
+def run_case(store_name: str, size: int, dim: int, queries: int, batch: int) -> dict:
+    rng = np.random.default_rng(0)
+    gc.collect()
+    before = rss_mb()
+    store = STORES[store_name]()
+    start = time.perf_counter()
+    for first in range(0, size, BATCH_SIZE):
+        vectors = rng.standard_normal((min(BATCH_SIZE, size - first), dim), dtype=np.float32)
+        store.add([TextNode(id_=f"n{first + i}", text="", embedding=vector.tolist())
+                   for i, vector in enumerate(vectors)])
+    build = time.perf_counter() - start
+    gc.collect()
+    memory = rss_mb() - before
+
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32).tolist()
+    latencies = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        store.query(VectorStoreQuery(query_embedding=vector, similarity_top_k=5))
+        latencies.append(time.perf_counter() - start)
+    result = {"build_s": build, "memory_mb": memory,
+              "p50_ms": percentile(latencies, 50) * 1000,
+              "p99_ms": percentile(latencies, 99) * 1000}
+    if store_name == "numpy":
+        start = time.perf_counter()
+        for first in range(0, queries, batch):
+            store.query_many(query_vectors[first:first + batch], 5)
+        result["batched_qps"] = queries / (time.perf_counter() - start)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NumpyVectorStore vs SimpleVectorStore")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=16, help="queries per query_many call")
+    parser.add_argument("--max-simple", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"dim={args.dim}, top_k=5, {args.queries} queries per case")
+    print(f"{'store':<7} {'nodes':>9} {'build s':>8} {'MB':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'batched q/s':>12}")
+    for size in args.sizes:
+        for store_name in STORES:
+            if store_name == "simple" and size > args.max_simple:
+                print(f"{store_name:<7} {size:>9} {'skipped (--max-simple)':>28}")
+                continue
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                r = pool.submit(run_case, store_name, size, args.dim, args.queries,
+                                args.batch).result()
+            batched = f"{r['batched_qps']:>12.0f}" if "batched_qps" in r else f"{'-':>12}"
+            print(f"{store_name:<7} {size:>9} {r['build_s']:>8.2f} {r['memory_mb']:>8.0f} "
+                  f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {batched}")
+
+
+if __name__ == "__main__":
+    main()
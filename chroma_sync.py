@@ -0,0 +1,208 @@
+# chroma_sync.py
+# Idempotent ingestion into a persistent Chroma collection. Node ids are derived
+# from the source document id and a hash of the chunk text, so re-ingesting an
+# unchanged folder yields ids the collection already holds: only new chunks are
+# embedded and upserted, and chunks of removed or edited files are deleted.
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.indices.utils import embed_nodes
+from llama_index.core.schema import (BaseNode, MetadataMode, RelatedNodeInfo,
+                                     TransformComponent)
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from llama_index.vector_stores.chroma.base import MAX_CHUNK_SIZE
+
+from dimension_reduction import ProjectedEmbedding, load_projection, with_projection
+from parallel_ingest import (DEFAULT_FILES_PER_TASK, DEFAULT_WORKERS, iter_nodes,
+                             list_files, record_files)
+
+logger = logging.getLogger(__name__)
+
+# Ids looked up in / deleted from the collection per call
+ID_BATCH_SIZE = int(os.getenv("CHROMA_ID_BATCH_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class HNSWParams:
+    """
+    HNSW index settings of a Chroma collection (Chroma's defaults unless set
+    through the environment). Higher m and ef_construction build a better
+    graph, higher ef_search searches more of it: better recall, slower queries.
+    Only ef_search can be changed once the collection exists.
+    """
+
+    space: str = os.getenv("CHROMA_HNSW_SPACE", "l2")  # "l2", "cosine" or "ip"
+    m: int = int(os.getenv("CHROMA_HNSW_M", "16"))
+    ef_construction: int = int(os.getenv("CHROMA_HNSW_EF_CONSTRUCTION", "100"))
+    ef_search: int = int(os.getenv("CHROMA_HNSW_EF_SEARCH", "100"))
+
+    def configuration(self) -> dict:
+        return {"hnsw": {"space": self.space, "max_neighbors": self.m,
+                         "ef_construction": self.ef_construction, "ef_search": self.ef_search}}
+
+
+def open_collection(client, name: str, hnsw: Optional[HNSWParams] = None):
+    """
+    get_or_create_collection with HNSW settings. An existing collection keeps
+    the space, m and ef_construction it was built with (a mismatch is logged;
+    delete the collection to rebuild it), while ef_search is updated in place;
+    a client that has already loaded the index picks it up when restarted.
+    """
+    hnsw = hnsw or HNSWParams()
+    wanted = hnsw.configuration()["hnsw"]
+    collection = client.get_or_create_collection(name, configuration={"hnsw": wanted})
+    current = (collection.configuration or {}).get("hnsw") or {}
+    fixed = {key: (current.get(key), value) for key, value in wanted.items()
+             if key != "ef_search" and key in current and current[key] != value}
+    if fixed:
+        logger.warning("Collection %s keeps the HNSW settings it was built with "
+                       "(current, requested): %s", name, fixed)
+    if current.get("ef_search") != hnsw.ef_search:
+        collection.modify(configuration={"hnsw": {"ef_search": hnsw.ef_search}})
+    return collection
+
+
+class StableNodeIds(TransformComponent):
+    """
+    Replace the random ids a node parser assigns with ids derived from the ref
+    doc id and the hash of the text that gets embedded. Runs after the parser.
+    """
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        remap = {}
+        seen = Counter()
+        for node in nodes:
+            text = node.get_content(metadata_mode=MetadataMode.EMBED)
+            key = f"{node.ref_doc_id}\0{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+            # Repeated chunks in one document get an occurrence number
+            seen[key] += 1
+            digest = hashlib.sha256(f"{key}\0{seen[key]}".encode("utf-8")).digest()
+            remap[node.node_id] = str(uuid.UUID(bytes=digest[:16]))
+        for node in nodes:
+            node.id_ = remap[node.node_id]
+            for related in node.relationships.values():
+                for info in related if isinstance(related, list) else [related]:
+                    if isinstance(info, RelatedNodeInfo) and info.node_id in remap:
+                        info.node_id = remap[info.node_id]
+        return nodes
+
+
+class UpsertChromaVectorStore(ChromaVectorStore):
+    """ChromaVectorStore whose add() upserts, so re-adding an existing id is not an error."""
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        ids = []
+        for start in range(0, len(nodes), MAX_CHUNK_SIZE):
+            batch = nodes[start:start + MAX_CHUNK_SIZE]
+            metadatas = []
+            for node in batch:
+                metadata = node_to_metadata_dict(node, remove_text=True,
+                                                 flat_metadata=self.flat_metadata)
+                metadatas.append({k: "" if v is None else v for k, v in metadata.items()})
+            self._collection.upsert(
+                ids=[node.node_id for node in batch],
+                embeddings=[node.get_embedding() for node in batch],
+                metadatas=metadatas,
+                documents=[node.get_content(metadata_mode=MetadataMode.NONE) for node in batch])
+            ids.extend(node.node_id for node in batch)
+        return ids
+
+
+@dataclass
+class SyncStats:
+    chunks: int = 0
+    embedded: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (f"chunks={self.chunks} embedded={self.embedded} deleted={self.deleted} "
+                f"in {self.seconds:.2f}s")
+
+
+def collection_ids(collection, where: Optional[dict] = None) -> list[str]:
+    ids = []
+    while True:
+        page = collection.get(where=where or None, include=[], limit=ID_BATCH_SIZE,
+                              offset=len(ids))["ids"]
+        ids.extend(page)
+        if len(page) < ID_BATCH_SIZE:
+            return ids
+
+
+def _check_dimensions(collection, dimensions: int) -> None:
+    stored = collection.peek(1)["embeddings"]
+    if stored is not None and len(stored) and len(stored[0]) != dimensions:
+        raise ValueError(f"Collection {collection.name} holds {len(stored[0])}-dimension "
+                         f"vectors, not {dimensions}: delete it and sync again.")
+
+
+def sync_collection(folder: str, vector_store: UpsertChromaVectorStore,
+                    workers: int = DEFAULT_WORKERS,
+                    files_per_task: int = DEFAULT_FILES_PER_TASK, recursive: bool = False,
+                    files: Optional[dict] = None,
+                    projection_dir: Optional[str] = None) -> tuple[VectorStoreIndex, SyncStats]:
+    """
+    Make the collection hold exactly the chunks of the files in `folder`.
+    Files are parsed and chunked in parallel (Settings.transformations plus
+    StableNodeIds); chunks whose ids are already stored are not embedded again.
+    `files` is filled like parallel_ingest.build_index's. With a PCA-reduced
+    embedding model (EMBED_DIMENSIONS), the projection is kept in
+    `projection_dir`; without a saved one it is fitted on this run's chunks and
+    every chunk is embedded again. Returns (index, SyncStats).
+    """
+    if not folder:
+        raise ValueError("The 'folder' parameter cannot be null or empty.")
+    embed_model = Settings.embed_model
+    refit = False
+    if isinstance(embed_model, ProjectedEmbedding):
+        if not projection_dir:
+            raise ValueError("sync_collection needs a projection_dir for a PCA-reduced "
+                             "embedding model.")
+        # Stored vectors are only comparable with the projection they were built with
+        refit = not load_projection(embed_model, projection_dir)
+        if refit:
+            embed_model.projection = None
+            _check_dimensions(vector_store.client, embed_model.dimensions)
+    start = time.perf_counter()
+    stats = SyncStats()
+    collection = vector_store.client
+    transformations = list(Settings.transformations)
+    if not any(isinstance(t, StableNodeIds) for t in transformations):
+        transformations.append(StableNodeIds())
+
+    paths = list_files(folder, recursive)
+    wanted = set()
+    batches = iter_nodes(paths, workers, files_per_task, transformations)
+    for infos, nodes in with_projection(embed_model, batches, projection_dir):
+        record_files(files, folder, infos)
+        stats.chunks += len(nodes)
+        ids = [node.node_id for node in nodes]
+        wanted.update(ids)
+        stored = set()
+        # After a refit every chunk needs a vector from the new projection
+        for i in range(0, 0 if refit else len(ids), ID_BATCH_SIZE):
+            stored.update(collection.get(ids=ids[i:i + ID_BATCH_SIZE], include=[])["ids"])
+        missing = [node for node in nodes if node.node_id not in stored]
+        if missing:
+            embeddings = embed_nodes(missing, embed_model)
+            for node in missing:
+                node.embedding = embeddings[node.node_id]
+            vector_store.add(missing)
+            stats.embedded += len(missing)
+
+    # Chunks of deleted files and the old chunks of edited files
+    stale = [node_id for node_id in collection_ids(collection) if node_id not in wanted]
+    for i in range(0, len(stale), ID_BATCH_SIZE):
+        collection.delete(ids=stale[i:i + ID_BATCH_SIZE])
+    stats.deleted = len(stale)
+    stats.seconds = time.perf_counter() - start
+    return VectorStoreIndex.from_vector_store(vector_store), stats
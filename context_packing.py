@@ -0,0 +1,242 @@
+# context_packing.py
+# Response synthesis in exactly one LLM call. The default "compact" mode sends
+# retrieved chunks whole and issues refine calls when they overflow the
+# context window. Here the chunks are split into sentences, sentences repeated
+# across chunks (chunk overlap, duplicate files) are dropped, and the rest are
+# ranked by the query terms they contain (BM25-style idf, plus a share of their
+# neighbours' score so a relevant sentence keeps some of its context). The
+# best sentences are packed, in document order, until a hard prompt token
+# budget is reached. Each chunk's metadata header (file name etc.) is kept in
+# front of its sentences and is never deduplicated or ranked.
+import math
+import os
+import re
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+from llama_index.core.base.response.schema import RESPONSE_TYPE
+from llama_index.core.llms import LLM
+from llama_index.core.prompts import BasePromptTemplate
+from llama_index.core.prompts.default_prompt_selectors import DEFAULT_TEXT_QA_PROMPT_SEL
+from llama_index.core.prompts.mixin import PromptDictType
+from llama_index.core.response_synthesizers.base import BaseSynthesizer
+from llama_index.core.schema import MetadataMode, NodeWithScore
+from llama_index.core.types import RESPONSE_TEXT_TYPE
+from llama_index.core.utils import get_tokenizer
+
+from hybrid_retriever import tokenize
+
+# Tokens of the whole prompt: template, question and packed context
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Share of the best neighbouring sentence's score a sentence inherits
+NEIGHBOUR_WEIGHT = 0.25
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_SPACE = re.compile(r"\s+")
+
+
+@dataclass
+class PackingStats:
+    queries: int = 0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    context_tokens: int = 0  # retrieved text before packing
+    packed_tokens: int = 0
+    duplicate_sentences: int = 0
+    dropped_sentences: int = 0  # over the budget
+
+    def add(self, other: "PackingStats") -> None:
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def __str__(self) -> str:
+        queries = self.queries or 1
+        return (f"queries={self.queries} llm_calls={self.llm_calls} "
+                f"prompt_tokens/query={self.prompt_tokens / queries:.0f} "
+                f"context_tokens/query={self.context_tokens / queries:.0f}->"
+                f"{self.packed_tokens / queries:.0f} duplicates={self.duplicate_sentences} "
+                f"dropped={self.dropped_sentences}")
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def pack_context(query: str, chunks: Sequence[str], budget: int,
+                 count_tokens: Callable[[str], int],
+                 stats: Optional[PackingStats] = None,
+                 headers: Optional[Sequence[str]] = None) -> str:
+    """
+    Deduplicated, query-ranked sentences of `chunks` (best chunk first) within
+    `budget` tokens, each chunk's sentences kept in their original order and
+    preceded by its entry in `headers`, if any.
+    """
+    stats = stats if stats is not None else PackingStats()
+    headers = headers or [""] * len(chunks)
+    seen = set()
+    sentences = []  # (chunk, position, text, terms)
+    for chunk_number, chunk in enumerate(chunks):
+        stats.context_tokens += count_tokens(_with_header(headers[chunk_number], chunk))
+        for position, sentence in enumerate(split_sentences(chunk)):
+            key = _SPACE.sub(" ", sentence.lower())
+            if key in seen:
+                stats.duplicate_sentences += 1
+                continue
+            seen.add(key)
+            sentences.append((chunk_number, position, sentence, set(tokenize(sentence))))
+    if not sentences:
+        return ""
+
+    document_frequency = Counter(term for *_, terms in sentences for term in terms)
+    idf = {term: math.log(1 + (len(sentences) - df + 0.5) / (df + 0.5))
+           for term, df in document_frequency.items()}
+    query_terms = set(tokenize(query))
+    own = [sum(idf[t] for t in terms & query_terms) for *_, terms in sentences]
+    scores = []
+    for i, sentence in enumerate(sentences):
+        neighbours = [own[j] for j in (i - 1, i + 1)
+                      if 0 <= j < len(sentences) and sentences[j][0] == sentence[0]]
+        scores.append(own[i] + NEIGHBOUR_WEIGHT * max(neighbours, default=0.0))
+
+    # Greedy by score; earlier chunks and sentences win ties
+    order = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+    kept, used, shown = set(), 0, set()
+    for i in order:
+        chunk_number = sentences[i][0]
+        tokens = count_tokens(sentences[i][2]) + 1  # plus the separator
+        if chunk_number not in shown and headers[chunk_number]:
+            tokens += count_tokens(headers[chunk_number]) + 1
+        if used + tokens > budget:
+            stats.dropped_sentences += 1
+            continue
+        kept.add(i)
+        shown.add(chunk_number)
+        used += tokens
+
+    context = _join(sentences, kept, headers)
+    # Sentences are counted one by one; should the joined text come out longer,
+    # the lowest-ranked ones go
+    while kept and count_tokens(context) > budget:
+        kept.remove(min(kept, key=lambda i: (scores[i], -i)))
+        stats.dropped_sentences += 1
+        context = _join(sentences, kept, headers)
+    stats.packed_tokens += count_tokens(context)
+    return context
+
+
+def _with_header(header: str, text: str) -> str:
+    return f"{header}\n\n{text}" if header else text
+
+
+def _join(sentences: list, kept: set, headers: Sequence[str]) -> str:
+    by_chunk: dict[int, list[str]] = {}
+    for i in sorted(kept):
+        by_chunk.setdefault(sentences[i][0], []).append(sentences[i][2])
+    return "\n\n".join(_with_header(headers[chunk], " ".join(texts))
+                       for chunk, texts in by_chunk.items())
+
+
+# Nodes being synthesized, so get_response can pack their text apart from
+# their metadata headers
+_NODES: ContextVar[Optional[List[NodeWithScore]]] = ContextVar("packed_nodes", default=None)
+
+
+class PackedContextSynthesizer(BaseSynthesizer):
+    """
+    Answers from retrieved chunks with a single LLM call whose prompt is at
+    most `token_budget` tokens (see pack_context). `stats` totals the
+    PackingStats of all queries; `last_stats` holds the latest query's.
+    Only the text of each node is deduplicated and ranked; its LLM metadata
+    header is always kept in front of it.
+    """
+
+    def __init__(self, llm: Optional[LLM] = None, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 text_qa_template: Optional[BasePromptTemplate] = None,
+                 tokenizer: Optional[Callable[[str], list]] = None,
+                 streaming: bool = False, **kwargs: Any) -> None:
+        super().__init__(llm=llm, streaming=streaming, **kwargs)
+        self._token_budget = token_budget
+        self._text_qa_template = text_qa_template or DEFAULT_TEXT_QA_PROMPT_SEL
+        self._tokenizer = tokenizer or get_tokenizer()
+        self._stats = PackingStats()
+        self._last_stats = PackingStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> PackingStats:
+        return self._stats
+
+    @property
+    def last_stats(self) -> PackingStats:
+        return self._last_stats
+
+    def _get_prompts(self) -> PromptDictType:
+        return {"text_qa_template": self._text_qa_template}
+
+    def _update_prompts(self, prompts: PromptDictType) -> None:
+        if "text_qa_template" in prompts:
+            self._text_qa_template = prompts["text_qa_template"]
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def synthesize(self, query, nodes: List[NodeWithScore], *args: Any,
+                   **kwargs: Any) -> RESPONSE_TYPE:
+        token = _NODES.set(nodes)
+        try:
+            return super().synthesize(query, nodes, *args, **kwargs)
+        finally:
+            _NODES.reset(token)
+
+    async def asynthesize(self, query, nodes: List[NodeWithScore], *args: Any,
+                          **kwargs: Any) -> RESPONSE_TYPE:
+        token = _NODES.set(nodes)
+        try:
+            return await super().asynthesize(query, nodes, *args, **kwargs)
+        finally:
+            _NODES.reset(token)
+
+    @staticmethod
+    def _split_headers(text_chunks: Sequence[str]) -> tuple[Sequence[str], Optional[list]]:
+        # text_chunks are the nodes' LLM content when called through synthesize;
+        # called directly, they are packed as plain text
+        nodes = _NODES.get()
+        if nodes is None or len(nodes) != len(text_chunks):
+            return text_chunks, None
+        return ([n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes],
+                [n.node.get_metadata_str(mode=MetadataMode.LLM).strip() for n in nodes])
+
+    def _prepare(self, query_str: str, text_chunks: Sequence[str]) -> tuple:
+        template = self._text_qa_template.partial_format(query_str=query_str)
+        overhead = self._count_tokens(template.format(llm=self._llm, context_str=""))
+        metadata = self._llm.metadata
+        budget = min(self._token_budget, metadata.context_window - metadata.num_output)
+        stats = PackingStats(queries=1, llm_calls=1)
+        bodies, headers = self._split_headers(text_chunks)
+        context = pack_context(query_str, bodies, max(0, budget - overhead),
+                               self._count_tokens, stats, headers)
+        stats.prompt_tokens = self._count_tokens(template.format(llm=self._llm,
+                                                                 context_str=context))
+        with self._lock:
+            self._stats.add(stats)
+            self._last_stats = stats
+        return template, context
+
+    def get_response(self, query_str: str, text_chunks: Sequence[str],
+                     **response_kwargs: Any) -> RESPONSE_TEXT_TYPE:
+        template, context = self._prepare(query_str, text_chunks)
+        if self._streaming:
+            return self._llm.stream(template, context_str=context, **response_kwargs)
+        return self._llm.predict(template, context_str=context, **response_kwargs) or \
+            "Empty Response"
+
+    async def aget_response(self, query_str: str, text_chunks: Sequence[str],
+                            **response_kwargs: Any) -> RESPONSE_TEXT_TYPE:
+        template, context = self._prepare(query_str, text_chunks)
+        if self._streaming:
+            return await self._llm.astream(template, context_str=context, **response_kwargs)
+        return await self._llm.apredict(template, context_str=context, **response_kwargs) or \
+            "Empty Response"
@@ -0,0 +1,195 @@
+# dimension_reduction.py
+# Shorter embeddings for smaller and faster indexes. OpenAI's text-embedding-3
+# models shorten their vectors natively (the `dimensions` request parameter,
+# see llm_factory); for other models, such as nomic-embed-text on Ollama,
+# vectors are projected onto their top principal components. The PCA
+# projection is fitted on a sample of the corpus when an index is built and
+# saved next to it, so the index and every later query embedding go through
+# the same projection. The embedding cache sits below the projection and keeps
+# full vectors, so refitting never invalidates it.
+import os
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from model_wrappers import WrappedEmbedding
+
+# Nodes embedded at full size to fit the projection
+PCA_SAMPLE = int(os.getenv("PCA_SAMPLE", "2000"))
+PROJECTION_FNAME = "projection.npz"
+
+
+class PCAProjection:
+    """Mean-centred projection onto the top principal components."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained: float = 1.0):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # dimensions x input dimensions
+        self.explained = explained  # share of the sample's variance kept
+
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors, dimensions: int) -> "PCAProjection":
+        """
+        Fit on a sample. With fewer samples than dimensions the trailing
+        components are zero, so the output size is always `dimensions`.
+        """
+        sample = np.asarray(vectors, dtype=np.float32)
+        if dimensions > sample.shape[1]:
+            raise ValueError(f"Cannot project {sample.shape[1]}-dimension vectors "
+                             f"to {dimensions} dimensions.")
+        mean = sample.mean(axis=0)
+        _, singular, basis = np.linalg.svd(sample - mean, full_matrices=False)
+        rank = min(dimensions, len(basis))
+        components = np.zeros((dimensions, sample.shape[1]), dtype=np.float32)
+        components[:rank] = basis[:rank]
+        variance = float((singular ** 2).sum())
+        explained = float((singular[:rank] ** 2).sum()) / variance if variance else 1.0
+        return cls(mean, components, explained)
+
+    def transform(self, vectors) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components,
+                     explained=np.array(self.explained))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], float(data["explained"]))
+
+
+class ProjectedEmbedding(WrappedEmbedding):
+    """Embedding model whose vectors are reduced to `dimensions` by a PCAProjection."""
+
+    dimensions: int
+    _projection: Optional[PCAProjection] = PrivateAttr(default=None)
+
+    def __init__(self, inner: BaseEmbedding, dimensions: int, **kwargs) -> None:
+        kwargs.setdefault("model_name", f"{inner.model_name}@pca{dimensions}")
+        super().__init__(inner, dimensions=dimensions, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ProjectedEmbedding"
+
+    @property
+    def stats(self):
+        """The inner model's stats (e.g. CachedEmbedding's cache counters)."""
+        return self._inner.stats
+
+    @property
+    def projection(self) -> Optional[PCAProjection]:
+        return self._projection
+
+    @projection.setter
+    def projection(self, projection: Optional[PCAProjection]) -> None:
+        if projection is not None and projection.dimensions != self.dimensions:
+            raise ValueError(f"Projection has {projection.dimensions} dimensions, "
+                             f"expected {self.dimensions}.")
+        self._projection = projection
+
+    def _project(self, vectors: List[Embedding]) -> List[Embedding]:
+        if self._projection is None:
+            raise ValueError(f"No PCA projection for {self.model_name}: build or load an index "
+                             "first (persistent_index.load_index fits and saves one).")
+        return self._projection.transform(vectors).tolist()
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._project([self._inner._get_query_embedding(query)])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._project([await self._inner._aget_query_embedding(query)])[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._project([self._inner._get_text_embedding(text)])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return self._project([await self._inner._aget_text_embedding(text)])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._project(self._inner._get_text_embeddings(texts))
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._project(await self._inner._aget_text_embeddings(texts))
+
+
+def embedding_dimensions(embed_model: BaseEmbedding) -> Optional[int]:
+    """The output size requested anywhere in a chain of wrapped models, or None."""
+    while embed_model is not None:
+        dimensions = getattr(embed_model, "dimensions", None)
+        if dimensions:
+            return dimensions
+        embed_model = getattr(embed_model, "inner", None)
+    return None
+
+
+def load_projection(embed_model: BaseEmbedding, persist_dir: str) -> bool:
+    """
+    Load the projection saved with an index into a ProjectedEmbedding. Returns
+    False if the model needs a projection and none was saved.
+    """
+    if not isinstance(embed_model, ProjectedEmbedding):
+        return True
+    path = os.path.join(persist_dir, PROJECTION_FNAME)
+    if not os.path.exists(path):
+        return False
+    embed_model.projection = PCAProjection.load(path)
+    return True
+
+
+def save_projection(embed_model: BaseEmbedding, persist_dir: str) -> None:
+    """Save a ProjectedEmbedding's projection next to the index it built."""
+    if isinstance(embed_model, ProjectedEmbedding) and embed_model.projection is not None:
+        embed_model.projection.save(os.path.join(persist_dir, PROJECTION_FNAME))
+
+
+def fit_projection(embed_model: ProjectedEmbedding, nodes: List[BaseNode],
+                   persist_dir: Optional[str] = None) -> None:
+    """
+    Fit the projection on up to PCA_SAMPLE of `nodes` and save it to
+    persist_dir. The sampled nodes get their projected embeddings, so they are
+    not embedded a second time.
+    """
+    step = max(1, len(nodes) // PCA_SAMPLE)
+    sample = nodes[::step][:PCA_SAMPLE]
+    vectors = embed_model.inner.get_text_embedding_batch(
+        [node.get_content(metadata_mode=MetadataMode.EMBED) for node in sample])
+    embed_model.projection = PCAProjection.fit(vectors, embed_model.dimensions)
+    for node, vector in zip(sample, embed_model.projection.transform(vectors)):
+        node.embedding = vector.tolist()
+    if persist_dir:
+        save_projection(embed_model, persist_dir)
+
+
+def with_projection(embed_model: BaseEmbedding, batches: Iterable[tuple],
+                    persist_dir: Optional[str] = None) -> Iterator[tuple]:
+    """
+    Pass parallel_ingest.iter_nodes batches through. If embed_model is a
+    ProjectedEmbedding without a projection, the first batches are held back
+    until PCA_SAMPLE nodes have arrived and the projection is fitted on them.
+    """
+    batches = iter(batches)
+    if not isinstance(embed_model, ProjectedEmbedding) or embed_model.projection is not None:
+        yield from batches
+        return
+    held = []
+    for batch in batches:
+        held.append(batch)
+        if sum(len(nodes) for _, nodes in held) >= PCA_SAMPLE:
+            break
+    nodes = [node for _, batch_nodes in held for node in batch_nodes]
+    if nodes:
+        fit_projection(embed_model, nodes, persist_dir)
+    yield from held
+    yield from batches
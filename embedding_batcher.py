@@ -0,0 +1,191 @@
+# embedding_batcher.py
+# Micro-batching dispatcher for embedding models. Concurrent single-text async
+# calls (aget_query_embedding / aget_text_embedding) are queued and sent to the
+# backend as one batched request once max_batch_size texts are waiting or
+# max_wait_ms has passed, whichever comes first. Results are fanned back out to
+# the waiting callers. Ollama models are called through /api/embed on every path,
+# sync or async, so a text always gets the same (unit length) vector.
+import asyncio
+import os
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from model_wrappers import WrappedEmbedding
+
+# pylint: disable=protected-access
+
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+
+@dataclass
+class BatchStats:
+    requests: int = 0
+    batches: int = 0
+    queue_depth: int = 0  # texts currently waiting for a batch
+    max_queue_depth: int = 0
+    batch_sizes: Counter = field(default_factory=Counter)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def __str__(self) -> str:
+        return (f"requests={self.requests} batches={self.batches} "
+                f"mean_batch_size={self.mean_batch_size:.1f} "
+                f"queue_depth={self.queue_depth} max_queue_depth={self.max_queue_depth}")
+
+
+class _LoopDispatcher:
+    """Pending queue and flush timer for one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop,
+                 embed_batch: Callable[[List[str]], Awaitable[List[Embedding]]],
+                 max_batch_size: int, max_wait: float, stats: BatchStats):
+        self.loop = loop
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = stats
+        self.pending: list[tuple[str, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: set[asyncio.Task] = set()  # the loop only keeps weak references
+
+    def submit(self, text: str) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.pending.append((text, future))
+        self.stats.queue_depth += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth,
+                                         self.stats.queue_depth)
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(self.max_wait, self.flush)
+        return future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.pending:
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            self.stats.queue_depth -= len(batch)
+            task = self.loop.create_task(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        # Identical texts in one batch are embedded once
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        self.stats.batches += 1
+        self.stats.requests += len(batch)
+        self.stats.batch_sizes[len(unique)] += 1
+        try:
+            vectors = dict(zip(unique, await self.embed_batch(unique)))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled (e.g. the loop is shutting down): waiters must not hang
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+
+class BatchingEmbedding(WrappedEmbedding):
+    """
+    Coalesces concurrent async single-text embedding calls into batched
+    backend requests. Sync calls are passed straight through.
+    Set batch_queries=False for models that embed queries differently from
+    documents; Ollama and OpenAI models embed both the same way.
+    """
+
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+    max_wait_ms: float = DEFAULT_MAX_WAIT_MS
+    batch_queries: bool = True
+
+    _dispatchers: Any = PrivateAttr()
+    _stats: BatchStats = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, **kwargs: Any) -> None:
+        super().__init__(inner, **kwargs)
+        self._dispatchers = weakref.WeakKeyDictionary()
+        self._stats = BatchStats()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BatchingEmbedding"
+
+    @property
+    def stats(self) -> BatchStats:
+        return self._stats
+
+    def _is_ollama(self) -> bool:
+        return self._inner.class_name() == "OllamaEmbedding"
+
+    def _ollama_embed(self, texts: List[str]) -> List[Embedding]:
+        # /api/embed returns unit-length vectors, OllamaEmbedding's
+        # /api/embeddings raw ones; the sync calls use /api/embed as well
+        inner = self._inner
+        response = inner._client.embed(model=inner.model_name, input=texts,
+                                       options=inner.ollama_additional_kwargs)
+        return [list(vector) for vector in response["embeddings"]]
+
+    async def _embed_batch(self, texts: List[str]) -> List[Embedding]:
+        inner = self._inner
+        if self._is_ollama():
+            # OllamaEmbedding sends one request per text; /api/embed takes a list
+            response = await inner._async_client.embed(
+                model=inner.model_name, input=texts,
+                options=inner.ollama_additional_kwargs)
+            return [list(vector) for vector in response["embeddings"]]
+        return await inner._aget_text_embeddings(texts)
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        if self._is_ollama():
+            return self._ollama_embed([query])[0]
+        return super()._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        if self._is_ollama():
+            return self._ollama_embed([text])[0]
+        return super()._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        if self._is_ollama():
+            return self._ollama_embed(texts)
+        return super()._get_text_embeddings(texts)
+
+    def _dispatcher(self) -> _LoopDispatcher:
+        loop = asyncio.get_running_loop()
+        dispatcher = self._dispatchers.get(loop)
+        if dispatcher is None:
+            dispatcher = _LoopDispatcher(loop, self._embed_batch, self.max_batch_size,
+                                         self.max_wait_ms / 1000.0, self._stats)
+            self._dispatchers[loop] = dispatcher
+        return dispatcher
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        if not self.batch_queries:
+            if self._is_ollama():
+                return (await self._embed_batch([query]))[0]
+            return await self._inner._aget_query_embedding(query)
+        return await self._dispatcher().submit(query)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await self._dispatcher().submit(text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await asyncio.gather(*(self._dispatcher().submit(t) for t in texts))
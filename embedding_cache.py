@@ -0,0 +1,269 @@
+# embedding_cache.py
+# Persistent, content-addressed embedding cache. Vectors live in one
+# memory-mapped float32 file per model; a SQLite index maps
+# (model name, text hash) to a row of that file and tracks last access for
+# LRU eviction. SQLite's file locking makes the cache safe to share between
+# processes: lookups run in a read transaction and writers take an exclusive
+# lock, so a slot is never overwritten while another process is reading it.
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from model_wrappers import WrappedEmbedding
+
+# pylint: disable=protected-access
+
+DEFAULT_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", ".embedding_cache")
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+_SQL_CHUNK = 500
+
+
+def text_key(text: str, kind: str = "text") -> str:
+    """Content hash of a text; query and text embeddings are kept apart."""
+    return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0  # UTF-8 text bytes that did not go to the model
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (f"hits={self.hits} misses={self.misses} "
+                f"hit_rate={self.hit_rate:.1%} bytes_saved={self.bytes_saved}")
+
+
+class EmbeddingStore:
+    """Memory-mapped float32 vector file plus SQLite index, shared across processes."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"),
+                                     timeout=60.0, isolation_level=None,
+                                     check_same_thread=False)
+        self._lock = threading.RLock()
+        self._maps = {}  # model -> np.memmap
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY, dim INTEGER NOT NULL, file TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (
+                model TEXT NOT NULL, key TEXT NOT NULL, slot INTEGER NOT NULL,
+                last_access REAL NOT NULL, PRIMARY KEY (model, key));
+            CREATE UNIQUE INDEX IF NOT EXISTS entries_slot ON entries (model, slot);
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries (model, last_access);
+        """)
+
+    def _capacity(self, dim: int) -> int:
+        limit = self.max_entries
+        if self.max_bytes:
+            limit = min(limit, max(1, self.max_bytes // (dim * 4)))
+        return limit
+
+    def _model_info(self, model: str):
+        return self._conn.execute(
+            "SELECT dim, file FROM models WHERE model = ?", (model,)).fetchone()
+
+    def _vectors(self, model: str, dim: int, file: str, min_rows: int) -> np.memmap:
+        # Another process may have grown the file since it was mapped here
+        vectors = self._maps.get(model)
+        if vectors is None or vectors.shape[0] < min_rows:
+            path = os.path.join(self.cache_dir, file)
+            rows = os.path.getsize(path) // (dim * 4)
+            vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(rows, dim))
+            self._maps[model] = vectors
+        return vectors
+
+    def _grow(self, model: str, dim: int, file: str, rows: int) -> None:
+        path = os.path.join(self.cache_dir, file)
+        current = os.path.getsize(path) // (dim * 4)
+        if rows > current:
+            new_rows = min(self._capacity(dim), max(rows, current * 2, 1024))
+            with open(path, "r+b") as f:
+                f.truncate(new_rows * dim * 4)
+            self._maps.pop(model, None)
+
+    def get_many(self, model: str, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Batch lookup; returns a vector copy or None for every key."""
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            info = self._model_info(model)
+            if info is None or not keys:
+                return results
+            dim, file = info
+            self._conn.execute("BEGIN")
+            try:
+                slots = {}
+                for start in range(0, len(keys), _SQL_CHUNK):
+                    chunk = keys[start:start + _SQL_CHUNK]
+                    marks = ",".join("?" * len(chunk))
+                    slots.update(self._conn.execute(
+                        f"SELECT key, slot FROM entries WHERE model = ? AND key IN ({marks})",
+                        (model, *chunk)).fetchall())
+                if slots:
+                    vectors = self._vectors(model, dim, file, max(slots.values()) + 1)
+                    for i, key in enumerate(keys):
+                        slot = slots.get(key)
+                        if slot is not None:
+                            results[i] = np.array(vectors[slot])
+            finally:
+                self._conn.execute("COMMIT")
+            if slots:
+                self._touch(model, list(slots))
+        return results
+
+    def _touch(self, model: str, keys: List[str]) -> None:
+        now = time.time()
+        for start in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[start:start + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            self._conn.execute(
+                f"UPDATE entries SET last_access = ? WHERE model = ? AND key IN ({marks})",
+                (now, model, *chunk))
+
+    def put_many(self, model: str, keys: List[str], embeddings: List[Embedding]) -> None:
+        """Store vectors, evicting least recently used entries when full."""
+        if not keys:
+            return
+        array = np.asarray(embeddings, dtype=np.float32)
+        dim = array.shape[1]
+        with self._lock:
+            self._conn.execute("BEGIN EXCLUSIVE")
+            try:
+                info = self._model_info(model)
+                if info is None:
+                    file = re.sub(r"[^A-Za-z0-9_.-]", "_", model) + f"-{dim}.f32"
+                    open(os.path.join(self.cache_dir, file), "ab").close()
+                    self._conn.execute(
+                        "INSERT INTO models (model, dim, file) VALUES (?, ?, ?)",
+                        (model, dim, file))
+                    info = (dim, file)
+                if info[0] != dim:
+                    raise ValueError(
+                        f"Embedding dimension changed for {model}: {info[0]} -> {dim}")
+                file = info[1]
+                capacity = self._capacity(dim)
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM entries WHERE model = ?", (model,)).fetchone()[0]
+                now = time.time()
+                writes = []
+                for key, vector in zip(keys, array):
+                    row = self._conn.execute(
+                        "SELECT slot FROM entries WHERE model = ? AND key = ?",
+                        (model, key)).fetchone()
+                    if row is not None:
+                        slot = row[0]
+                    elif count < capacity:
+                        slot = count
+                        count += 1
+                    else:
+                        slot = self._conn.execute(
+                            "SELECT slot FROM entries WHERE model = ? "
+                            "ORDER BY last_access LIMIT 1", (model,)).fetchone()[0]
+                        self._conn.execute(
+                            "DELETE FROM entries WHERE model = ? AND slot = ?", (model, slot))
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (model, key, slot, last_access) "
+                        "VALUES (?, ?, ?, ?)", (model, key, slot, now))
+                    writes.append((slot, vector))
+                self._grow(model, dim, file, count)
+                vectors = self._vectors(model, dim, file, count)
+                for slot, vector in writes:
+                    vectors[slot] = vector
+                vectors.flush()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._maps.clear()
+            self._conn.close()
+
+
+class CachedEmbedding(WrappedEmbedding):
+    """
+    Wraps an embedding model so that only cache misses reach the backend.
+    Vectors are keyed by (model name, text hash) in a shared EmbeddingStore.
+    """
+
+    _store: EmbeddingStore = PrivateAttr()
+    _stats: CacheStats = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, store: Optional[EmbeddingStore] = None,
+                 **kwargs: Any) -> None:
+        super().__init__(inner, **kwargs)
+        self._store = store or EmbeddingStore()
+        self._stats = CacheStats()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._stats
+
+    def _lookup(self, texts: List[str], kind: str):
+        keys = [text_key(t, kind) for t in texts]
+        found = self._store.get_many(self.model_name, keys)
+        misses = [i for i, vector in enumerate(found) if vector is None]
+        self._stats.hits += len(texts) - len(misses)
+        self._stats.misses += len(misses)
+        self._stats.bytes_saved += sum(len(texts[i].encode("utf-8"))
+                                       for i, v in enumerate(found) if v is not None)
+        return keys, found, misses
+
+    def _merge(self, keys, found, misses, computed) -> List[Embedding]:
+        self._store.put_many(self.model_name, [keys[i] for i in misses], computed)
+        for i, vector in zip(misses, computed):
+            found[i] = vector
+        return [list(map(float, v)) if isinstance(v, np.ndarray) else v for v in found]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        keys, found, misses = self._lookup([query], "query")
+        computed = [self._inner._get_query_embedding(query)] if misses else []
+        return self._merge(keys, found, misses, computed)[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        keys, found, misses = self._lookup([query], "query")
+        computed = [await self._inner._aget_query_embedding(query)] if misses else []
+        return self._merge(keys, found, misses, computed)[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, found, misses = self._lookup(texts, "text")
+        computed = self._inner._get_text_embeddings(
+            [texts[i] for i in misses]) if misses else []
+        return self._merge(keys, found, misses, computed)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, found, misses = self._lookup(texts, "text")
+        computed = await self._inner._aget_text_embeddings(
+            [texts[i] for i in misses]) if misses else []
+        return self._merge(keys, found, misses, computed)
@@ -1,12 +1,15 @@
 import os
 
 from dotenv import load_dotenv
-from llama_index.core import (Settings, SimpleDirectoryReader, StorageContext,
-                              VectorStoreIndex, load_index_from_storage,
+from llama_index.core import (Settings, load_index_from_storage,
                               set_global_handler)
-from llama_index.embeddings.ollama import OllamaEmbedding
 from llama_index.llms.ollama import Ollama
 
+from dimension_reduction import load_projection, save_projection
+from llm_factory import LLMType, get_embedding_model
+from parallel_ingest import build_index
+from persistent_index import open_storage
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,27 +22,28 @@ os.environ["OTEL_EXPORTER_OTLP_HEADERS"] = f"api_key={PHOENIX_API_KEY}"
 set_global_handler(
     "arize_phoenix", endpoint="https://llamatrace.com/v1/traces")
 
-# Configure embedding and LLM models using Ollama
-Settings.embed_model = OllamaEmbedding(
-    model_name="nomic-embed-text:latest")
+# Configure embedding and LLM models using Ollama; embeddings go through the
+# persistent embedding cache so unchanged chunks are not re-embedded
+Settings.embed_model = get_embedding_model(
+    LLMType.OLLAMA, embed_model="nomic-embed-text:latest", cache=True)
 Settings.llm = Ollama(model="phi4:latest",
                       temperature=0.1,
                       request_timeout=360.0)
 
-# Load documents from the 'data' directory
-documents = SimpleDirectoryReader("data").load_data()
-
 # Check if a persistent storage directory exists
 if os.path.exists("storage"):
     print("Loading index from storage...")
-    # Load the index from existing storage
-    storage_context = StorageContext.from_defaults(persist_dir="storage")
-    index = load_index_from_storage(storage_context)
+    # Load the index from existing storage; the vectors (.npy) and nodes (pack
+    # file) are memory-mapped, and node text is only read when retrieved
+    load_projection(Settings.embed_model, "storage")  # only used with EMBED_DIMENSIONS
+    index = load_index_from_storage(open_storage("storage"))
 else:
     print("Create the new index...")
-    # Create a new index from documents and persist it
-    index = VectorStoreIndex.from_documents(documents)
+    # Create a new index from the 'data' directory (files are read and chunked
+    # in parallel worker processes) and persist it
+    index = build_index("data", storage_context=open_storage())
     index.storage_context.persist(persist_dir="storage")
+    save_projection(Settings.embed_model, "storage")
 
 # Create a query engine from the index
 query_engine = index.as_query_engine()
@@ -50,3 +54,4 @@ response = query_engine.query(
 
 # Print the response
 print(response)
+print(f"Embedding cache: {Settings.embed_model.stats}")
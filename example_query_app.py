@@ -1,13 +1,33 @@
-# Import core LlamaIndex classes for document loading, indexing, and settings
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings
-# Import Ollama embedding and LLM classes for local model inference
-from llama_index.embeddings.ollama import OllamaEmbedding
+import atexit
+import os
+import time
+
+# Import core LlamaIndex settings
+from llama_index.core import Settings
+from llama_index.core.base.response.schema import StreamingResponse
+from llama_index.core.query_engine import RetrieverQueryEngine
+# Import Ollama LLM class for local model inference
 from llama_index.llms.ollama import Ollama
 # Import spinner for user feedback during long operations
 from halo import Halo
 
 # Import custom color class for colored console output
 from color import Color
+# Import the model factory for the cached embedding model
+from llm_factory import LLMType, get_embedding_model
+# Import the persisted, incrementally refreshed index
+from persistent_index import DEFAULT_PERSIST_DIR, load_index
+# Import the folder watcher that keeps the live index in sync (INDEX_WATCH=1)
+from index_watcher import WATCH_ENABLED, IndexWatcher
+# Import the semantic answer cache for near-duplicate questions
+from semantic_cache import SemanticCache, SemanticCacheQueryEngine
+# Import the ingestion metadata and the retriever for scoped questions
+from metadata_index import SectionMetadata
+from scoped_retriever import ScopedRetriever, split_scope
+
+# Print answers token by token as they are generated (QUERY_STREAMING=0 waits
+# for the full answer behind the spinner instead)
+STREAMING = os.getenv("QUERY_STREAMING", "1") == "1"
 
 
 def console_print(message: str, color_name: str = Color.WHITE) -> None:
@@ -24,23 +44,80 @@ def load_document(folder: str = ""):
     spinner.start()
 
     # Set up the embedding and LLM using local Ollama models
-    # Embedding model: nomic-embed-text (via Ollama)
+    # Embedding model: nomic-embed-text (via Ollama, behind the persistent
+    # embedding cache so unchanged chunks are not re-embedded)
     # LLM: llama3.2 (via Ollama)
-    Settings.embed_model = OllamaEmbedding(
-        model_name="nomic-embed-text:latest")
+    Settings.embed_model = get_embedding_model(
+        LLMType.OLLAMA, embed_model="nomic-embed-text:latest", cache=True)
     Settings.llm = Ollama(model="llama3.2", request_timeout=360.0)
-
-    # Load all text files from the folder into Document objects
-    documents = SimpleDirectoryReader(folder).load_data()
-    # Create a vector index from the loaded documents
-    index: VectorStoreIndex = VectorStoreIndex.from_documents(documents)
-    # Create a query engine for answering questions
-    base_query_engine = index.as_query_engine()
+    # Record each chunk's folder, file type, mtime and Markdown heading, so
+    # questions can be scoped with file:, folder:, type:, section:, after:
+    # and before: terms
+    Settings.transformations = [Settings.node_parser, SectionMetadata()]
+
+    # Load the persisted index and re-embed only files that were added,
+    # changed or deleted since the last run
+    index, refresh = load_index(folder)
+    # Create a query engine for answering questions. The retriever searches
+    # whatever the index holds at query time (index.as_query_engine() would
+    # pin the nodes that exist now and miss files added in watch mode); a
+    # scoped question ("file:story.txt Who ...?") searches only the chunks in
+    # its scope
+    base_query_engine = RetrieverQueryEngine.from_args(
+        ScopedRetriever(index), streaming=STREAMING)
+    # Answer near-duplicate questions with the same scope from the semantic
+    # cache; cached answers are dropped whenever the files in the folder change
+    cache = SemanticCache(folder=folder)
+    query_engine = SemanticCacheQueryEngine(
+        base_query_engine, Settings.embed_model, cache, split_scope=split_scope)
     # Stop the spinner after processing
     spinner.stop()
     # Notify the user that the database is ready
-    console_print("The database is up to date.", Color.LIGHT_GRAY)
-    return base_query_engine
+    console_print(f"The database is up to date ({refresh}).", Color.LIGHT_GRAY)
+    if WATCH_ENABLED:
+        # Apply added, changed and deleted files to the live index while
+        # questions keep being answered
+        def on_refresh(stats) -> None:
+            cache.invalidate()
+            console_print(f"\n[index refreshed: {stats}]", Color.LIGHT_GRAY)
+
+        watcher = IndexWatcher(index, folder, persist_dir=DEFAULT_PERSIST_DIR,
+                               on_refresh=on_refresh).start()
+        atexit.register(watcher.stop)
+        console_print(f"Watching '{folder}' for changes.", Color.LIGHT_GRAY)
+    console_print(f"Embedding cache: {Settings.embed_model.stats}",
+                  Color.LIGHT_GRAY)
+    return query_engine
+
+
+def stream_answer(response: StreamingResponse, started: float) -> None:
+    # Print tokens as they arrive, then time-to-first-token and tokens/sec.
+    # Ctrl-C closes the token generator, which closes the HTTP stream and makes
+    # the model server stop generating.
+    tokens = response.response_gen
+    first = last = None
+    count = 0
+    try:
+        for token in tokens:
+            last = time.perf_counter()
+            if first is None:
+                first = last
+                spinner.stop()
+                print(Color.CYAN, end="")
+            count += 1
+            print(token, end="", flush=True)
+    except KeyboardInterrupt:
+        tokens.close()
+        spinner.stop()
+        console_print("\n[answer aborted]\n", Color.YELLOW)
+        return
+    spinner.stop()
+    print(Color.reset() + "\n")
+    if first is None:
+        return
+    rate = (count - 1) / (last - first) if count > 1 and last > first else 0.0
+    console_print(f"(first token {(first - started) * 1000:.0f} ms, "
+                  f"{count} tokens, {rate:.1f} tokens/s)\n", Color.LIGHT_GRAY)
 
 
 if __name__ == "__main__":
@@ -65,15 +142,29 @@ if __name__ == "__main__":
 
             # Start spinner while processing the query
             spinner.start()
-
-            # Query the index with the user's question
-            response = query_engine.query(user_question)
-
-            # Stop spinner after getting the response
-            spinner.stop()
-
-            # Print the response in cyan
-            console_print(str(response) + "\n", Color.CYAN)
+            started = time.perf_counter()
+
+            try:
+                # Query the index with the user's question
+                response = query_engine.query(user_question)
+            except KeyboardInterrupt:
+                # Ctrl-C during retrieval aborts the question, not the app
+                spinner.stop()
+                console_print("[question aborted]\n", Color.YELLOW)
+                continue
+
+            if isinstance(response, StreamingResponse):
+                # Print tokens as they are generated
+                stream_answer(response, started)
+            else:
+                # Stop spinner after getting the response
+                spinner.stop()
+                # Print the response in cyan
+                console_print(str(response) + "\n", Color.CYAN)
+            if query_engine.last_hit:
+                console_print(
+                    f"(cached answer, similarity {query_engine.last_similarity:.2f})\n",
+                    Color.LIGHT_GRAY)
 
         # Thank the user after exiting the loop
         console_print("Thank you for using the query engine!\n",
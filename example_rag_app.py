@@ -1,47 +1,146 @@
 # Import necessary modules for document loading, vector storage, retrieval, and query processing
+import os
+
 import chromadb
-from llama_index.embeddings.ollama import OllamaEmbedding
 from llama_index.llms.ollama import Ollama
-from llama_index.core import (SimpleDirectoryReader, StorageContext, Settings,
-                              VectorStoreIndex, get_response_synthesizer)
-from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core import (Settings, get_response_synthesizer)
+from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
 from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.postprocessor import SimilarityPostprocessor
-from llama_index.vector_stores.chroma import ChromaVectorStore
+from llm_factory import LLMType, get_embedding_model
+from chroma_sync import (StableNodeIds, UpsertChromaVectorStore, open_collection,
+                         sync_collection)
+from index_watcher import WATCH_ENABLED, IndexWatcher
+from hybrid_retriever import BM25Index, sync_bm25
+from mmr_postprocessor import MMRPostprocessor
+from context_packing import PackedContextSynthesizer
+from sharded_retriever import ShardedRetriever
+from metadata_index import SectionMetadata
+from scoped_retriever import ScopedRetriever
 
-# Set Ollama as the embedding model
-Settings.embed_model = OllamaEmbedding(model_name="nomic-embed-text")
-Settings.llm = Ollama(model="llama3.2", request_timeout=360.0)
+# RAG_HYBRID=1 fuses keyword (BM25) and vector search; by default vector
+# search alone is used
+HYBRID = os.getenv("RAG_HYBRID", "0") == "1"
+BM25_PATH = "./chroma_db/bm25_demo_collection.json"
+# Search documents sharded over several collections of ./chroma_db, e.g.
+# RAG_SHARDS=demo_collection,archive_2023,archive_2024
+SHARDS = [name.strip() for name in os.getenv("RAG_SHARDS", "").split(",") if name.strip()]
+# RAG_MMR=1 narrows 10 candidates to 3 diverse chunks within MMR_TOKEN_BUDGET
+# tokens (maximal marginal relevance); by default the plain top 3 are sent
+MMR = os.getenv("RAG_MMR", "0") == "1"
+TOP_K, CANDIDATES = 3, 10
+# RAG_PACK_CONTEXT=1 answers in one LLM call from the most relevant sentences,
+# within CONTEXT_TOKEN_BUDGET prompt tokens; by default the "compact"
+# synthesizer is used, which may add refine calls
+PACK_CONTEXT = os.getenv("RAG_PACK_CONTEXT", "0") == "1"
 
-# 1. Load Data from the 'data' directory
-# Reads all documents in the 'data' folder and prepares them for indexing
-documents = SimpleDirectoryReader("data").load_data()
+# Set Ollama as the embedding model, served through the persistent embedding
+# cache so unchanged chunks are not re-embedded on every run
+Settings.embed_model = get_embedding_model(
+    LLMType.OLLAMA, embed_model="nomic-embed-text", cache=True)
+Settings.llm = Ollama(model="llama3.2", request_timeout=360.0)
+# Record each chunk's folder, file type, mtime and Markdown heading for scoped
+# questions (file:, folder:, type:, section:, after:, before:), and derive node
+# ids from the file path and chunk text, so unchanged chunks keep their ids
+# across runs (and in watch mode). Chunks stored before SectionMetadata was
+# added lack that metadata until ./chroma_db is deleted and rebuilt.
+Settings.transformations = [Settings.node_parser, SectionMetadata(), StableNodeIds()]
+# Count LLM calls and prompt tokens per query
+token_counter = TokenCountingHandler()
+Settings.callback_manager = CallbackManager([token_counter])
 
-# 2. Index Data using ChromaDB
+# 1. Index Data using ChromaDB
 # Set up a persistent ChromaDB client and collection for storing document vectors (embeddings)
 db = chromadb.PersistentClient(path="./chroma_db")
-chroma_collection = db.get_or_create_collection("demo_collection")
-vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-# Create a storage context that wraps the vector store
-storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-# 3. Create the index
-# Build a VectorStoreIndex from the loaded documents and storage context
-index = VectorStoreIndex.from_documents(
-    documents, storage_context=storage_context)
-
-# 4. Create a query engine for retrieval-augmented generation (RAG)
-# Set up a retriever to fetch the top 3 most similar documents for a query
-retriever = VectorIndexRetriever(index=index, similarity_top_k=3)
+# HNSW settings come from CHROMA_HNSW_SPACE, _M, _EF_CONSTRUCTION and _EF_SEARCH
+# (see benchmark_hnsw.py for the recall/latency trade-off)
+chroma_collection = open_collection(db, "demo_collection")
+# Writes are upserts, so re-adding a chunk that is already stored is harmless
+vector_store = UpsertChromaVectorStore(chroma_collection=chroma_collection)
+
+# 2. Sync the 'data' directory into the collection and create the index
+# Files are read and chunked in parallel worker processes (INGEST_WORKERS).
+# Chunks already in the collection are skipped, new ones are embedded and
+# upserted in batches, and chunks of deleted or edited files are removed, so
+# a rerun over unchanged data makes no embedding calls.
+# `files` records which documents came from which file, for watch mode
+files = {}
+# With EMBED_DIMENSIONS set, the PCA projection is saved next to the collection
+index, sync_stats = sync_collection("data", vector_store, files=files,
+                                    projection_dir="./chroma_db/demo_collection")
+print(f"Collection sync: {sync_stats}")
+
+# Keep the persisted BM25 inverted index in line with the collection; only
+# chunks it has not seen are tokenized
+bm25 = BM25Index.from_persist_path(BM25_PATH)
+
+
+def refresh_bm25() -> None:
+    if any(sync_bm25(bm25, index)):
+        bm25.persist(BM25_PATH)
+
+
+refresh_bm25()
+
+# 3. Create a query engine for retrieval-augmented generation (RAG)
+if SHARDS:
+    # Embed the question once and query every shard at the same time; a shard
+    # slower than SHARD_TIMEOUT seconds is left out. BM25 only covers
+    # demo_collection, so sharded search is vector-only.
+    retriever = ShardedRetriever(
+        {name: UpsertChromaVectorStore(chroma_collection=open_collection(db, name))
+         for name in SHARDS},
+        similarity_top_k=CANDIDATES if MMR else TOP_K)
+    node_postprocessors = [SimilarityPostprocessor(similarity_threshold=0.5)]
+elif HYBRID:
+    # Fetch the top 3 chunks by reciprocal rank fusion of BM25 and vector
+    # search, which run concurrently; exact names like "Cloud Club" are found
+    # by keyword even when the embedding misses them. Fused scores are
+    # rank-based, so the cosine similarity cutoff does not apply to them.
+    # Scoped questions ("file:story.txt Who ...?") search only matching chunks.
+    retriever = ScopedRetriever(index, similarity_top_k=CANDIDATES if MMR else TOP_K,
+                                bm25=bm25)
+    node_postprocessors = []
+else:
+    # Set up a retriever to fetch the most similar documents for a query,
+    # within the question's scope if it has one
+    retriever = ScopedRetriever(index, similarity_top_k=CANDIDATES if MMR else TOP_K)
+    node_postprocessors = [SimilarityPostprocessor(similarity_threshold=0.5)]
+if MMR:
+    # Skip chunks that repeat ones already picked, so 3 chunks cover more
+    node_postprocessors.append(MMRPostprocessor(top_n=TOP_K))
 # Set up a response synthesizer to combine retrieved information into a final answer
-response_synthesizer = get_response_synthesizer()
-# Create a query engine that uses the retriever, synthesizer, and a similarity postprocessor
+response_synthesizer = PackedContextSynthesizer() if PACK_CONTEXT else get_response_synthesizer()
+# Create a query engine that uses the retriever, synthesizer, and postprocessors
 query_engine = RetrieverQueryEngine(
     retriever=retriever,
     response_synthesizer=response_synthesizer,
-    node_postprocessors=[SimilarityPostprocessor(similarity_threshold=0.5)])
+    node_postprocessors=node_postprocessors)
+
+
+def ask(question: str) -> None:
+    token_counter.reset_counts()
+    print(query_engine.query(question))
+    print(f"[LLM calls: {len(token_counter.llm_token_counts)}, "
+          f"prompt tokens: {token_counter.prompt_llm_token_count}]")
 
-# 5. Run a sample query and print the response
+
+# 4. Run a sample query and print the response
 # The query engine retrieves relevant documents and synthesizes an answer
-response = query_engine.query("What is Cloud Club?")
-print(response)
+ask("What is Cloud Club?")
+print(f"Embedding cache: {Settings.embed_model.stats}")
+
+# 5. Watch mode (INDEX_WATCH=1): keep the Chroma collection in sync with 'data'
+# while answering questions from stdin; only changed files are re-embedded
+if WATCH_ENABLED:
+    def on_refresh(stats) -> None:
+        refresh_bm25()
+        print(f"[index refreshed: {stats}]")
+
+    watcher = IndexWatcher(index, "data", files=files, on_refresh=on_refresh)
+    watcher.start()
+    try:
+        while (question := input("Question (empty to quit): ").strip()):
+            ask(question)
+    finally:
+        watcher.stop()
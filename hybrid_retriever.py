@@ -0,0 +1,260 @@
+# hybrid_retriever.py
+# Hybrid keyword + vector retrieval. Vector search alone misses exact names
+# ("Cloud Club", "Byteville") that the embedding blurs; a BM25 inverted index
+# over the same nodes finds them. Both searches run concurrently and their
+# rankings are merged with reciprocal rank fusion (RRF), so neither score scale
+# has to be calibrated against the other.
+import asyncio
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Collection, Iterable, List, Optional
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import MetadataFilters
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from llama_index.vector_stores.chroma.base import _to_chroma_filter
+
+from chroma_sync import collection_ids
+from numpy_vector_store import NumpyVectorStore
+
+DEFAULT_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Candidates taken from each side before fusion
+DEFAULT_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+BM25_VERSION = 1
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can did do does for from had has have he her his how i "
+    "if in into is it its me my not of on or our she so that the their them then there "
+    "they this to was we were what when where which who whom why will with would you your"
+    .split())
+
+# Runs the vector half of synchronous hybrid queries
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HYBRID_THREADS", "8")),
+                               thread_name_prefix="hybrid")
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index (term -> {node id: term frequency}) with Okapi BM25 scoring.
+    Nodes can be added and removed one at a time; persisted as JSON.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[str, int]] = {}
+        self.lengths: dict[str, int] = {}
+        self._total_length = 0
+        self._terms: dict[str, list[str]] = defaultdict(list)  # node id -> terms, for removal
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.lengths
+
+    def add(self, node_id: str, text: str) -> None:
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self._remove(node_id)
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[node_id] = tf
+            self._terms[node_id] = list(counts)
+            self.lengths[node_id] = sum(counts.values())
+            self._total_length += self.lengths[node_id]
+
+    def remove(self, node_id: str) -> None:
+        with self._lock:
+            self._remove(node_id)
+
+    def _remove(self, node_id: str) -> None:
+        if node_id not in self.lengths:
+            return
+        for term in self._terms.pop(node_id, []):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(node_id, None)
+                if not posting:
+                    del self.postings[term]
+        self._total_length -= self.lengths.pop(node_id)
+
+    def search(self, query: str, top_k: int,
+               allowed: Optional[Collection[str]] = None) -> list[tuple[str, float]]:
+        """
+        Return up to top_k (node id, BM25 score) pairs, best first. With
+        `allowed`, only those node ids are scored.
+        """
+        scores: dict[str, float] = defaultdict(float)
+        with self._lock:
+            n = len(self.lengths)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                if allowed is not None:
+                    # Walk the shorter of the two
+                    if len(allowed) < len(posting):
+                        posting = {node_id: posting[node_id] for node_id in allowed
+                                   if node_id in posting}
+                    else:
+                        posting = {node_id: tf for node_id, tf in posting.items()
+                                   if node_id in allowed}
+                for node_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[node_id] / avg_length)
+                    scores[node_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def sync(self, node_ids: Iterable[str],
+             get_texts: Callable[[list[str]], list[str]]) -> tuple[int, int]:
+        """
+        Make the index cover exactly `node_ids`, fetching text only for ids it
+        does not hold yet. Node ids must change when the text does (as with
+        chroma_sync.StableNodeIds or freshly parsed nodes). Returns (added, removed).
+        """
+        wanted = set(node_ids)
+        stale = [node_id for node_id in self.lengths if node_id not in wanted]
+        for node_id in stale:
+            self.remove(node_id)
+        missing = [node_id for node_id in wanted if node_id not in self.lengths]
+        for node_id, text in zip(missing, get_texts(missing) if missing else []):
+            self.add(node_id, text)
+        return len(missing), len(stale)
+
+    def persist(self, persist_path: str) -> None:
+        os.makedirs(os.path.dirname(persist_path) or ".", exist_ok=True)
+        with self._lock:
+            payload = json.dumps({"version": BM25_VERSION, "k1": self.k1, "b": self.b,
+                                  "postings": self.postings, "lengths": self.lengths})
+        with open(persist_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(persist_path + ".tmp", persist_path)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str) -> "BM25Index":
+        """Load a persisted index; a missing or outdated file gives an empty one."""
+        try:
+            with open(persist_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get("version") != BM25_VERSION:
+            return cls()
+        index = cls(data["k1"], data["b"])
+        index.postings = data["postings"]
+        index.lengths = data["lengths"]
+        index._total_length = sum(index.lengths.values())
+        for term, posting in index.postings.items():
+            for node_id in posting:
+                index._terms[node_id].append(term)
+        return index
+
+
+def live_node_ids(index: VectorStoreIndex) -> list[str]:
+    """Ids of the nodes the index's vector store currently searches."""
+    store = index.vector_store
+    if isinstance(store, ChromaVectorStore):
+        return collection_ids(store.client)
+    if isinstance(store, NumpyVectorStore):
+        return store.node_ids()
+    if not store.stores_text:
+        return list(store.data.embedding_dict)
+    raise ValueError(f"Unsupported vector store: {type(store).__name__}")
+
+
+def matching_node_ids(index: VectorStoreIndex, filters: MetadataFilters) -> set[str]:
+    """Ids of the nodes whose metadata matches `filters`, from the store's own metadata index."""
+    store = index.vector_store
+    if isinstance(store, ChromaVectorStore):
+        return set(collection_ids(store.client, where=_to_chroma_filter(filters)))
+    if isinstance(store, NumpyVectorStore):
+        return set(store.filter_node_ids(filters))
+    raise ValueError(f"Unsupported vector store: {type(store).__name__}")
+
+
+def get_nodes(index: VectorStoreIndex, node_ids: list[str]) -> List[BaseNode]:
+    if index.vector_store.stores_text:
+        return index.vector_store.get_nodes(node_ids=node_ids)
+    return [node for node in index.docstore.get_nodes(node_ids, raise_error=False) if node]
+
+
+def sync_bm25(bm25: BM25Index, index: VectorStoreIndex) -> tuple[int, int]:
+    """Bring a BM25 index in line with the nodes of a vector index. Returns (added, removed)."""
+    def get_texts(node_ids: list[str]) -> list[str]:
+        nodes = {node.node_id: node for node in get_nodes(index, node_ids)}
+        return [nodes[i].get_content(metadata_mode=MetadataMode.NONE) if i in nodes else ""
+                for i in node_ids]
+    return bm25.sync(live_node_ids(index), get_texts)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Vector + BM25 retrieval fused with RRF: score = sum over both rankings of
+    1 / (rrf_k + rank). Node scores are the fused scores, not similarities.
+    With `filters`, both searches consider only the matching nodes.
+    """
+
+    def __init__(self, index: VectorStoreIndex, bm25: BM25Index, similarity_top_k: int = 3,
+                 candidate_top_k: int = DEFAULT_CANDIDATES, rrf_k: int = DEFAULT_RRF_K,
+                 filters: Optional[MetadataFilters] = None,
+                 callback_manager: Optional[CallbackManager] = None):
+        self._index = index
+        self._bm25 = bm25
+        self._filters = filters
+        self._vector = VectorIndexRetriever(index, similarity_top_k=candidate_top_k,
+                                            filters=filters)
+        self._similarity_top_k = similarity_top_k
+        self._candidate_top_k = candidate_top_k
+        self._rrf_k = rrf_k
+        super().__init__(callback_manager=callback_manager)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # Embedding + vector search in a worker thread while BM25 runs here
+        vector_future = _executor.submit(self._vector.retrieve, query_bundle)
+        keyword_hits = self._keyword_search(query_bundle.query_str)
+        return self._fuse(vector_future.result(), keyword_hits)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        vector_hits, keyword_hits = await asyncio.gather(
+            self._vector.aretrieve(query_bundle),
+            asyncio.to_thread(self._keyword_search, query_bundle.query_str))
+        return self._fuse(vector_hits, keyword_hits)
+
+    def _keyword_search(self, query_str: str) -> list[tuple[str, float]]:
+        allowed = matching_node_ids(self._index, self._filters) if self._filters else None
+        return self._bm25.search(query_str, self._candidate_top_k, allowed)
+
+    def _fuse(self, vector_hits: List[NodeWithScore],
+              keyword_hits: list[tuple[str, float]]) -> List[NodeWithScore]:
+        scores: dict[str, float] = defaultdict(float)
+        nodes = {}
+        for rank, hit in enumerate(vector_hits):
+            scores[hit.node.node_id] += 1 / (self._rrf_k + rank + 1)
+            nodes[hit.node.node_id] = hit.node
+        for rank, (node_id, _) in enumerate(keyword_hits):
+            scores[node_id] += 1 / (self._rrf_k + rank + 1)
+        top = heapq.nlargest(self._similarity_top_k, scores.items(), key=lambda item: item[1])
+        # Keyword-only hits still need their node (text and metadata)
+        missing = [node_id for node_id, _ in top if node_id not in nodes]
+        if missing:
+            nodes.update((node.node_id, node) for node in get_nodes(self._index, missing))
+        return [NodeWithScore(node=nodes[node_id], score=score)
+                for node_id, score in top if node_id in nodes]
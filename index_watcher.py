@@ -0,0 +1,186 @@
+# index_watcher.py
+# Watch mode: keeps a live VectorStoreIndex (in-memory or Chroma) in sync with
+# its data folder while queries are being served. Bursts of file events are
+# debounced by watchfiles; each refresh re-reads only files whose content hash
+# changed, embeds their chunks before the index is touched, and then applies
+# the inserts and deletes in one short step.
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.indices.utils import embed_nodes
+from llama_index.core.vector_stores.simple import (SimpleVectorStore,
+                                                   SimpleVectorStoreData)
+from watchfiles import watch
+
+from numpy_vector_store import NumpyVectorStore
+from parallel_ingest import iter_nodes
+from persistent_index import (RefreshStats, diff_manifest, read_manifest,
+                              scan_folder, write_manifest)
+
+# Watch mode in the query/RAG apps and query_service (INDEX_WATCH=1)
+WATCH_ENABLED = os.getenv("INDEX_WATCH", "0") == "1"
+DEFAULT_DEBOUNCE_MS = int(os.getenv("WATCH_DEBOUNCE_MS", "500"))
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWatcher:
+    """
+    Apply changes in `folder` to a live index. The file manifest either comes
+    from `persist_dir` (an index opened with persistent_index.load_index, which
+    is persisted again after every refresh) or is passed in as `files`
+    (e.g. filled by parallel_ingest.build_index), in which case nothing is
+    persisted.
+
+    Query the index through VectorIndexRetriever(index, ...): index.as_retriever()
+    and as_query_engine() pin the node ids that exist when they are created.
+    """
+
+    def __init__(self, index: VectorStoreIndex, folder: str, files: Optional[dict] = None,
+                 persist_dir: Optional[str] = None, recursive: bool = False,
+                 debounce_ms: int = DEFAULT_DEBOUNCE_MS, workers: int = 1,
+                 on_refresh: Optional[Callable[[RefreshStats], None]] = None):
+        if not folder:
+            raise ValueError("The 'folder' parameter cannot be null or empty.")
+        self.index = index
+        self.folder = folder
+        self.persist_dir = persist_dir
+        self.manifest = None
+        if files is None:
+            self.manifest = read_manifest(persist_dir) if persist_dir else None
+            if self.manifest is None:
+                raise ValueError("Either 'files' or a 'persist_dir' with a manifest is required.")
+            files = self.manifest["files"]
+        self.files = files
+        self.recursive = recursive
+        self.debounce_ms = debounce_ms
+        self.workers = workers
+        self.on_refresh = on_refresh
+        self._lock = threading.Lock()  # one refresh at a time
+        self._retired: list[str] = []  # node ids still visible to in-flight queries
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "IndexWatcher":
+        """Watch the folder from a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._retired:
+                self._drop_retired()
+                self._persist()
+
+    def _run(self) -> None:
+        # A change made while the watcher was starting is picked up by the first refresh
+        self._refresh_logged()
+        for _ in watch(self.folder, debounce=self.debounce_ms, recursive=self.recursive,
+                       watch_filter=lambda _, path: not os.path.basename(path).startswith("."),
+                       stop_event=self._stop):
+            self._refresh_logged()
+
+    def _refresh_logged(self) -> None:
+        try:
+            stats = self.refresh()
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Keep watching: a half-written file is retried on its next event
+            logger.exception("Refreshing the index from %s failed", self.folder)
+            return
+        if stats.dirty and self.on_refresh is not None:
+            self.on_refresh(stats)
+
+    def refresh(self) -> RefreshStats:
+        """Bring the index up to date with the folder now."""
+        with self._lock:
+            start = time.perf_counter()
+            stats = RefreshStats()
+            stale, to_load = diff_manifest(self.folder, self.files,
+                                           scan_folder(self.folder, self.recursive), stats)
+            by_path = {os.path.abspath(os.path.join(self.folder, rel)): rel for rel in to_load}
+            nodes, hashes = [], []
+            for infos, batch in iter_nodes(list(by_path), self.workers):
+                for doc_id, file_path, doc_hash in infos:
+                    rel = by_path.get(os.path.abspath(file_path))
+                    if rel is not None:
+                        self.files[rel]["doc_ids"].append(doc_id)
+                    hashes.append((doc_id, doc_hash))
+                nodes.extend(batch)
+            # Embedding is the slow part, and readers are not affected by it
+            if nodes:
+                embeddings = embed_nodes(nodes, Settings.embed_model)
+                for node in nodes:
+                    node.embedding = embeddings[node.node_id]
+
+            if isinstance(self.index.vector_store, (SimpleVectorStore, NumpyVectorStore)):
+                self._swap(stale, nodes)
+            else:
+                # Stores like Chroma handle concurrent reads and writes themselves;
+                # deletes go first since a changed file keeps its doc ids
+                for doc_id in stale:
+                    self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                self.index.insert_nodes(nodes)
+            for doc_id, doc_hash in hashes:
+                self.index.docstore.set_document_hash(doc_id, doc_hash)
+            if stats.dirty or stats.touched:
+                self._persist()
+            stats.seconds = time.perf_counter() - start
+            return stats
+
+    def _swap(self, stale: list[str], nodes: list) -> None:
+        """
+        Update an in-memory store without blocking queries. NumpyVectorStore
+        publishes a new snapshot itself; SimpleVectorStore's dicts are copied,
+        updated aside and swapped in, since queries iterate them.
+        """
+        index, store = self.index, self.index.vector_store
+        retired = []
+        for doc_id in stale:
+            info = index.docstore.get_ref_doc_info(doc_id)
+            if info is not None:
+                retired.extend(info.node_ids)
+        # New nodes must be resolvable before their vectors become visible
+        for node in nodes:
+            stored = node.model_copy()
+            stored.embedding = None
+            index.index_struct.add_node(stored, text_id=node.node_id)
+            index.docstore.add_documents([stored], allow_update=True)
+        self._drop_retired()
+        if isinstance(store, NumpyVectorStore):
+            store.update(delete_ref_doc_ids=stale, add=nodes)
+        else:
+            data = store.data
+            shadow = SimpleVectorStore(SimpleVectorStoreData(
+                dict(data.embedding_dict), dict(data.text_id_to_ref_doc_id),
+                dict(data.metadata_dict)))
+            for doc_id in stale:
+                shadow.delete(doc_id)
+            shadow.add(nodes)
+            store.data = shadow.data
+        # Replaced nodes stay resolvable until the next refresh, for queries
+        # that picked up the old vectors just before the swap
+        self._retired = retired
+        index.storage_context.index_store.add_index_struct(index.index_struct)
+
+    def _drop_retired(self) -> None:
+        for node_id in self._retired:
+            self.index.index_struct.nodes_dict.pop(node_id, None)
+            self.index.docstore.delete_document(node_id, raise_error=False)
+        self._retired = []
+        self.index.storage_context.index_store.add_index_struct(self.index.index_struct)
+
+    def _persist(self) -> None:
+        if self.manifest is None:
+            return
+        self.index.storage_context.persist(persist_dir=self.persist_dir)
+        write_manifest(self.persist_dir, self.manifest)
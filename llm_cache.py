@@ -0,0 +1,269 @@
+# llm_cache.py
+# Exact-match completion cache for LLMs created by llm_factory.get_llm().
+# Responses are keyed by model + full message list (or prompt) + sampling
+# parameters and stored in SQLite with a TTL and a maximum number of entries.
+# Streamed responses are recorded chunk by chunk and replayed on a hit.
+# Responses are stored as JSON, never pickled, so a tampered cache file can at
+# worst return wrong answers.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from llama_index.core.base.llms.types import (ChatMessage, ChatResponse,
+                                              ChatResponseAsyncGen,
+                                              ChatResponseGen,
+                                              CompletionResponse,
+                                              CompletionResponseAsyncGen,
+                                              CompletionResponseGen)
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import LLM
+
+from model_wrappers import WrappedLLM
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Constructor fields that change what the model generates. Transport settings
+# (endpoint, timeout, retries, keys) deliberately stay out of the cache key.
+SAMPLING_FIELDS = ("temperature", "top_p", "top_k", "max_tokens", "seed",
+                   "json_mode", "additional_kwargs", "reasoning_effort",
+                   "strict", "context_window")
+
+
+@dataclass
+class CompletionCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return f"hits={self.hits} misses={self.misses} hit_rate={self.hit_rate:.1%}"
+
+
+RESPONSE_TYPES = {cls.__name__: cls for cls in (ChatResponse, CompletionResponse)}
+
+
+def _encode(value: Any) -> Any:
+    """A response, or a list of streamed chunks, as JSON-ready data."""
+    if isinstance(value, list):
+        return [_encode(chunk) for chunk in value]
+    return {"type": type(value).__name__, "data": value.model_dump(mode="json")}
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(chunk) for chunk in value]
+    return RESPONSE_TYPES[value["type"]].model_validate(value["data"])
+
+
+class CompletionStore:
+    """SQLite-backed response store with TTL expiry and LRU size limit."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60.0, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY, payload BLOB NOT NULL,
+                created REAL NOT NULL, last_access REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS completions_lru ON completions (last_access);
+        """)
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            payload, created = row
+            if self.ttl is not None and created + self.ttl < now:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+        try:
+            return _decode(json.loads(payload))
+        except (ValueError, TypeError, KeyError):
+            return None  # written by an older version, or not a response
+
+    def put(self, key: str, value: Any) -> None:
+        try:
+            payload = json.dumps(_encode(value))
+        except (ValueError, TypeError):
+            # Responses carrying live objects (clients, generators) are not cached
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO completions (key, payload, created, last_access) "
+                    "VALUES (?, ?, ?, ?)", (key, payload, now, now))
+                if self.ttl is not None:
+                    self._conn.execute(
+                        "DELETE FROM completions WHERE created < ?", (now - self.ttl,))
+                self._conn.execute(
+                    "DELETE FROM completions WHERE key IN (SELECT key FROM completions "
+                    "ORDER BY last_access DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedLLM(WrappedLLM):
+    """
+    Serves repeated chat/complete calls (sync, async and streamed) from a
+    CompletionStore; only cache misses reach the inner LLM.
+    """
+
+    _store: CompletionStore = PrivateAttr()
+    _stats: CompletionCacheStats = PrivateAttr()
+
+    def __init__(self, inner: LLM, store: Optional[CompletionStore] = None,
+                 **kwargs: Any) -> None:
+        super().__init__(inner, **kwargs)
+        self._store = store or CompletionStore()
+        self._stats = CompletionCacheStats()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedLLM"
+
+    @property
+    def stats(self) -> CompletionCacheStats:
+        return self._stats
+
+    def cache_key(self, kind: str, payload: Any, **kwargs: Any) -> str:
+        inner = self._inner
+        params = {name: getattr(inner, name) for name in SAMPLING_FIELDS
+                  if hasattr(inner, name)}
+        if isinstance(payload, str):
+            body = payload
+        else:
+            body = [m.model_dump(mode="json") for m in payload]
+        material = {"llm": inner.class_name(), "model": inner.metadata.model_name,
+                    "kind": kind, "input": body, "params": params, "kwargs": kwargs}
+        encoded = json.dumps(material, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Any:
+        cached = self._store.get(key)
+        if cached is None:
+            self._stats.misses += 1
+        else:
+            self._stats.hits += 1
+        return cached
+
+    def _record(self, key: str, stream):
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        self._store.put(key, chunks)
+
+    async def _arecord(self, key: str, stream):
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        self._store.put(key, chunks)
+
+    @staticmethod
+    async def _areplay(chunks):
+        for chunk in chunks:
+            yield chunk
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        key = self.cache_key("chat", messages, **kwargs)
+        response = self._lookup(key)
+        if response is None:
+            response = self._inner.chat(messages, **kwargs)
+            self._store.put(key, response)
+        return response
+
+    def complete(self, prompt: str, formatted: bool = False,
+                 **kwargs: Any) -> CompletionResponse:
+        key = self.cache_key("complete", prompt, formatted=formatted, **kwargs)
+        response = self._lookup(key)
+        if response is None:
+            response = self._inner.complete(prompt, formatted=formatted, **kwargs)
+            self._store.put(key, response)
+        return response
+
+    def stream_chat(self, messages: Sequence[ChatMessage],
+                    **kwargs: Any) -> ChatResponseGen:
+        key = self.cache_key("stream_chat", messages, **kwargs)
+        chunks = self._lookup(key)
+        if chunks is not None:
+            return iter(chunks)
+        return self._record(key, self._inner.stream_chat(messages, **kwargs))
+
+    def stream_complete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponseGen:
+        key = self.cache_key("stream_complete", prompt, formatted=formatted, **kwargs)
+        chunks = self._lookup(key)
+        if chunks is not None:
+            return iter(chunks)
+        return self._record(key, self._inner.stream_complete(
+            prompt, formatted=formatted, **kwargs))
+
+    async def achat(self, messages: Sequence[ChatMessage],
+                    **kwargs: Any) -> ChatResponse:
+        key = self.cache_key("chat", messages, **kwargs)
+        response = self._lookup(key)
+        if response is None:
+            response = await self._inner.achat(messages, **kwargs)
+            self._store.put(key, response)
+        return response
+
+    async def acomplete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponse:
+        key = self.cache_key("complete", prompt, formatted=formatted, **kwargs)
+        response = self._lookup(key)
+        if response is None:
+            response = await self._inner.acomplete(prompt, formatted=formatted, **kwargs)
+            self._store.put(key, response)
+        return response
+
+    async def astream_chat(self, messages: Sequence[ChatMessage],
+                           **kwargs: Any) -> ChatResponseAsyncGen:
+        key = self.cache_key("stream_chat", messages, **kwargs)
+        chunks = self._lookup(key)
+        if chunks is not None:
+            return self._areplay(chunks)
+        return self._arecord(key, await self._inner.astream_chat(messages, **kwargs))
+
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        key = self.cache_key("stream_complete", prompt, formatted=formatted, **kwargs)
+        chunks = self._lookup(key)
+        if chunks is not None:
+            return self._areplay(chunks)
+        return self._arecord(key, await self._inner.astream_complete(
+            prompt, formatted=formatted, **kwargs))
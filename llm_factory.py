@@ -1,15 +1,23 @@
 # llm_factory.py
+import asyncio
+import hashlib
 import os
+import threading
+import weakref
 from enum import Enum
-from llama_index.llms.ollama import Ollama
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.embeddings.openai import OpenAIEmbedding
+
+import httpx
+
+# Backend packages (llama_index.llms.*, llama_index.embeddings.*, ollama) and
+# the cache/batching wrappers are imported inside the functions that use them:
+# only one backend is used per process and importing all of them up front
+# dominates the start-up time of short-lived scripts and workers.
 
 
 class LLMType(Enum):
     OLLAMA = "ollama"
     OPENAI = "openai"
+    MOCK = "mock"  # offline, deterministic models for benchmarks and CI
 
 
 DEFAULTS = {
@@ -18,61 +26,429 @@ DEFAULTS = {
     "temperature": 0.1,
     "timeout": 360.0,
     "ollama_embed_model": "nomic-embed-text:latest",
-    "openai_embed_model": "text-embedding-3-large"
+    "openai_embed_model": "text-embedding-3-large",
+    "ollama_base_url": "http://localhost:11434",
+    "openai_base_url": None,
+    "mock_model": "mock-llm",
+    "mock_embed_model": "mock-embed"
+}
+
+# get_llm()/get_embedding_model() kwargs forwarded to the mock models
+MOCK_LLM_OPTIONS = ("latency", "latency_dist", "latency_jitter", "tokens_per_second",
+                    "output_tokens", "responses", "tool_script", "seed")
+MOCK_EMBED_OPTIONS = ("latency", "latency_dist", "latency_jitter", "embed_dim", "seed")
+
+# OpenAI embedding models that accept a `dimensions` parameter; other models
+# are shortened with a PCA projection
+NATIVE_DIMENSION_MODELS = ("text-embedding-3",)
+
+# Limits of the keep-alive connection pool shared by every client the factory
+# creates. Override with LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE and
+# LLM_POOL_KEEPALIVE_EXPIRY.
+POOL_LIMITS = {
+    "max_connections": int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+    "max_keepalive_connections": int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+    "keepalive_expiry": float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30.0"))
 }
 
+# Memoized model instances keyed by (kind, backend, model, temperature,
+# timeout, endpoint, ...) and the transports that own the pooled connections.
+_instances = {}
+_transports = {}
+_lock = threading.RLock()
+# Memoized helpers that hold files, threads or connections of their own
+_CLOSEABLE_KINDS = ("embedding-store", "completion-store", "ollama-balancer")
+
+
+def _resolve_type(llm_type: LLMType | str = None) -> str:
+    if isinstance(llm_type, LLMType):
+        return llm_type.value
+    return (llm_type or os.getenv("LLM_TYPE", "ollama")).lower()
+
+
+def _key_fingerprint(api_key: str | None) -> str | None:
+    # Keep secrets out of the cache key while still separating credentials
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class _PerLoopAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that keeps one connection pool per event loop. Pooled
+    connections cannot outlive the loop that opened them, and scripts that call
+    asyncio.run() more than once would otherwise reuse dead sockets.
+    """
+
+    def __init__(self, limits: httpx.Limits):
+        self._limits = limits
+        self._pools = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = httpx.AsyncHTTPTransport(limits=self._limits)
+            self._pools[loop] = pool
+        return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+
+def _get_transport(is_async: bool = False):
+    """Return the process-wide transport that owns the shared connection pool."""
+    kind = "async" if is_async else "sync"
+    with _lock:
+        transport = _transports.get(kind)
+        if transport is None:
+            limits = httpx.Limits(**POOL_LIMITS)
+            if is_async:
+                transport = _PerLoopAsyncTransport(limits)
+            else:
+                transport = httpx.HTTPTransport(limits=limits)
+            _transports[kind] = transport
+        return transport
+
+
+def _limited(transport, limiter, is_async: bool = False):
+    """Put the adaptive concurrency limiter in front of a transport, if one is given."""
+    if limiter is None:
+        return transport
+    from adaptive_limiter import AsyncLimitingTransport, LimitingTransport
+    return (AsyncLimitingTransport if is_async else LimitingTransport)(limiter, transport)
+
+
+def get_http_client(timeout: float = DEFAULTS["timeout"], is_async: bool = False,
+                    limiter=None):
+    """
+    Return an httpx client backed by the shared keep-alive connection pool.
+    The client is cheap to create; the pooled connections live in the transport.
+    """
+    client_cls = httpx.AsyncClient if is_async else httpx.Client
+    return client_cls(transport=_limited(_get_transport(is_async), limiter, is_async),
+                      timeout=timeout)
+
+
+def _get_limiter(endpoint: tuple, kwargs: dict):
+    """
+    Adaptive limiter shared by every LLM and embedding client of one endpoint,
+    or None unless limit=True (or LLM_LIMIT=1) is requested.
+    """
+    if not kwargs.get("limit", os.getenv("LLM_LIMIT", "0") == "1"):
+        return None
+    from adaptive_limiter import AdaptiveLimiter, parse_rate_limits
+    limiter = _memoize(("limiter",) + endpoint, AdaptiveLimiter)
+    rate_limits = kwargs.get("rate_limits") or parse_rate_limits(
+        os.getenv("LLM_RATE_LIMITS", ""))
+    for model, rate in rate_limits.items():
+        limiter.set_rate_limit(model, rate)
+    return limiter
+
+
+def _ollama_endpoints(kwargs: dict) -> tuple:
+    """Ollama base URLs from base_urls/OLLAMA_BASE_URLS or base_url/OLLAMA_BASE_URL."""
+    base_urls = kwargs.get("base_urls") or [
+        url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()]
+    if not base_urls:
+        base_urls = [kwargs.get("base_url", os.getenv(
+            "OLLAMA_BASE_URL", DEFAULTS["ollama_base_url"]))]
+    return tuple(base_urls)
+
+
+def _get_balancer(base_urls: tuple):
+    from ollama_balancer import OllamaBalancer
+    return _memoize(("ollama-balancer", base_urls),
+                    lambda: OllamaBalancer(list(base_urls), _get_transport()))
+
+
+def _ollama_clients(base_urls: tuple, timeout: float, limiter=None):
+    from ollama import AsyncClient, Client
+    # The Ollama SDK forwards extra kwargs to httpx, so the pooled transport is
+    # injected there instead of letting every client open its own sockets.
+    transport, async_transport = _get_transport(), _get_transport(is_async=True)
+    if len(base_urls) > 1:
+        from ollama_balancer import AsyncBalancingTransport, BalancingTransport
+        balancer = _get_balancer(base_urls)
+        transport = BalancingTransport(balancer, transport)
+        async_transport = AsyncBalancingTransport(balancer, async_transport)
+    transport = _limited(transport, limiter)
+    async_transport = _limited(async_transport, limiter, is_async=True)
+    return (Client(host=base_urls[0], timeout=timeout, transport=transport),
+            AsyncClient(host=base_urls[0], timeout=timeout, transport=async_transport))
+
+
+def _memoize(key: tuple, factory, shared: bool = True):
+    if not shared:
+        return factory()
+    with _lock:
+        instance = _instances.get(key)
+        if instance is None:
+            instance = factory()
+            _instances[key] = instance
+        return instance
+
 
 def get_llm(llm_type: LLMType | str = None, **kwargs):
     """
     Factory method to return an LLM instance based on user preference.
-    llm_type: LLMType enum or string ("ollama" or "openai") (default: from env LLM_TYPE)
+    llm_type: LLMType enum or string ("ollama", "openai" or "mock") (default: from env LLM_TYPE)
     kwargs: parameters for the LLM constructor
+    latency, latency_dist, latency_jitter, tokens_per_second, output_tokens, responses,
+    tool_script, seed: behaviour of the offline mock LLM (see mock_backend.MockLLM)
+    base_urls: several Ollama hosts to load-balance across (default: env OLLAMA_BASE_URLS)
+    shared: reuse a memoized instance for identical settings (default: True)
+    limit: adaptive concurrency limit and 429/503 retries per endpoint (default: env LLM_LIMIT)
+    rate_limits: {model: requests per second} for the limiter (default: env LLM_RATE_LIMITS)
+    cache: serve identical requests from the completion cache (default: env LLM_CACHE)
+    cache_path, cache_ttl, cache_max_entries: completion cache location, TTL and size limit
     """
-    if isinstance(llm_type, LLMType):
-        llm_type_str = llm_type.value
-    else:
-        llm_type_str = (llm_type or os.getenv("LLM_TYPE", "ollama")).lower()
+    llm_type_str = _resolve_type(llm_type)
+    shared = kwargs.get("shared", True)
+    temperature = kwargs.get("temperature", DEFAULTS["temperature"])
+    timeout = kwargs.get("request_timeout", DEFAULTS["timeout"])
 
     if llm_type_str == "ollama":
         model_name = kwargs.get("model", DEFAULTS["ollama_model"])
-        return Ollama(
-            model=model_name,
-            temperature=kwargs.get("temperature", DEFAULTS["temperature"]),
-            request_timeout=kwargs.get("request_timeout", DEFAULTS["timeout"])
-        )
+        base_urls = _ollama_endpoints(kwargs)
+        limiter = _get_limiter(base_urls, kwargs)
+
+        def build():
+            from llama_index.llms.ollama import Ollama
+            client, async_client = _ollama_clients(base_urls, timeout, limiter)
+            return Ollama(
+                model=model_name,
+                base_url=base_urls[0],
+                temperature=temperature,
+                request_timeout=timeout,
+                client=client,
+                async_client=async_client
+            )
+
+        key = ("llm", llm_type_str, model_name, temperature, timeout, base_urls,
+               limiter is not None)
     elif llm_type_str == "openai":
         model_name = kwargs.get("model", DEFAULTS["openai_model"])
-        return OpenAI(
-            api_key=kwargs.get("api_key", os.getenv("OPENAI_API_KEY")),
-            model=model_name,
-            temperature=kwargs.get("temperature", DEFAULTS["temperature"]),
-            request_timeout=kwargs.get("request_timeout", DEFAULTS["timeout"])
-        )
+        api_key = kwargs.get("api_key", os.getenv("OPENAI_API_KEY"))
+        api_base = kwargs.get("api_base", os.getenv(
+            "OPENAI_BASE_URL", DEFAULTS["openai_base_url"]))
+        limiter = _get_limiter((api_base, _key_fingerprint(api_key)), kwargs)
+        # The limiter retries 429s itself; stacking the SDK's retries on top
+        # would multiply the attempts
+        retries = {"max_retries": 0} if limiter else {}
+
+        def build():
+            from llama_index.llms.openai import OpenAI
+            return OpenAI(
+                api_key=api_key,
+                api_base=api_base,
+                model=model_name,
+                temperature=temperature,
+                timeout=timeout,
+                http_client=get_http_client(timeout, limiter=limiter),
+                async_http_client=get_http_client(timeout, is_async=True, limiter=limiter),
+                **retries
+            )
+
+        key = ("llm", llm_type_str, model_name, temperature, timeout, api_base,
+               _key_fingerprint(api_key), limiter is not None)
+    elif llm_type_str == "mock":
+        model_name = kwargs.get("model", DEFAULTS["mock_model"])
+        options = {k: kwargs[k] for k in MOCK_LLM_OPTIONS if k in kwargs}
+
+        def build():
+            from mock_backend import MockLLM
+            return MockLLM(model=model_name, temperature=temperature, **options)
+
+        key = ("llm", llm_type_str, model_name, temperature, repr(sorted(options.items())))
     else:
         raise ValueError(
             f"Unsupported LLM type: {llm_type}. Supported types are: {[t.value for t in LLMType]}")
 
+    llm = _memoize(key, build, shared)
+    if kwargs.get("cache", os.getenv("LLM_CACHE", "0") == "1"):
+        llm = _with_completion_cache(llm, key, **kwargs)
+    return llm
+
+
+def _with_completion_cache(llm, key: tuple, **kwargs):
+    # `shared` comes in kwargs, as get_llm() received it
+    shared = kwargs.get("shared", True)
+    from llm_cache import (DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL,
+                           CachedLLM, CompletionStore)
+    path = os.path.abspath(kwargs.get("cache_path", DEFAULT_CACHE_PATH))
+    ttl = kwargs.get("cache_ttl", DEFAULT_TTL)
+    max_entries = kwargs.get("cache_max_entries", DEFAULT_MAX_ENTRIES)
+    store = _memoize(("completion-store", path, ttl, max_entries),
+                     lambda: CompletionStore(path, ttl, max_entries))
+    return _memoize(key + ("cache", path), lambda: CachedLLM(llm, store=store), shared)
+
 
 def get_embedding_model(llm_type: LLMType | str = None, **kwargs):
     """
     Factory method to return an embedding model instance based on user preference.
-    llm_type: LLMType enum or string ("ollama" or "openai") (default: from env LLM_TYPE)
+    llm_type: LLMType enum or string ("ollama", "openai" or "mock") (default: from env LLM_TYPE)
     kwargs: parameters for the embedding model constructor
+    latency, latency_dist, latency_jitter, embed_dim, seed: behaviour of the mock embedding
+    base_urls: several Ollama hosts to load-balance across (default: env OLLAMA_BASE_URLS)
+    shared: reuse a memoized instance for identical settings (default: True)
+    limit, rate_limits: adaptive concurrency limit and retries, as for get_llm()
+    cache: serve repeated texts from the persistent embedding cache (default: env EMBED_CACHE)
+    cache_dir, cache_max_entries, cache_max_bytes: embedding cache location and size limits
+    batch: coalesce concurrent async calls into batched requests (default: env EMBED_BATCH)
+    batch_max_size, batch_max_wait_ms: micro-batch size and maximum queueing delay
+    dimensions: shorter output vectors; native for OpenAI text-embedding-3 models, a PCA
+        projection fitted on the index otherwise (see dimension_reduction)
+        (default: env EMBED_DIMENSIONS, unset for full size)
     """
-    if isinstance(llm_type, LLMType):
-        llm_type_str = llm_type.value
-    else:
-        llm_type_str = (llm_type or os.getenv("LLM_TYPE", "ollama")).lower()
+    llm_type_str = _resolve_type(llm_type)
+    shared = kwargs.get("shared", True)
+    timeout = kwargs.get("request_timeout", DEFAULTS["timeout"])
+    dimensions = kwargs.get("dimensions", int(os.getenv("EMBED_DIMENSIONS", "0")) or None)
+    native_dimensions = None
 
     if llm_type_str == "ollama":
         model_name = kwargs.get("embed_model", DEFAULTS["ollama_embed_model"])
-        return OllamaEmbedding(model_name=model_name)
+        base_urls = _ollama_endpoints(kwargs)
+        limiter = _get_limiter(base_urls, kwargs)
+
+        def build():
+            from llama_index.embeddings.ollama import OllamaEmbedding
+            embed_model = OllamaEmbedding(
+                model_name=model_name, base_url=base_urls[0])
+            # OllamaEmbedding passes one set of client kwargs to both its sync
+            # and async clients, so the pooled clients are swapped in afterwards
+            embed_model._client, embed_model._async_client = _ollama_clients(  # pylint: disable=protected-access
+                base_urls, timeout, limiter)
+            return embed_model
+
+        key = ("embedding", llm_type_str, model_name, None, timeout, base_urls,
+               limiter is not None)
     elif llm_type_str == "openai":
         model_name = kwargs.get("embed_model", DEFAULTS["openai_embed_model"])
-        return OpenAIEmbedding(
-            api_key=kwargs.get("api_key", os.getenv("OPENAI_API_KEY")),
-            model=model_name
-        )
+        api_key = kwargs.get("api_key", os.getenv("OPENAI_API_KEY"))
+        api_base = kwargs.get("api_base", os.getenv(
+            "OPENAI_BASE_URL", DEFAULTS["openai_base_url"]))
+        limiter = _get_limiter((api_base, _key_fingerprint(api_key)), kwargs)
+        # The limiter retries 429s itself; stacking the SDK's retries on top
+        # would multiply the attempts
+        retries = {"max_retries": 0} if limiter else {}
+        if dimensions and model_name.startswith(NATIVE_DIMENSION_MODELS):
+            native_dimensions = dimensions
+
+        def build():
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            return OpenAIEmbedding(
+                api_key=api_key,
+                api_base=api_base,
+                model=model_name,
+                timeout=timeout,
+                http_client=get_http_client(timeout, limiter=limiter),
+                async_http_client=get_http_client(timeout, is_async=True, limiter=limiter),
+                dimensions=native_dimensions,
+                **retries
+            )
+
+        key = ("embedding", llm_type_str, model_name, native_dimensions, timeout, api_base,
+               _key_fingerprint(api_key), limiter is not None)
+    elif llm_type_str == "mock":
+        model_name = kwargs.get("embed_model", DEFAULTS["mock_embed_model"])
+        options = {k: kwargs[k] for k in MOCK_EMBED_OPTIONS if k in kwargs}
+
+        def build():
+            from mock_backend import MockEmbedding
+            return MockEmbedding(model_name=model_name, **options)
+
+        key = ("embedding", llm_type_str, model_name, None, repr(sorted(options.items())))
     else:
         raise ValueError(
             f"Unsupported LLM type for embedding: {llm_type}. Supported types are: {[t.value for t in LLMType]}")
+
+    embed_model = _memoize(key, build, shared)
+    batched = kwargs.get("batch", os.getenv("EMBED_BATCH", "0") == "1")
+    if batched:
+        embed_model = _with_batching(embed_model, key, **kwargs)
+        key = key + ("batch",)
+    if kwargs.get("cache", os.getenv("EMBED_CACHE", "0") == "1"):
+        # Shortened vectors are cached apart from the full-size ones, and so are
+        # batched Ollama ones, which come from /api/embed and are unit length
+        cache_name = f"{model_name}@{native_dimensions}" if native_dimensions else model_name
+        if llm_type_str == "ollama" and batched:
+            cache_name += "@embed"
+        embed_model = _with_embedding_cache(embed_model, key, cache_name, **kwargs)
+        key = key + ("cache",)
+    if dimensions and not native_dimensions:
+        # Below the projection the cache keeps full vectors, which stay valid
+        # when the projection is refitted
+        from dimension_reduction import ProjectedEmbedding
+        embed_model = _memoize(key + ("pca", dimensions),
+                               lambda: ProjectedEmbedding(embed_model, dimensions), shared)
+    return embed_model
+
+
+def _with_batching(embed_model, key: tuple, **kwargs):
+    shared = kwargs.get("shared", True)
+    from embedding_batcher import (DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS,
+                                   BatchingEmbedding)
+    max_batch_size = kwargs.get("batch_max_size", DEFAULT_MAX_BATCH_SIZE)
+    max_wait_ms = kwargs.get("batch_max_wait_ms", DEFAULT_MAX_WAIT_MS)
+    return _memoize(key + ("batch", max_batch_size, max_wait_ms),
+                    lambda: BatchingEmbedding(embed_model, max_batch_size=max_batch_size,
+                                              max_wait_ms=max_wait_ms), shared)
+
+
+def _with_embedding_cache(embed_model, key: tuple, cache_name: str, **kwargs):
+    shared = kwargs.get("shared", True)
+    from embedding_cache import (DEFAULT_CACHE_DIR, DEFAULT_MAX_ENTRIES,
+                                 CachedEmbedding, EmbeddingStore)
+    cache_dir = kwargs.get("cache_dir", DEFAULT_CACHE_DIR)
+    max_entries = kwargs.get("cache_max_entries", DEFAULT_MAX_ENTRIES)
+    max_bytes = kwargs.get("cache_max_bytes")
+    # One store (and SQLite connection) per cache directory and process
+    store = _memoize(("embedding-store", os.path.abspath(cache_dir), max_entries, max_bytes),
+                     lambda: EmbeddingStore(cache_dir, max_entries, max_bytes))
+    return _memoize(key + ("cache", store.cache_dir),
+                    lambda: CachedEmbedding(embed_model, store=store, model_name=cache_name),
+                    shared)
+
+
+def _reset_after_fork() -> None:
+    # A forked child must not reuse the parent's sockets or SQLite handles
+    global _lock  # pylint: disable=global-statement
+    _lock = threading.RLock()
+    _instances.clear()
+    _transports.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def close_all() -> None:
+    """
+    Drop every memoized model instance and close the shared connection pool.
+    The next get_llm()/get_embedding_model() call starts from a clean slate.
+    """
+    with _lock:
+        stores = [i for k, i in _instances.items() if k[0] in _CLOSEABLE_KINDS]
+        _instances.clear()
+        transports = list(_transports.items())
+        _transports.clear()
+
+    for store in stores:
+        store.close()
+
+    for kind, transport in transports:
+        if kind == "sync":
+            transport.close()
+            continue
+        # Async pools belong to their event loop; close the running loop's pool
+        # and let the others go with their loops
+        try:
+            asyncio.get_running_loop().create_task(transport.aclose())
+        except RuntimeError:
+            pass
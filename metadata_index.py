@@ -0,0 +1,327 @@
+# metadata_index.py
+# Metadata for scoped retrieval. SectionMetadata runs at ingestion and records,
+# per chunk, the folder, extension and modification time of its file and the
+# Markdown heading it falls under (next to the file name SimpleDirectoryReader
+# already records). MetadataIndex is a bitmap-style inverted index over the
+# rows of a NumpyVectorStore: each (key, value) maps to the ascending rows
+# holding it, and numeric keys also get a column of values, so MetadataFilters
+# become a boolean row mask (postings set bits, conditions combine with & and
+# |) without decoding a single node's metadata. The index is saved next to the
+# store's matrix, so a loaded store does not rebuild it.
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from llama_index.core.vector_stores.types import (FilterCondition, FilterOperator,
+                                                  MetadataFilter, MetadataFilters)
+
+# Keys SectionMetadata adds; none of them reach the embedding or the LLM
+SECTION_KEYS = ("folder", "extension", "mtime", "heading")
+MARKDOWN_EXTENSIONS = ("md", "markdown")
+INDEX_VERSION = 1
+
+_HEADING = re.compile(r"^ {0,3}#{1,6}[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+class SectionMetadata(TransformComponent):
+    """
+    Add folder, extension, mtime (Unix seconds) and, for Markdown files, the
+    heading in effect where the chunk starts. Runs after the node parser.
+    mtime is stamped when the chunk is ingested, and the indexes skip files
+    whose content did not change, so it is the time of the last content change
+    ingested: touching or restoring an unchanged file does not update it.
+    """
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        mtimes: dict[str, Optional[int]] = {}
+        headings: dict[str, list] = {}  # ref doc id -> [(offset, heading)], ascending
+        for node in nodes:
+            path = node.metadata.get("file_path") or ""
+            if path:
+                if path not in mtimes:
+                    try:
+                        mtimes[path] = int(os.stat(path).st_mtime)
+                    except OSError:
+                        mtimes[path] = None
+                node.metadata["folder"] = os.path.basename(os.path.dirname(os.path.abspath(path)))
+                node.metadata["extension"] = os.path.splitext(path)[1].lstrip(".").lower()
+                if mtimes[path] is not None:
+                    node.metadata["mtime"] = mtimes[path]
+            if node.metadata.get("extension") in MARKDOWN_EXTENSIONS:
+                heading = self._heading(node, headings.setdefault(node.ref_doc_id, []))
+                if heading:
+                    node.metadata["heading"] = heading
+            for excluded in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+                excluded.extend(key for key in SECTION_KEYS if key not in excluded)
+        return nodes
+
+    @staticmethod
+    def _heading(node: BaseNode, seen: list) -> Optional[str]:
+        """Heading in effect at the chunk's start; `seen` collects a document's headings."""
+        start = node.start_char_idx
+        text = node.get_content(metadata_mode=MetadataMode.NONE)
+        found = [((start or 0) + match.start(), match.group(1))
+                 for match in _HEADING.finditer(text)]
+        # Overlapping chunks find the same headings again
+        seen.extend(item for item in found if not seen or item[0] > seen[-1][0])
+        if start is None:
+            return found[0][1] if found else (seen[-1][1] if seen else None)
+        before = [heading for offset, heading in seen if offset <= start]
+        if before:
+            return before[-1]
+        return found[0][1] if found else None
+
+
+class _Rows:
+    """Ascending row numbers in a growable array; readers see a consistent prefix."""
+
+    __slots__ = ("array", "size")
+
+    def __init__(self, array: Optional[np.ndarray] = None):
+        # A loaded array may be a slice of a bigger one; it is exactly full, so
+        # the first extend() copies it
+        self.array = np.empty(16, dtype=np.int32) if array is None else array
+        self.size = 0 if array is None else len(array)
+
+    def extend(self, rows: list) -> None:
+        needed = self.size + len(rows)
+        if needed > len(self.array):
+            # Readers keep the old array
+            capacity = len(self.array)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.int32)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:needed] = rows
+        self.size = needed
+
+    def below(self, count: int) -> np.ndarray:
+        array, size = self.array, self.size
+        rows = array[:min(size, len(array))]
+        return rows[:np.searchsorted(rows, count)]
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class MetadataIndex:
+    """
+    Inverted index from metadata to rows. Rows must be added in ascending
+    order (a store appends rows in order); rows are never removed, so callers
+    combine the mask with their own live rows. mask() returns None for filters
+    it cannot answer (text match, IS_EMPTY, NOT, nested filters, ranges over
+    strings, CONTAINS on string values); test those node by node.
+    """
+
+    def __init__(self):
+        self._postings: dict[tuple, _Rows] = {}  # (key, scalar value) -> rows
+        self._items: dict[tuple, _Rows] = {}  # (key, list element) -> rows
+        self._present: dict[str, _Rows] = {}  # key -> rows whose value is not None
+        self._numbers: dict[str, np.ndarray] = {}  # key -> value per row, NaN if not numeric
+        self._strings: set = set()  # keys with string values
+        self._capacity = 0
+
+    def add(self, rows: Sequence[int], metadatas: Sequence[dict]) -> None:
+        """Index the metadata of `rows`, which come after every row indexed so far."""
+        if not len(rows):
+            return
+        if rows[-1] >= self._capacity:
+            self._grow(rows[-1] + 1)
+        # Grouped first, so each posting grows once per call
+        postings, items, present = defaultdict(list), defaultdict(list), defaultdict(list)
+        numbers, strings = defaultdict(list), set()
+        for row, metadata in zip(rows, metadatas):
+            for key, value in metadata.items():
+                if value is None or key.startswith("_"):
+                    continue
+                present[key].append(row)
+                kind = type(value)
+                if kind is str:
+                    postings[key, value].append(row)
+                    strings.add(key)
+                elif kind is int or kind is float:
+                    postings[key, value].append(row)
+                    numbers[key].append((row, value))
+                elif kind is bool:
+                    postings[key, value].append(row)
+                elif kind is list or kind is tuple:
+                    for item in {v for v in value if _hashable(v)}:
+                        items[key, item].append(row)
+        for table, grouped in ((self._postings, postings), (self._items, items),
+                               (self._present, present)):
+            for key, found in grouped.items():
+                self._rows(table, key).extend(found)
+        for key, pairs in numbers.items():
+            column = self._numbers.get(key)
+            if column is None:
+                column = self._numbers[key] = np.full(self._capacity, np.nan)
+            found, values = zip(*pairs)
+            column[list(found)] = values
+        self._strings |= strings
+
+    @staticmethod
+    def _rows(table: dict, key) -> _Rows:
+        rows = table.get(key)
+        if rows is None:
+            rows = table[key] = _Rows()
+        return rows
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(1024, self._capacity)
+        while capacity < needed:
+            capacity *= 2
+        for key, column in list(self._numbers.items()):
+            grown = np.full(capacity, np.nan)
+            grown[:self._capacity] = column
+            self._numbers[key] = grown
+        self._capacity = capacity
+
+    def _tables(self) -> tuple:
+        return (("postings", self._postings), ("items", self._items),
+                ("present", self._present))
+
+    def subset(self, rows: np.ndarray, count: int) -> "MetadataIndex":
+        """The index of `rows` (ascending, below `count`) renumbered 0, 1, ..."""
+        renumber = np.full(count, -1, dtype=np.int64)
+        renumber[rows] = np.arange(len(rows))
+        index = MetadataIndex()
+        for (_, source), (_, target) in zip(self._tables(), index._tables()):
+            for key, found in source.items():
+                kept = renumber[found.below(count)]
+                kept = kept[kept >= 0]
+                if len(kept):
+                    target[key] = _Rows(kept.astype(np.int32))
+        index._numbers = {key: column[rows] for key, column in self._numbers.items()}
+        index._strings = set(self._strings)
+        index._capacity = len(rows)
+        return index
+
+    def save(self, path: str, count: int) -> None:
+        """Write rows below `count` as one .npz: postings back to back, keys in a JSON header."""
+        header = {"version": INDEX_VERSION, "count": count, "numbers": list(self._numbers),
+                  "strings": sorted(self._strings)}
+        postings, offsets = [], [0]
+        for name, table in self._tables():
+            header[name] = []
+            for key, found in table.items():
+                header[name].append(list(key) if isinstance(key, tuple) else key)
+                postings.append(found.below(count))
+                offsets.append(offsets[-1] + len(postings[-1]))
+        numbers = np.empty((len(self._numbers), count))
+        for i, column in enumerate(self._numbers.values()):
+            numbers[i] = column[:count]
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)),
+                     rows=np.concatenate(postings) if postings else np.empty(0, dtype=np.int32),
+                     offsets=np.array(offsets, dtype=np.int64), numbers=numbers)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str, count: int) -> Optional["MetadataIndex"]:
+        """The index saved at `path`, or None if it is missing or not for `count` rows."""
+        try:
+            with np.load(path) as data:
+                header = json.loads(str(data["header"]))
+                if header.get("version") != INDEX_VERSION or header.get("count") != count:
+                    return None
+                rows, offsets, numbers = data["rows"], data["offsets"], data["numbers"]
+        except (OSError, ValueError, KeyError):
+            return None
+        index = cls()
+        position = 0
+        for name, table in index._tables():
+            for key in header[name]:
+                table[tuple(key) if isinstance(key, list) else key] = _Rows(
+                    rows[offsets[position]:offsets[position + 1]])
+                position += 1
+        index._numbers = dict(zip(header["numbers"], numbers))
+        index._strings = set(header["strings"])
+        index._capacity = count
+        return index
+
+    def mask(self, filters: MetadataFilters, count: int) -> Optional[np.ndarray]:
+        """Rows below `count` matching `filters`, with the semantics of SimpleVectorStore."""
+        condition = filters.condition or FilterCondition.AND
+        if condition not in (FilterCondition.AND, FilterCondition.OR):
+            return None
+        combined = None
+        for filter_ in filters.filters:
+            if not isinstance(filter_, MetadataFilter):
+                return None
+            selected = self._filter_mask(filter_, count)
+            if selected is None:
+                return None
+            if combined is None:
+                combined = selected
+            elif condition == FilterCondition.AND:
+                combined &= selected
+            else:
+                combined |= selected
+        return np.ones(count, dtype=bool) if combined is None else combined
+
+    def _bits(self, table: dict, keys: list, count: int) -> np.ndarray:
+        bits = np.zeros(count, dtype=bool)
+        for key in keys:
+            rows = table.get(key)
+            if rows is not None:
+                bits[rows.below(count)] = True
+        return bits
+
+    def _filter_mask(self, filter_: MetadataFilter, count: int) -> Optional[np.ndarray]:
+        key, value, operator = filter_.key, filter_.value, filter_.operator
+        if operator in (FilterOperator.EQ, FilterOperator.NE):
+            if not _hashable(value):
+                return None
+            selected = self._bits(self._postings, [(key, value)], count)
+        elif operator in (FilterOperator.IN, FilterOperator.NIN):
+            if not isinstance(value, (list, tuple)) or not all(_hashable(v) for v in value):
+                return None
+            selected = self._bits(self._postings, [(key, v) for v in value], count)
+        elif operator in (FilterOperator.GT, FilterOperator.GTE,
+                          FilterOperator.LT, FilterOperator.LTE):
+            if not _is_number(value) or key in self._strings:
+                return None
+            column = self._numbers.get(key)
+            if column is None:
+                return np.zeros(count, dtype=bool)
+            column = column[:count]
+            # NaN (missing or not a number) compares False
+            with np.errstate(invalid="ignore"):
+                if operator == FilterOperator.GT:
+                    return column > value
+                if operator == FilterOperator.GTE:
+                    return column >= value
+                if operator == FilterOperator.LT:
+                    return column < value
+                return column <= value
+        elif operator in (FilterOperator.CONTAINS, FilterOperator.ANY, FilterOperator.ALL):
+            # `value in metadata_value` is a substring test on strings
+            values = [value] if operator == FilterOperator.CONTAINS else value
+            if key in self._strings or not isinstance(values, (list, tuple)) \
+                    or not all(_hashable(v) for v in values):
+                return None
+            if operator != FilterOperator.ALL:
+                return self._bits(self._items, [(key, v) for v in values], count)
+            selected = self._bits(self._present, [key], count)
+            for v in values:
+                selected &= self._bits(self._items, [(key, v)], count)
+            return selected
+        else:
+            return None
+        if operator in (FilterOperator.NE, FilterOperator.NIN):
+            # A missing key matches neither EQ nor NE
+            return self._bits(self._present, [key], count) & ~selected
+        return selected
+
+
+def _hashable(value) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,113 @@
+# mmr_postprocessor.py
+# Maximal marginal relevance (MMR) over retrieved nodes. A plain top k often
+# holds near-identical chunks, so more has to be fetched for coverage and the
+# prompt grows. Here a larger candidate set is narrowed to `top_n` nodes that
+# are relevant to the query but dissimilar to each other, and that fit a
+# prompt token budget. Relevance and pairwise similarity come from one
+# embeddings matrix product; each pick is an argmax plus a running maximum.
+# Vector stores such as Chroma return nodes without embeddings, so missing
+# ones are embedded (with EMBED_CACHE these are cache hits).
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.utils import get_tokenizer
+
+from numpy_vector_store import normalize_rows
+
+# Weight of relevance against novelty; 1.0 is a plain similarity ranking
+DEFAULT_MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Tokens of node text sent to the LLM; 0 for no cap
+DEFAULT_TOKEN_BUDGET = int(os.getenv("MMR_TOKEN_BUDGET", "2048"))
+
+
+def mmr_select(query: np.ndarray, vectors: np.ndarray, top_n: int, mmr_lambda: float,
+               tokens: Optional[np.ndarray] = None, token_budget: int = 0) -> list[int]:
+    """
+    Rows of `vectors` picked by MMR, in pick order. Rows whose tokens would
+    exceed token_budget are skipped; the first pick is always kept.
+    """
+    if not len(vectors):
+        return []
+    vectors = normalize_rows(vectors)
+    relevance = vectors @ normalize_rows(query)[0]
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(len(vectors), dtype=np.float32)  # max similarity to the picks
+    open_rows = np.ones(len(vectors), dtype=bool)
+    picks: list[int] = []
+    used = 0
+    while len(picks) < top_n and open_rows.any():
+        scores = np.where(open_rows, mmr_lambda * relevance - (1 - mmr_lambda) * redundancy,
+                          -np.inf)
+        row = int(np.argmax(scores))
+        open_rows[row] = False
+        if token_budget and picks and used + tokens[row] > token_budget:
+            continue
+        picks.append(row)
+        used += 0 if tokens is None else int(tokens[row])
+        redundancy = np.maximum(redundancy, similarity[row])
+    return picks
+
+
+class MMRPostprocessor(BaseNodePostprocessor):
+    """
+    Reorders and cuts candidates to `top_n` by maximal marginal relevance
+    within `token_budget` tokens of node text. Node scores are kept.
+    """
+
+    top_n: int = Field(default=3, description="Nodes to keep.")
+    mmr_lambda: float = Field(default=DEFAULT_MMR_LAMBDA,
+                              description="Relevance weight; 1 - mmr_lambda weighs novelty.")
+    token_budget: int = Field(default=DEFAULT_TOKEN_BUDGET,
+                              description="Maximum tokens of node text kept; 0 for no cap.")
+    embed_model: Optional[BaseEmbedding] = Field(default=None, exclude=True,
+                                                 description="Default: Settings.embed_model.")
+    tokenizer: Optional[Callable] = Field(default=None, exclude=True,
+                                          description="Default: llama_index's tokenizer.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MMRPostprocessor"
+
+    def _postprocess_nodes(self, nodes: List[NodeWithScore],
+                           query_bundle: Optional[QueryBundle] = None) -> List[NodeWithScore]:
+        if query_bundle is None or len(nodes) <= 1:
+            return nodes[:self.top_n]
+        embed_model = self.embed_model or Settings.embed_model
+        query = query_bundle.embedding or embed_model.get_agg_embedding_from_queries(
+            query_bundle.embedding_strs)
+        missing = [n.node for n in nodes if n.node.embedding is None]
+        vectors = embed_model.get_text_embedding_batch(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in missing])
+        return self._select(nodes, query, dict(zip((node.node_id for node in missing), vectors)))
+
+    async def _apostprocess_nodes(self, nodes: List[NodeWithScore],
+                                  query_bundle: Optional[QueryBundle] = None
+                                  ) -> List[NodeWithScore]:
+        if query_bundle is None or len(nodes) <= 1:
+            return nodes[:self.top_n]
+        embed_model = self.embed_model or Settings.embed_model
+        query = query_bundle.embedding or await embed_model.aget_agg_embedding_from_queries(
+            query_bundle.embedding_strs)
+        missing = [n.node for n in nodes if n.node.embedding is None]
+        vectors = await embed_model.aget_text_embedding_batch(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in missing])
+        return self._select(nodes, query, dict(zip((node.node_id for node in missing), vectors)))
+
+    def _select(self, nodes: List[NodeWithScore], query: list,
+                embedded: dict) -> List[NodeWithScore]:
+        vectors = np.array([n.node.embedding or embedded[n.node.node_id] for n in nodes],
+                           dtype=np.float32)
+        tokens = None
+        if self.token_budget:
+            tokenizer = self.tokenizer or get_tokenizer()
+            tokens = np.array([len(tokenizer(n.node.get_content(metadata_mode=MetadataMode.LLM)))
+                               for n in nodes])
+        picks = mmr_select(np.asarray(query, dtype=np.float32), vectors, self.top_n,
+                           self.mmr_lambda, tokens, self.token_budget)
+        return [nodes[row] for row in picks]
@@ -0,0 +1,355 @@
+# mock_backend.py
+# Offline LLM and embedding models behind LLMType.MOCK. They need no network
+# and are deterministic for a given seed, so the examples' pipelines can be
+# benchmarked end to end (and in CI) with only the framework overhead plus a
+# configurable, simulated model cost:
+#
+# - latency drawn from a fixed, uniform, exponential or lognormal distribution
+# - streaming at a given tokens/sec rate (a token is one word here)
+# - hash-based embeddings: words are hashed into a vector of embed_dim, so texts
+#   sharing words are similar and retrieval still returns sensible nodes
+# - scripted answers (e.g. SQL for text-to-SQL) and scripted tool calls
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.base.llms.types import (ChatMessage, ChatResponse,
+                                              ChatResponseAsyncGen,
+                                              ChatResponseGen,
+                                              CompletionResponse,
+                                              CompletionResponseAsyncGen,
+                                              CompletionResponseGen,
+                                              LLMMetadata, MessageRole)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.callbacks import (llm_chat_callback,
+                                             llm_completion_callback)
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.llms.llm import ToolSelection
+
+DEFAULT_LATENCY = float(os.getenv("MOCK_LATENCY", "0.0"))
+DEFAULT_TOKENS_PER_SECOND = float(os.getenv("MOCK_TOKENS_PER_SECOND", "0"))
+DEFAULT_EMBED_DIM = int(os.getenv("MOCK_EMBED_DIM", "768"))
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+_WORD = re.compile(r"\w+")
+
+
+def sample_latency(rng: random.Random, mean: float, dist: str = "fixed",
+                   jitter: float = 0.0) -> float:
+    """
+    Draw one latency in seconds with the given mean. jitter is the relative
+    half-width for "uniform" and sigma for "lognormal".
+    """
+    if mean <= 0:
+        return 0.0
+    if dist == "fixed":
+        return mean
+    if dist == "uniform":
+        return rng.uniform(mean * (1 - jitter), mean * (1 + jitter))
+    if dist == "exponential":
+        return rng.expovariate(1.0 / mean)
+    if dist == "lognormal":
+        # mu chosen so the distribution's mean stays `mean`
+        return mean * rng.lognormvariate(-jitter ** 2 / 2, jitter)
+    raise ValueError(
+        f"Unsupported latency distribution: {dist}. Supported: {LATENCY_DISTRIBUTIONS}")
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(),
+                          "little")
+
+
+def hash_embedding(text: str, dim: int = DEFAULT_EMBED_DIM) -> Embedding:
+    """Deterministic unit vector: signed feature hashing of the text's words."""
+    hashes = np.fromiter((_word_hash(w) for w in _WORD.findall(text.lower())), dtype=np.uint64)
+    vector = np.zeros(dim, dtype=np.float32)
+    signs = np.where(hashes >> np.uint64(63), 1.0, -1.0).astype(np.float32)
+    np.add.at(vector, (hashes % np.uint64(dim)).astype(np.int64), signs)
+    norm = np.linalg.norm(vector)
+    if not norm:
+        # No words: fall back to a pseudo-random direction seeded by the text
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+    return (vector / norm).tolist()
+
+
+class MockLLM(FunctionCallingLLM):
+    """
+    Function-calling LLM that answers locally after a simulated delay.
+    Answers are picked from `responses` by prompt hash, or else made of
+    `output_tokens` words sampled from the prompt. With tools, turn N of a
+    conversation (N assistant messages since the last user message) returns
+    tool_script[N]: a {"name": ..., "arguments": {...}} dict or a list of them.
+    """
+
+    model: str = "mock-llm"
+    temperature: float = 0.1
+    context_window: int = 8192
+    latency: float = Field(default=DEFAULT_LATENCY,
+                           description="Mean seconds before the first token.")
+    latency_dist: str = "fixed"
+    latency_jitter: float = 0.0
+    tokens_per_second: float = Field(default=DEFAULT_TOKENS_PER_SECOND,
+                                     description="Generation rate; 0 means instant.")
+    output_tokens: int = 32
+    responses: List[str] = Field(default_factory=list)
+    tool_script: List[Any] = Field(default_factory=list)
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if self.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {self.latency_dist}. "
+                             f"Supported: {LATENCY_DISTRIBUTIONS}")
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MockLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=self.context_window,
+                           num_output=self.output_tokens, model_name=self.model,
+                           is_chat_model=True, is_function_calling_model=True)
+
+    # --- simulated generation ---
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        if self.responses:
+            return self.responses[int.from_bytes(digest[:8], "little") % len(self.responses)]
+        words = _WORD.findall(prompt) or ["mock"]
+        rng = random.Random(digest)
+        return " ".join(rng.choice(words) for _ in range(self.output_tokens))
+
+    def _delays(self, n_tokens: int) -> tuple[float, float]:
+        """(time to first token, time per further token)."""
+        first = sample_latency(self._rng, self.latency, self.latency_dist, self.latency_jitter)
+        per_token = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return first, per_token if n_tokens > 1 else 0.0
+
+    def _scripted_tool_calls(self, messages: Sequence[ChatMessage],
+                             tools: Optional[list]) -> Optional[list]:
+        if not tools or not self.tool_script:
+            return None
+        turn = 0
+        for message in reversed(messages):
+            if message.role == MessageRole.USER:
+                break
+            turn += message.role == MessageRole.ASSISTANT
+        if turn >= len(self.tool_script):
+            return None
+        step = self.tool_script[turn]
+        calls = step if isinstance(step, list) else [step]
+        return [{"id": f"call_{turn}_{i}", "name": call["name"],
+                 "arguments": call.get("arguments", {})} for i, call in enumerate(calls)]
+
+    def _reply(self, messages: Sequence[ChatMessage], tools: Optional[list]) -> ChatMessage:
+        tool_calls = self._scripted_tool_calls(messages, tools)
+        if tool_calls:
+            return ChatMessage(role=MessageRole.ASSISTANT, content="",
+                               additional_kwargs={"tool_calls": tool_calls})
+        prompt = "\n".join(str(m.content or "") for m in messages)
+        return ChatMessage(role=MessageRole.ASSISTANT, content=self._answer(prompt))
+
+    # --- responses; the public methods below only add the callback events ---
+
+    def _respond(self, messages: Sequence[ChatMessage], tools: Optional[list]) -> ChatResponse:
+        message = self._reply(messages, tools)
+        tokens = (message.content or "").split()
+        first, per_token = self._delays(len(tokens))
+        time.sleep(first + per_token * max(0, len(tokens) - 1))
+        return ChatResponse(message=message)
+
+    async def _arespond(self, messages: Sequence[ChatMessage],
+                        tools: Optional[list]) -> ChatResponse:
+        message = self._reply(messages, tools)
+        tokens = (message.content or "").split()
+        first, per_token = self._delays(len(tokens))
+        await asyncio.sleep(first + per_token * max(0, len(tokens) - 1))
+        return ChatResponse(message=message)
+
+    def _stream(self, messages: Sequence[ChatMessage], tools: Optional[list]) -> ChatResponseGen:
+        message = self._reply(messages, tools)
+
+        def gen() -> ChatResponseGen:
+            tokens = (message.content or "").split() or [""]
+            first, per_token = self._delays(len(tokens))
+            time.sleep(first)
+            content = ""
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(per_token)
+                delta = token if i == len(tokens) - 1 else token + " "
+                content += delta
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=content,
+                                        additional_kwargs=message.additional_kwargs),
+                    delta=delta)
+
+        return gen()
+
+    def _astream(self, messages: Sequence[ChatMessage],
+                 tools: Optional[list]) -> ChatResponseAsyncGen:
+        message = self._reply(messages, tools)
+
+        async def gen() -> ChatResponseAsyncGen:
+            tokens = (message.content or "").split() or [""]
+            first, per_token = self._delays(len(tokens))
+            await asyncio.sleep(first)
+            content = ""
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(per_token)
+                delta = token if i == len(tokens) - 1 else token + " "
+                content += delta
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=content,
+                                        additional_kwargs=message.additional_kwargs),
+                    delta=delta)
+
+        return gen()
+
+    # --- chat ---
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._respond(messages, kwargs.get("tools"))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return self._stream(messages, kwargs.get("tools"))
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await self._arespond(messages, kwargs.get("tools"))
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage],
+                           **kwargs: Any) -> ChatResponseAsyncGen:
+        return self._astream(messages, kwargs.get("tools"))
+
+    # --- completion: same machinery on a single user message, without the
+    # chat callbacks, so each completion is counted once ---
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False,
+                 **kwargs: Any) -> CompletionResponse:
+        response = self._respond([ChatMessage(role=MessageRole.USER, content=prompt)], None)
+        return CompletionResponse(text=response.message.content)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponseGen:
+        stream = self._stream([ChatMessage(role=MessageRole.USER, content=prompt)], None)
+
+        def gen() -> CompletionResponseGen:
+            for chunk in stream:
+                yield CompletionResponse(text=chunk.message.content, delta=chunk.delta)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponse:
+        response = await self._arespond(
+            [ChatMessage(role=MessageRole.USER, content=prompt)], None)
+        return CompletionResponse(text=response.message.content)
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        stream = self._astream([ChatMessage(role=MessageRole.USER, content=prompt)], None)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            async for chunk in stream:
+                yield CompletionResponse(text=chunk.message.content, delta=chunk.delta)
+
+        return gen()
+
+    # --- tool calling ---
+
+    def _prepare_chat_with_tools(self, tools: Sequence[Any],
+                                 user_msg: Optional[str | ChatMessage] = None,
+                                 chat_history: Optional[List[ChatMessage]] = None,
+                                 verbose: bool = False, allow_parallel_tool_calls: bool = False,
+                                 **kwargs: Any) -> Dict[str, Any]:
+        messages = list(chat_history or [])
+        if user_msg:
+            if isinstance(user_msg, str):
+                user_msg = ChatMessage(role=MessageRole.USER, content=user_msg)
+            messages.append(user_msg)
+        return {"messages": messages,
+                "tools": [tool.metadata.name for tool in tools] or None,
+                **kwargs}
+
+    def get_tool_calls_from_response(self, response: ChatResponse,
+                                     error_on_no_tool_call: bool = True,
+                                     **kwargs: Any) -> List[ToolSelection]:
+        tool_calls = response.message.additional_kwargs.get("tool_calls", [])
+        if not tool_calls and error_on_no_tool_call:
+            raise ValueError(
+                f"Expected at least one tool call, but got {len(tool_calls)} tool calls.")
+        return [ToolSelection(tool_id=call["id"], tool_name=call["name"],
+                              tool_kwargs=call["arguments"]) for call in tool_calls]
+
+
+class MockEmbedding(BaseEmbedding):
+    """Embedding model returning hash_embedding() vectors after a simulated delay."""
+
+    model_name: str = "mock-embed"
+    embed_dim: int = DEFAULT_EMBED_DIM
+    latency: float = DEFAULT_LATENCY
+    latency_dist: str = "fixed"
+    latency_jitter: float = 0.0
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if self.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {self.latency_dist}. "
+                             f"Supported: {LATENCY_DISTRIBUTIONS}")
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MockEmbedding"
+
+    def _delay(self) -> float:
+        return sample_latency(self._rng, self.latency, self.latency_dist, self.latency_jitter)
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    # One simulated round trip per batch, like a real batched request
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        time.sleep(self._delay())
+        return [hash_embedding(text, self.embed_dim) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        await asyncio.sleep(self._delay())
+        return [hash_embedding(text, self.embed_dim) for text in texts]
@@ -0,0 +1,124 @@
+# model_wrappers.py
+# Base classes for models that wrap another LlamaIndex model and add behaviour
+# (caching, batching, throttling, ...) around it. Embedding wrappers forward to
+# the inner model's private hooks so callbacks fire once, on the outer model;
+# LLM wrappers forward to the inner model's public (instrumented) methods.
+from typing import Any, Dict, List, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.base.llms.types import (ChatMessage, ChatResponse,
+                                              ChatResponseAsyncGen,
+                                              ChatResponseGen,
+                                              CompletionResponse,
+                                              CompletionResponseAsyncGen,
+                                              CompletionResponseGen,
+                                              LLMMetadata)
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import LLM
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+
+# pylint: disable=protected-access
+
+
+class WrappedEmbedding(BaseEmbedding):
+    """Embedding model that delegates every call to an inner embedding model."""
+
+    _inner: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, **kwargs: Any) -> None:
+        kwargs.setdefault("model_name", inner.model_name)
+        kwargs.setdefault("embed_batch_size", inner.embed_batch_size)
+        super().__init__(**kwargs)
+        self._inner = inner
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "WrappedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._inner._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._inner._aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._inner._get_text_embedding(text)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await self._inner._aget_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._inner._get_text_embeddings(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._inner._aget_text_embeddings(texts)
+
+
+class WrappedLLM(FunctionCallingLLM):
+    """
+    LLM that delegates every call to an inner LLM. Tool-calling helpers are
+    forwarded too, so a wrapped Ollama/OpenAI model still works with agents.
+    """
+
+    _inner: LLM = PrivateAttr()
+
+    def __init__(self, inner: LLM, **kwargs: Any) -> None:
+        kwargs.setdefault("callback_manager", inner.callback_manager)
+        super().__init__(**kwargs)
+        self._inner = inner
+
+    @property
+    def inner(self) -> LLM:
+        return self._inner
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "WrappedLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self._inner.metadata
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._inner.chat(messages, **kwargs)
+
+    def complete(self, prompt: str, formatted: bool = False,
+                 **kwargs: Any) -> CompletionResponse:
+        return self._inner.complete(prompt, formatted=formatted, **kwargs)
+
+    def stream_chat(self, messages: Sequence[ChatMessage],
+                    **kwargs: Any) -> ChatResponseGen:
+        return self._inner.stream_chat(messages, **kwargs)
+
+    def stream_complete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponseGen:
+        return self._inner.stream_complete(prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages: Sequence[ChatMessage],
+                    **kwargs: Any) -> ChatResponse:
+        return await self._inner.achat(messages, **kwargs)
+
+    async def acomplete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponse:
+        return await self._inner.acomplete(prompt, formatted=formatted, **kwargs)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage],
+                           **kwargs: Any) -> ChatResponseAsyncGen:
+        return await self._inner.astream_chat(messages, **kwargs)
+
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await self._inner.astream_complete(prompt, formatted=formatted, **kwargs)
+
+    def _prepare_chat_with_tools(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return self._inner._prepare_chat_with_tools(*args, **kwargs)
+
+    def _validate_chat_with_tools_response(self, *args: Any, **kwargs: Any) -> ChatResponse:
+        return self._inner._validate_chat_with_tools_response(*args, **kwargs)
+
+    def get_tool_calls_from_response(self, *args: Any, **kwargs: Any):
+        return self._inner.get_tool_calls_from_response(*args, **kwargs)
@@ -0,0 +1,413 @@
+# numpy_vector_store.py
+# Drop-in replacement for the in-memory SimpleVectorStore. SimpleVectorStore
+# keeps each embedding as a Python list and scores nodes one by one; here all
+# embeddings live, L2-normalized, in one contiguous float32 matrix, so a query
+# is a single matrix-vector product plus argpartition for the top k. Capacity
+# doubles as vectors are added.
+#
+# Readers never lock: every write publishes a new snapshot (matrix, row count,
+# row ids, id -> row map, live-row mask). Appends go to rows past the published
+# count, writes copy the mask and the id -> row map, and growth or compaction
+# copies the matrix, so a query keeps a consistent view of whatever snapshot
+# it started with. Node metadata is shared; a node deleted after a reader's
+# snapshot was taken reads as having none.
+#
+# Metadata filters are answered from a bitmap index over the rows
+# (metadata_index.MetadataIndex), kept up to date by appends and compactions;
+# when a filter leaves few rows, only those rows are scored.
+#
+# Persisted as a .npy matrix, memory-mapped on load, plus a pack file
+# (packed_storage) holding the node ids, ref doc ids and metadata, and the
+# metadata index (.metadata.npz); the JSON file SimpleVectorStore writes can
+# still be loaded, its metadata index is built on the first filtered query.
+import json
+import os
+import threading
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.simple import _build_metadata_filter_fn
+from llama_index.core.vector_stores.types import (DEFAULT_PERSIST_DIR,
+                                                  DEFAULT_PERSIST_FNAME,
+                                                  BasePydanticVectorStore,
+                                                  MetadataFilters,
+                                                  VectorStoreQuery,
+                                                  VectorStoreQueryMode,
+                                                  VectorStoreQueryResult)
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from pydantic import PrivateAttr
+
+from metadata_index import MetadataIndex
+from packed_storage import PackedTable, read_pack, write_pack
+
+MIN_CAPACITY = 1024
+# Dead rows are compacted away once they make up this share of the matrix
+COMPACT_RATIO = 0.25
+# Queries whose mask keeps fewer than this share of the rows score only those rows
+SUBSET_RATIO = 0.25
+
+
+class _Snapshot(NamedTuple):
+    matrix: np.ndarray  # capacity x dim; rows [0, count) are published
+    count: int
+    ids: list  # row -> node id; only appended to until the next compaction
+    rows: dict  # node id -> row of live nodes; copied on write
+    alive: np.ndarray  # capacity bools; copied on delete
+    dead: int
+    codes: Any = None  # compressed rows, for subclasses that search them
+    metadata_index: Optional[MetadataIndex] = None  # None: built when first needed
+    layout: int = 0  # bumped by compactions, which renumber the rows
+
+
+def _empty() -> _Snapshot:
+    return _Snapshot(np.empty((0, 0), dtype=np.float32), 0, [], {}, np.zeros(0, dtype=bool), 0,
+                     metadata_index=MetadataIndex())
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Best k (scores, columns) per row of a score matrix, sorted best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty, empty.astype(np.int64)
+    if k < scores.shape[1]:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(k), (scores.shape[0], k))
+    best = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-best, axis=1, kind="stable")
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(columns, order, axis=1)
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """
+    In-memory cosine-similarity vector store on a float32 matrix. Loaded
+    matrices stay memory-mapped until the first write copies them.
+    """
+
+    stores_text: bool = False
+    # Answer metadata filters from the bitmap index instead of testing each node
+    index_metadata: bool = True
+
+    _snapshot: _Snapshot = PrivateAttr(default_factory=_empty)
+    _ref_doc_ids: dict = PrivateAttr(default_factory=dict)  # node id -> ref doc id
+    _ref_doc_nodes: dict = PrivateAttr(default_factory=dict)  # ref doc id -> node ids
+    _metadata: PackedTable = PrivateAttr(default_factory=PackedTable)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    def __len__(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.count - snapshot.dead
+
+    def __bool__(self) -> bool:
+        # StorageContext.from_defaults tests `if vector_store:` and would swap
+        # an empty store for a SimpleVectorStore
+        return True
+
+    def node_ids(self) -> list[str]:
+        snapshot = self._snapshot
+        return [snapshot.ids[row] for row in np.flatnonzero(snapshot.alive[:snapshot.count])]
+
+    # Writes
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        self.update(add=nodes)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self.update(delete_ref_doc_ids=[ref_doc_id])
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None,
+                     filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        rows = self._snapshot.rows
+        candidates = list(rows) if node_ids is None else node_ids
+        matches = _build_metadata_filter_fn(self._node_metadata, filters)
+        self.update(delete_node_ids=[n for n in candidates if n in rows and matches(n)])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshot = _empty()
+            self._ref_doc_ids, self._ref_doc_nodes, self._metadata = {}, {}, PackedTable()
+
+    def update(self, delete_ref_doc_ids: Sequence[str] = (), delete_node_ids: Sequence[str] = (),
+               add: Sequence[BaseNode] = ()) -> None:
+        """Apply deletes, then adds (replacing existing ids), as one published snapshot."""
+        with self._lock:
+            snapshot = self._snapshot
+            doomed = set(delete_node_ids)
+            for ref_doc_id in delete_ref_doc_ids:
+                doomed.update(self._ref_doc_nodes.get(ref_doc_id, ()))
+            doomed.update(node.node_id for node in add if node.node_id in snapshot.rows)
+            if doomed:
+                snapshot = self._kill(snapshot, doomed)
+            if add:
+                snapshot = self._append(snapshot, add)
+            if snapshot.dead > COMPACT_RATIO * max(snapshot.count, MIN_CAPACITY):
+                snapshot = self._compact(snapshot)
+            self._snapshot = snapshot
+
+    def _kill(self, snapshot: _Snapshot, node_ids: set) -> _Snapshot:
+        alive, rows = snapshot.alive.copy(), dict(snapshot.rows)
+        for node_id in node_ids:
+            row = rows.pop(node_id, None)
+            if row is None:
+                continue
+            alive[row] = False
+            ref_doc_id = self._ref_doc_ids.pop(node_id, None)
+            siblings = self._ref_doc_nodes.get(ref_doc_id)
+            if siblings is not None:
+                siblings.discard(node_id)
+                if not siblings:
+                    del self._ref_doc_nodes[ref_doc_id]
+            self._metadata.pop(node_id, None)
+        dead = snapshot.count - int(alive[:snapshot.count].sum())
+        return snapshot._replace(rows=rows, alive=alive, dead=dead)
+
+    def _append(self, snapshot: _Snapshot, nodes: Sequence[BaseNode]) -> _Snapshot:
+        vectors = normalize_rows([node.get_embedding() for node in nodes])
+        matrix, alive, ids, count = snapshot.matrix, snapshot.alive, snapshot.ids, snapshot.count
+        rows = dict(snapshot.rows)
+        if count and vectors.shape[1] != matrix.shape[1]:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match "
+                             f"the store's {matrix.shape[1]}.")
+        needed = count + len(nodes)
+        if needed > matrix.shape[0] or not count:
+            # Amortized growth; readers keep the old matrix
+            capacity = max(MIN_CAPACITY, matrix.shape[0])
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if count:
+                grown[:count] = matrix[:count]
+            grown_alive = np.zeros(capacity, dtype=bool)
+            grown_alive[:count] = alive[:count]
+            matrix, alive, ids = grown, grown_alive, list(ids)
+        # Rows past `count` are invisible to published snapshots
+        matrix[count:needed] = vectors
+        alive[count:needed] = True
+        for row, node in enumerate(nodes, start=count):
+            ids.append(node.node_id)
+            rows[node.node_id] = row
+            ref_doc_id = node.ref_doc_id or "None"
+            self._ref_doc_ids[node.node_id] = ref_doc_id
+            self._ref_doc_nodes.setdefault(ref_doc_id, set()).add(node.node_id)
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+            metadata.pop("_node_content", None)
+            self._metadata[node.node_id] = metadata
+        if snapshot.metadata_index is not None:
+            snapshot.metadata_index.add(range(count, needed),
+                                        [self._metadata[node.node_id] for node in nodes])
+        return _Snapshot(matrix, needed, ids, rows, alive, snapshot.dead,
+                         metadata_index=snapshot.metadata_index, layout=snapshot.layout)
+
+    def _compact(self, snapshot: _Snapshot) -> _Snapshot:
+        rows = np.flatnonzero(snapshot.alive[:snapshot.count])
+        capacity = max(MIN_CAPACITY, 2 * len(rows))
+        matrix = np.empty((capacity, snapshot.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(rows)] = snapshot.matrix[rows]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(rows)] = True
+        ids = [snapshot.ids[row] for row in rows]
+        index = snapshot.metadata_index
+        return _Snapshot(matrix, len(rows), ids, {node_id: row for row, node_id in enumerate(ids)},
+                         alive, 0,
+                         metadata_index=None if index is None
+                         else index.subset(rows, snapshot.count),
+                         layout=snapshot.layout + 1)
+
+    # Reads
+
+    def _mask(self, snapshot: _Snapshot, query: VectorStoreQuery) -> Optional[np.ndarray]:
+        """Rows a query may return, or None when every published row is live."""
+        mask = snapshot.alive[:snapshot.count] if snapshot.dead else None
+        if query.node_ids is None and query.filters is None:
+            return mask
+        mask = snapshot.alive[:snapshot.count]
+        if query.node_ids is not None:
+            selected = np.zeros(snapshot.count, dtype=bool)
+            for node_id in query.node_ids:
+                row = snapshot.rows.get(node_id)
+                if row is not None and row < snapshot.count:
+                    selected[row] = True
+            mask = mask & selected
+        if query.filters is None:
+            return mask
+        selected = self._filter_mask(snapshot, query.filters)
+        if selected is not None:
+            return mask & selected
+        # Filters the index cannot answer are tested node by node
+        matches = _build_metadata_filter_fn(self._node_metadata, query.filters)
+        selected = np.zeros(snapshot.count, dtype=bool)
+        for row in np.flatnonzero(mask):
+            selected[row] = matches(snapshot.ids[row])
+        return selected
+
+    def _node_metadata(self, node_id: str) -> dict:
+        # {} for a node deleted since the caller's snapshot was taken
+        return self._metadata.get(node_id) or {}
+
+    def _filter_mask(self, snapshot: _Snapshot, filters: MetadataFilters) -> Optional[np.ndarray]:
+        """Rows matching `filters` according to the metadata index, if it can tell."""
+        if not self.index_metadata:
+            return None
+        index = snapshot.metadata_index
+        if index is None:
+            with self._lock:
+                current = self._snapshot
+                if current.metadata_index is None:
+                    index = MetadataIndex()
+                    rows = np.flatnonzero(current.alive[:current.count]).tolist()
+                    index.add(rows, [self._metadata[current.ids[row]] for row in rows])
+                    self._snapshot = current = current._replace(metadata_index=index)
+            # Appends keep row numbers, a compaction since `snapshot` renumbers them
+            if current.layout != snapshot.layout:
+                return None
+            index = current.metadata_index
+        return index.mask(filters, snapshot.count)
+
+    def filter_node_ids(self, filters: MetadataFilters) -> list[str]:
+        """Ids of the live nodes matching `filters`."""
+        snapshot = self._snapshot
+        mask = self._mask(snapshot, VectorStoreQuery(filters=filters))
+        if mask is None:
+            return self.node_ids()
+        return [snapshot.ids[row] for row in np.flatnonzero(mask)]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Invalid query mode: {query.mode}")
+        return self.query_many([query.query_embedding], query.similarity_top_k,
+                               query.node_ids, query.filters)[0]
+
+    def query_many(self, query_embeddings: Sequence[Sequence[float]], similarity_top_k: int,
+                   node_ids: Optional[List[str]] = None,
+                   filters: Optional[MetadataFilters] = None) -> List[VectorStoreQueryResult]:
+        """Search several query embeddings with one matrix product."""
+        snapshot = self._snapshot
+        if not snapshot.count:
+            return [VectorStoreQueryResult(similarities=[], ids=[]) for _ in query_embeddings]
+        mask = self._mask(snapshot, VectorStoreQuery(node_ids=node_ids, filters=filters))
+        best, rows = self._top_rows(snapshot, normalize_rows(query_embeddings), mask,
+                                    similarity_top_k)
+        results = []
+        for row_scores, row_ids in zip(best, rows):
+            keep = np.isfinite(row_scores)
+            results.append(VectorStoreQueryResult(
+                similarities=row_scores[keep].tolist(),
+                ids=[snapshot.ids[row] for row in row_ids[keep]]))
+        return results
+
+    def _top_rows(self, snapshot: _Snapshot, queries: np.ndarray, mask: Optional[np.ndarray],
+                  k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Best k (scores, rows) per normalized query; rows outside the mask score -inf."""
+        if mask is not None and mask.sum() < SUBSET_RATIO * snapshot.count:
+            # Selective filter: score only the rows it keeps
+            rows = np.flatnonzero(mask)
+            best, columns = top_k_rows(queries @ snapshot.matrix[rows].T, k)
+            return best, rows[columns]
+        if len(queries) == 1:
+            scores = (snapshot.matrix[:snapshot.count] @ queries[0])[None, :]
+        else:
+            scores = queries @ snapshot.matrix[:snapshot.count].T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        return top_k_rows(scores, k)
+
+    # Persistence
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        """Write `<name>.npy` and `<name>.pack` next to persist_path (a .json path)."""
+        stem = os.path.splitext(persist_path)[0]
+        os.makedirs(os.path.dirname(stem) or ".", exist_ok=True)
+        with self._lock:
+            snapshot = self._snapshot
+            rows = np.flatnonzero(snapshot.alive[:snapshot.count])
+            ids = [snapshot.ids[row] for row in rows]
+            with open(stem + ".npy.tmp", "wb") as f:
+                np.save(f, snapshot.matrix[rows])
+            os.replace(stem + ".npy.tmp", stem + ".npy")
+            write_pack(stem + ".pack", {"metadata": self._metadata},
+                       extra={"ref_doc_ids": [self._ref_doc_ids[node_id] for node_id in ids]},
+                       keys={"metadata": ids})
+            index = snapshot.metadata_index
+            if index is None:
+                index = MetadataIndex()
+                index.add(range(len(rows)), [self._metadata[node_id] for node_id in ids])
+            else:
+                index = index.subset(rows, snapshot.count)
+            index.save(stem + ".metadata.npz", len(rows))
+            self._persist_rows(stem, snapshot, rows)
+        # A JSON file from before the switch is stale now
+        if os.path.exists(persist_path) and persist_path.endswith(".json"):
+            os.remove(persist_path)
+
+    def _persist_rows(self, stem: str, snapshot: _Snapshot, rows: np.ndarray) -> None:
+        """Hook for subclasses to save per-row data of the persisted `rows`."""
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs=None, **kwargs: Any) -> "NumpyVectorStore":
+        stem = os.path.splitext(persist_path)[0]
+        if not os.path.exists(stem + ".npy"):
+            return cls._from_json(persist_path, **kwargs)
+        matrix = np.load(stem + ".npy", mmap_mode="r")
+        tables, extra = read_pack(stem + ".pack")
+        metadata = tables.get("metadata", PackedTable())
+        ids = list(metadata)
+        ref_doc_ids = extra.get("ref_doc_ids", [])
+        if not len(ids) == len(ref_doc_ids) == matrix.shape[0]:
+            raise ValueError(f"{stem}.npy and {stem}.pack do not match.")
+        store = cls(**kwargs)
+        if ids:
+            store._snapshot = _Snapshot(
+                matrix, len(ids), ids, {node_id: row for row, node_id in enumerate(ids)},
+                np.ones(len(ids), dtype=bool), 0,
+                metadata_index=MetadataIndex.load(stem + ".metadata.npz", len(ids)))
+        store._metadata = metadata
+        for node_id, ref_doc_id in zip(ids, ref_doc_ids):
+            store._ref_doc_ids[node_id] = ref_doc_id
+            store._ref_doc_nodes.setdefault(ref_doc_id, set()).add(node_id)
+        return store
+
+    @classmethod
+    def _from_json(cls, persist_path: str, **kwargs: Any) -> "NumpyVectorStore":
+        """Load the JSON file written by SimpleVectorStore."""
+        with open(persist_path, encoding="utf-8") as f:
+            data = json.load(f)
+        store = cls(**kwargs)
+        ids = list(data["embedding_dict"])
+        if ids:
+            ref_doc_ids = data.get("text_id_to_ref_doc_id", {})
+            metadata = data.get("metadata_dict") or {}
+            matrix = normalize_rows([data["embedding_dict"][node_id] for node_id in ids])
+            alive = np.ones(len(ids), dtype=bool)
+            store._snapshot = _Snapshot(matrix, len(ids), ids,
+                                        {node_id: row for row, node_id in enumerate(ids)},
+                                        alive, 0)
+            for node_id in ids:
+                ref_doc_id = ref_doc_ids.get(node_id, "None")
+                store._ref_doc_ids[node_id] = ref_doc_id
+                store._ref_doc_nodes.setdefault(ref_doc_id, set()).add(node_id)
+                store._metadata[node_id] = metadata.get(node_id, {})
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str = DEFAULT_PERSIST_DIR,
+                         namespace: str = "default", **kwargs: Any) -> "NumpyVectorStore":
+        return cls.from_persist_path(
+            os.path.join(persist_dir, f"{namespace}__{DEFAULT_PERSIST_FNAME}"), **kwargs)
@@ -0,0 +1,288 @@
+# ollama_balancer.py
+# Client-side load balancing across several Ollama hosts. The balancer plugs
+# into the Ollama SDK as an httpx transport, so every Ollama LLM and embedding
+# client built by llm_factory is balanced without changes to LlamaIndex:
+#
+# - least-outstanding-requests scheduling across healthy hosts
+# - model affinity: hosts that already have the requested model loaded
+#   (according to /api/ps or earlier requests) are preferred; a cold host is
+#   only chosen once the warm ones are `cold_penalty` requests busier
+# - periodic health checks against /api/ps
+# - hosts that fail repeatedly are ejected for a cool-down period, and a
+#   failed request (connection error, 502, 503 or 504) is retried on another
+#   host
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEALTH_INTERVAL = 10.0
+DEFAULT_MAX_FAILURES = 3
+DEFAULT_EJECT_SECONDS = 30.0
+DEFAULT_COLD_PENALTY = 4
+# Responses that mean the host (or a proxy in front of it) could not serve the
+# request; other 5xx, such as an unknown model, are returned to the caller
+FAILOVER_STATUSES = (502, 503, 504)
+
+
+@dataclass
+class OllamaHost:
+    base_url: str
+    outstanding: int = 0
+    healthy: bool = True
+    failures: int = 0
+    ejected_until: float = 0.0
+    loaded_models: set = field(default_factory=set)
+    requests: int = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+
+class OllamaBalancer:
+    """Host selection, health tracking and ejection for a set of Ollama hosts."""
+
+    def __init__(self, base_urls: list[str], transport: httpx.BaseTransport,
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL,
+                 max_failures: int = DEFAULT_MAX_FAILURES,
+                 eject_seconds: float = DEFAULT_EJECT_SECONDS,
+                 cold_penalty: int = DEFAULT_COLD_PENALTY):
+        if not base_urls:
+            raise ValueError("OllamaBalancer needs at least one base URL")
+        self.hosts = [OllamaHost(url.rstrip("/")) for url in base_urls]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.cold_penalty = cold_penalty
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.check_health()
+        if health_interval:
+            self._thread = threading.Thread(target=self._health_loop,
+                                            args=(health_interval,), daemon=True)
+            self._thread.start()
+
+    def pick(self, model: Optional[str] = None,
+             exclude: tuple = ()) -> Optional[OllamaHost]:
+        """Choose a host and count the request as outstanding on it."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [h for h in self.hosts
+                          if h.available(now) and h.base_url not in exclude]
+            if not candidates:
+                # Everything is down or ejected: try the rest rather than fail outright
+                candidates = [h for h in self.hosts if h.base_url not in exclude]
+            if not candidates:
+                return None
+
+            def load(h: OllamaHost) -> tuple:
+                # Loading a model on a cold host costs more than queueing a bit
+                cold = bool(model) and model not in h.loaded_models
+                return (h.outstanding + (self.cold_penalty if cold else 0), h.requests)
+
+            host = min(candidates, key=load)
+            host.outstanding += 1
+            host.requests += 1
+            return host
+
+    def release(self, host: OllamaHost) -> None:
+        with self._lock:
+            host.outstanding -= 1
+
+    def record_success(self, host: OllamaHost, model: Optional[str] = None) -> None:
+        with self._lock:
+            host.failures = 0
+            host.healthy = True
+            if model:
+                host.loaded_models.add(model)
+
+    def record_failure(self, host: OllamaHost) -> None:
+        with self._lock:
+            host.failures += 1
+            now = time.monotonic()
+            if host.failures >= self.max_failures and host.ejected_until <= now:
+                host.ejected_until = now + self.eject_seconds
+                logger.warning("Ejecting Ollama host %s for %.0fs after %d failures",
+                               host.base_url, self.eject_seconds, host.failures)
+
+    def check_health(self) -> None:
+        """Probe every host's /api/ps and refresh its loaded-model list."""
+        with httpx.Client(transport=self._transport, timeout=2.0) as client:
+            for host in self.hosts:
+                try:
+                    response = client.get(f"{host.base_url}/api/ps")
+                    response.raise_for_status()
+                    models = {m.get("model") or m.get("name")
+                              for m in response.json().get("models", [])}
+                except (httpx.HTTPError, ValueError):
+                    with self._lock:
+                        host.healthy = False
+                    self.record_failure(host)
+                    continue
+                with self._lock:
+                    host.healthy = True
+                    host.loaded_models = models
+                    # /api/ps answering does not mean requests succeed, so an
+                    # ejected host stays out until its cool-down has passed
+                    if host.ejected_until <= time.monotonic():
+                        host.failures = 0
+
+    def _health_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+def _request_model(request: httpx.Request) -> Optional[str]:
+    try:
+        return json.loads(request.content or b"{}").get("model")
+    except (ValueError, AttributeError, httpx.RequestNotRead):
+        return None
+
+
+def _routed(request: httpx.Request, host: OllamaHost) -> httpx.Request:
+    target = httpx.URL(host.base_url)
+    url = request.url.copy_with(scheme=target.scheme, host=target.host, port=target.port)
+    headers = request.headers.copy()
+    headers["host"] = target.netloc.decode("ascii")
+    return httpx.Request(request.method, url, headers=headers, content=request.content,
+                         extensions=request.extensions)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._on_close()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._on_close()
+
+
+class BalancingTransport(httpx.BaseTransport):
+    """Sync httpx transport that routes each request through an OllamaBalancer."""
+
+    def __init__(self, balancer: OllamaBalancer, transport: httpx.BaseTransport):
+        self.balancer = balancer
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model = _request_model(request)
+        tried = ()
+        last_error = None
+        for _ in self.balancer.hosts:
+            host = self.balancer.pick(model, exclude=tried)
+            if host is None:
+                break
+            tried += (host.base_url,)
+            try:
+                response = self._transport.handle_request(_routed(request, host))
+            except httpx.TransportError as e:
+                self.balancer.release(host)
+                self.balancer.record_failure(host)
+                last_error = e
+                continue
+            except BaseException:
+                # Cancelled or interrupted: the request is no longer outstanding
+                self.balancer.release(host)
+                raise
+            if response.status_code in FAILOVER_STATUSES:
+                self.balancer.record_failure(host)
+                if len(tried) < len(self.balancer.hosts):
+                    try:
+                        response.close()
+                    finally:
+                        self.balancer.release(host)
+                    continue
+                # No host left: hand the last gateway error to the caller as is
+            elif response.is_success:
+                self.balancer.record_success(host, model)
+            # Other errors (bad request, unknown model, out of memory) come from
+            # the request, not the host, and would fail the same way elsewhere
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=_ReleasingStream(response.stream,
+                                        lambda h=host: self.balancer.release(h)),
+                extensions=response.extensions)
+        raise httpx.ConnectError(f"No Ollama host could serve the request: {last_error}",
+                                 request=request)
+
+
+class AsyncBalancingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of BalancingTransport."""
+
+    def __init__(self, balancer: OllamaBalancer, transport: httpx.AsyncBaseTransport):
+        self.balancer = balancer
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model = _request_model(request)
+        tried = ()
+        last_error = None
+        for _ in self.balancer.hosts:
+            host = self.balancer.pick(model, exclude=tried)
+            if host is None:
+                break
+            tried += (host.base_url,)
+            try:
+                response = await self._transport.handle_async_request(
+                    _routed(request, host))
+            except httpx.TransportError as e:
+                self.balancer.release(host)
+                self.balancer.record_failure(host)
+                last_error = e
+                continue
+            except BaseException:
+                # Cancelled or interrupted: the request is no longer outstanding
+                self.balancer.release(host)
+                raise
+            if response.status_code in FAILOVER_STATUSES:
+                self.balancer.record_failure(host)
+                if len(tried) < len(self.balancer.hosts):
+                    try:
+                        await response.aclose()
+                    finally:
+                        self.balancer.release(host)
+                    continue
+                # No host left: hand the last gateway error to the caller as is
+            elif response.is_success:
+                self.balancer.record_success(host, model)
+            # Other errors (bad request, unknown model, out of memory) come from
+            # the request, not the host, and would fail the same way elsewhere
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=_AsyncReleasingStream(response.stream,
+                                             lambda h=host: self.balancer.release(h)),
+                extensions=response.extensions)
+        raise httpx.ConnectError(f"No Ollama host could serve the request: {last_error}",
+                                 request=request)
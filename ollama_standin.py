@@ -0,0 +1,169 @@
+# ollama_standin.py
+# A tiny local HTTP server that emulates the parts of the Ollama REST API the
+# examples use (/api/chat, /api/generate, /api/embeddings, /api/embed,
+# /api/tags, /api/ps). It is used by the benchmarks to measure client-side
+# overhead without a real model behind it.
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text: str, dim: int = 8) -> list[float]:
+    """Deterministic pseudo-embedding derived from the text hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128.0 for i in range(dim)]
+
+
+class StandinState:
+    """Mutable knobs shared by all request handlers of one server."""
+
+    def __init__(self, latency: float = 0.0, models: list[str] | None = None,
+                 loaded_models: list[str] | None = None, embed_dim: int = 8,
+                 capacity: int | None = None, retry_after_ms: int = 50):
+        self.latency = latency
+        self.models = models or ["qwen2.5:7b-instruct-q8_0",
+                                 "nomic-embed-text:latest"]
+        self.loaded_models = list(loaded_models or [])
+        self.embed_dim = embed_dim
+        # With a capacity, latency grows with the number of requests in flight
+        # and requests beyond it are rejected with 429 + retry-after-ms
+        self.capacity = capacity
+        self.retry_after_ms = retry_after_ms
+        self.active = 0
+        self.rejected = 0
+        self.fail = False
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks: list[dict]) -> None:
+        body = b"".join(json.dumps(c).encode("utf-8") + b"\n" for c in chunks)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _before_request(self) -> bool:
+        state = self.server.state
+        with state.lock:
+            state.requests += 1
+            overloaded = state.capacity is not None and state.active >= state.capacity
+            if overloaded:
+                state.rejected += 1
+            else:
+                state.active += 1
+                load = state.active
+        if overloaded:
+            self._send_json({"error": "server busy"}, status=429,
+                            headers={"retry-after-ms": str(state.retry_after_ms)})
+            return False
+        try:
+            if state.latency:
+                time.sleep(state.latency * (load if state.capacity else 1))
+        finally:
+            with state.lock:
+                state.active -= 1
+        if state.fail:
+            self._send_json({"error": "stand-in failure"}, status=500)
+            return False
+        return True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if not self._before_request():
+            return
+        state = self.server.state
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": m, "model": m} for m in state.models]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": [{"name": m, "model": m} for m in state.loaded_models]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        payload = self._read_json()
+        if not self._before_request():
+            return
+        state = self.server.state
+        model = payload.get("model", "")
+        with state.lock:
+            if model and model not in state.loaded_models:
+                state.loaded_models.append(model)
+        now = datetime.now(timezone.utc).isoformat()
+
+        if self.path == "/api/chat":
+            last = (payload.get("messages") or [{}])[-1].get("content", "")
+            text = f"echo: {last}"
+            if payload.get("stream"):
+                chunks = [{"model": model, "created_at": now, "done": False,
+                           "message": {"role": "assistant", "content": word + " "}}
+                          for word in text.split()]
+                chunks.append({"model": model, "created_at": now, "done": True,
+                               "message": {"role": "assistant", "content": ""}})
+                self._send_stream(chunks)
+            else:
+                self._send_json({"model": model, "created_at": now, "done": True,
+                                 "message": {"role": "assistant", "content": text}})
+        elif self.path == "/api/generate":
+            text = f"echo: {payload.get('prompt', '')}"
+            self._send_json({"model": model, "created_at": now, "done": True,
+                             "response": text})
+        elif self.path == "/api/embeddings":
+            self._send_json({"embedding": fake_embedding(
+                payload.get("prompt", ""), state.embed_dim)})
+        elif self.path == "/api/embed":
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._send_json({"model": model, "embeddings": [
+                fake_embedding(t, state.embed_dim) for t in inputs]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # benchmarks open many connections at once
+
+
+def start_standin_server(port: int = 0, **state_kwargs):
+    """
+    Start a stand-in Ollama server on a background thread.
+    Returns (server, base_url); call server.shutdown() when done.
+    """
+    server = StandinServer(("127.0.0.1", port), StandinHandler)
+    server.state = StandinState(**state_kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, bound_port = server.server_address
+    return server, f"http://{host}:{bound_port}"
@@ -0,0 +1,215 @@
+# packed_storage.py
+# Compact on-disk format for the document store. SimpleDocumentStore persists
+# every node as one big JSON file that is parsed in full on load; here each
+# store is a single "pack" file: the values (one JSON object per key) back to
+# back, then an index of keys and byte offsets per collection. Loading reads
+# only the index and memory-maps the file, so a node's text is decoded the
+# first time it is fetched. Changes are held in memory until the next persist,
+# which rewrites the file and swaps it in atomically.
+import json
+import mmap
+import os
+import struct
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+from llama_index.core.storage.docstore.types import (DEFAULT_BATCH_SIZE,
+                                                     DEFAULT_PERSIST_DIR,
+                                                     DEFAULT_PERSIST_FNAME,
+                                                     DEFAULT_PERSIST_PATH)
+from llama_index.core.storage.kvstore.simple_kvstore import SimpleKVStore
+from llama_index.core.storage.kvstore.types import DEFAULT_COLLECTION, BaseKVStore
+
+PACK_VERSION = 1
+DOCSTORE_PACK_FNAME = "docstore.pack"
+# The file ends with the byte offset of the JSON index
+_FOOTER = struct.Struct("<Q")
+_DELETED = object()
+
+
+class PackedTable(MutableMapping):
+    """
+    Key -> JSON object mapping over one collection of a pack file. Persisted
+    values are decoded on access; writes and deletes are kept in memory.
+    """
+
+    def __init__(self, buffer=None, keys=(), offsets=None):
+        self._buffer = buffer
+        self._keys = list(keys)
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        self._offsets = offsets
+        self._changes: dict = {}  # key -> value, or _DELETED
+
+    def raw(self, key: str) -> bytes:
+        """The JSON encoding of a value, copied from the file when unchanged."""
+        value = self._changes.get(key)
+        if value is None:
+            row = self._rows[key]
+            return self._buffer[self._offsets[row]:self._offsets[row + 1]]
+        if value is _DELETED:
+            raise KeyError(key)
+        return json.dumps(value).encode("utf-8")
+
+    def __getitem__(self, key: str) -> dict:
+        value = self._changes.get(key)
+        if value is None:
+            row = self._rows[key]
+            return json.loads(self._buffer[self._offsets[row]:self._offsets[row + 1]])
+        if value is _DELETED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        value = self._changes.get(key)
+        return key in self._rows if value is None else value is not _DELETED
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self._changes[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key in self._rows:
+            self._changes[key] = _DELETED
+        else:
+            del self._changes[key]
+
+    def __iter__(self) -> Iterator[str]:
+        changes = dict(self._changes)
+        for key in self._keys:
+            if key not in changes:
+                yield key
+        for key, value in changes.items():
+            if value is not _DELETED:
+                yield key
+
+    def __len__(self) -> int:
+        size = len(self._rows)
+        for key, value in list(self._changes.items()):
+            if value is _DELETED:
+                size -= 1
+            elif key not in self._rows:
+                size += 1
+        return size
+
+
+def write_pack(path: str, tables: Dict[str, PackedTable], extra: Optional[dict] = None,
+               keys: Optional[Dict[str, list]] = None) -> None:
+    """
+    Write tables (in the order of `keys[name]` where given) and a JSON-able
+    `extra` dict to a pack file, replacing it atomically.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    index = {"version": PACK_VERSION, "tables": {}, "extra": extra or {}}
+    position = 0
+    with open(path + ".tmp", "wb") as f:
+        for name, table in tables.items():
+            names = list(keys[name]) if keys and name in keys else list(table)
+            offsets = [position]
+            for key in names:
+                raw = table.raw(key)
+                f.write(raw)
+                position += len(raw)
+                offsets.append(position)
+            index["tables"][name] = {"keys": names, "offsets": offsets}
+        f.write(json.dumps(index).encode("utf-8"))
+        f.write(_FOOTER.pack(position))
+    os.replace(path + ".tmp", path)
+
+
+def read_pack(path: str) -> tuple[Dict[str, PackedTable], dict]:
+    """Map a pack file. Returns (tables by name, extra)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _FOOTER.size:
+            raise ValueError(f"Truncated pack file: {path}")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (start,) = _FOOTER.unpack_from(buffer, size - _FOOTER.size)
+    index = json.loads(buffer[start:size - _FOOTER.size])
+    if index.get("version") != PACK_VERSION:
+        raise ValueError(f"Unsupported pack file version: {index.get('version')}")
+    tables = {name: PackedTable(buffer, table["keys"],
+                                np.asarray(table["offsets"], dtype=np.int64))
+              for name, table in index["tables"].items()}
+    return tables, index["extra"]
+
+
+class PackedKVStore(BaseKVStore):
+    """Key-value store with one PackedTable per collection, persisted as a pack file."""
+
+    def __init__(self, tables: Optional[Dict[str, PackedTable]] = None):
+        self._tables = tables or {}
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self._tables.setdefault(collection, PackedTable())[key] = val.copy()
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put(key, val, collection)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        table = self._tables.get(collection)
+        if table is None or key not in table:
+            return None
+        return dict(table[key])
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get(key, collection)
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return dict(self._tables.get(collection, {}).items())
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return self.get_all(collection)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        try:
+            del self._tables[collection][key]
+            return True
+        except KeyError:
+            return False
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self.delete(key, collection)
+
+    def persist(self, persist_path: str) -> None:
+        write_pack(persist_path, self._tables)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str) -> "PackedKVStore":
+        tables, _ = read_pack(persist_path)
+        return cls(tables)
+
+
+class PackedDocumentStore(KVDocumentStore):
+    """
+    Document store persisted as `docstore.pack` next to where
+    SimpleDocumentStore would write `docstore.json`. Node text stays on disk
+    until the node is fetched.
+    """
+
+    def __init__(self, kvstore: Optional[PackedKVStore] = None, namespace: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(kvstore or PackedKVStore(), namespace=namespace, batch_size=batch_size)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str = DEFAULT_PERSIST_DIR,
+                         namespace: Optional[str] = None) -> "PackedDocumentStore":
+        """Load `docstore.pack`, or a `docstore.json` left by SimpleDocumentStore."""
+        path = os.path.join(persist_dir, DOCSTORE_PACK_FNAME)
+        if os.path.exists(path):
+            return cls(PackedKVStore.from_persist_path(path), namespace)
+        kvstore = PackedKVStore()
+        data = SimpleKVStore.from_persist_path(os.path.join(persist_dir, DEFAULT_PERSIST_FNAME))
+        for collection, values in data.to_dict().items():
+            for key, value in values.items():
+                kvstore.put(key, value, collection)
+        return cls(kvstore, namespace)
+
+    def persist(self, persist_path: str = DEFAULT_PERSIST_PATH, fs=None) -> None:
+        path = os.path.join(os.path.dirname(persist_path), DOCSTORE_PACK_FNAME)
+        self._kvstore.persist(path)
+        # A docstore.json from before the switch is stale now
+        if os.path.exists(persist_path) and os.path.abspath(persist_path) != os.path.abspath(path):
+            os.remove(persist_path)
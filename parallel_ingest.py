@@ -0,0 +1,114 @@
+# parallel_ingest.py
+# Parallel document ingestion. Reading, parsing and chunking files is CPU-bound
+# and SimpleDirectoryReader + VectorStoreIndex.from_documents do it on one
+# core; here files are split into tasks for a process pool, and the nodes of
+# each finished task are embedded and inserted in batches by the main process
+# while the workers keep parsing.
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Optional
+
+from llama_index.core import (Settings, SimpleDirectoryReader, StorageContext,
+                              VectorStoreIndex)
+from llama_index.core.ingestion import run_transformations
+
+from dimension_reduction import with_projection
+
+DEFAULT_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+DEFAULT_FILES_PER_TASK = int(os.getenv("INGEST_FILES_PER_TASK", "32"))
+
+# Transformations for the current run; forked workers inherit them, since
+# node parsers lose their private state when pickled
+_transformations: list = []
+
+
+def list_files(folder: str, recursive: bool = False) -> list[str]:
+    """Non-hidden files under a folder, in the order SimpleDirectoryReader reads them."""
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".")) if recursive else []
+        paths.extend(os.path.join(root, name) for name in sorted(files)
+                     if not name.startswith("."))
+    return paths
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_and_split(paths: list[str]) -> tuple[list, list]:
+    """Worker task: read files and chunk them. Returns (documents' (id, path, hash), nodes)."""
+    documents = SimpleDirectoryReader(input_files=paths, filename_as_id=True).load_data()
+    nodes = run_transformations(documents, _transformations)
+    # Documents stay in the worker; only what the caller tracks is sent back
+    infos = [(d.doc_id, d.metadata.get("file_path", ""), d.hash) for d in documents]
+    return infos, nodes
+
+
+def iter_nodes(paths: list[str], workers: int = DEFAULT_WORKERS,
+               files_per_task: int = DEFAULT_FILES_PER_TASK,
+               transformations: Optional[list] = None) -> Iterator[tuple[list, list]]:
+    """
+    Yield (document infos, nodes) per task as tasks finish, in completion order.
+    Embedding is left to the caller.
+    """
+    global _transformations  # pylint: disable=global-statement
+    _transformations = transformations if transformations is not None else Settings.transformations
+    tasks = [paths[i:i + files_per_task] for i in range(0, len(paths), files_per_task)]
+    # Workers are forked: the examples do their work at module level, and
+    # spawned workers would re-run the calling script on import. Without fork
+    # (Windows) everything runs in-process.
+    if workers <= 1 or len(tasks) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for task in tasks:
+            yield _load_and_split(task)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                             mp_context=multiprocessing.get_context("fork")) as pool:
+        futures = [pool.submit(_load_and_split, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def record_files(files: Optional[dict], folder: str, infos: list) -> None:
+    """Add the documents of a finished task to manifest entries keyed by relative path."""
+    if files is None:
+        return
+    root = os.path.abspath(folder)
+    for doc_id, file_path, _ in infos:
+        path = os.path.abspath(file_path)
+        rel = os.path.relpath(path, root)
+        if rel not in files:
+            stat = os.stat(path)
+            files[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                          "sha256": file_sha256(path), "doc_ids": []}
+        files[rel]["doc_ids"].append(doc_id)
+
+
+def build_index(folder: str, storage_context: Optional[StorageContext] = None,
+                workers: int = DEFAULT_WORKERS, files_per_task: int = DEFAULT_FILES_PER_TASK,
+                recursive: bool = False, files: Optional[dict] = None) -> VectorStoreIndex:
+    """
+    Parallel counterpart of VectorStoreIndex.from_documents(SimpleDirectoryReader(folder)
+    .load_data(), storage_context=...). Uses Settings.embed_model and
+    Settings.transformations. If `files` is given it is filled with manifest
+    entries (relative path -> size, mtime_ns, sha256, doc_ids) as used by
+    persistent_index and index_watcher.
+    """
+    if not folder:
+        raise ValueError("The 'folder' parameter cannot be null or empty.")
+    index = VectorStoreIndex([], storage_context=storage_context)
+    batches = iter_nodes(list_files(folder, recursive), workers, files_per_task)
+    # A PCA-reduced embedding model is fitted on the first batches if needed
+    for infos, nodes in with_projection(Settings.embed_model, batches):
+        # insert_nodes embeds in embed_batch_size batches
+        index.insert_nodes(nodes)
+        for doc_id, _, doc_hash in infos:
+            index.docstore.set_document_hash(doc_id, doc_hash)
+        record_files(files, folder, infos)
+    return index
@@ -0,0 +1,209 @@
+# persistent_index.py
+# A VectorStoreIndex persisted to disk next to a manifest of the source files
+# (relative path, size, mtime and content hash). On startup only files that
+# were added, changed or deleted since the last run are re-read, re-chunked,
+# re-embedded and upserted/removed; an unchanged folder costs a directory scan
+# and loading the persisted index. Vectors are held in a NumpyVectorStore and
+# nodes in a PackedDocumentStore, both memory-mapped on load (open_storage).
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from llama_index.core import (Settings, StorageContext, VectorStoreIndex,
+                              load_index_from_storage)
+
+from dimension_reduction import (embedding_dimensions, load_projection,
+                                 with_projection)
+from numpy_vector_store import NumpyVectorStore
+from packed_storage import PackedDocumentStore
+from quantized_vector_store import QuantizedVectorStore
+from parallel_ingest import DEFAULT_WORKERS, file_sha256, iter_nodes
+
+DEFAULT_PERSIST_DIR = os.getenv("INDEX_PERSIST_DIR", ".index_storage")
+# "int8" or "pq" searches compressed vectors (QuantizedVectorStore)
+QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class RefreshStats:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    touched: int = 0  # unchanged files whose mtime moved
+    rebuilt: bool = False
+    seconds: float = 0.0
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.rebuilt)
+
+    def __str__(self) -> str:
+        return (f"added={self.added} changed={self.changed} removed={self.removed} "
+                f"unchanged={self.unchanged}{' (full rebuild)' if self.rebuilt else ''} "
+                f"in {self.seconds:.2f}s")
+
+
+def scan_folder(folder: str, recursive: bool = False) -> dict[str, os.stat_result]:
+    """Relative path -> stat for every non-hidden file, like SimpleDirectoryReader."""
+    found = {}
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".")) if recursive else []
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            found[os.path.relpath(path, folder)] = os.stat(path)
+    return found
+
+
+def settings_fingerprint() -> str:
+    """Anything that changes how files map to vectors invalidates the whole index."""
+    embed_model = Settings.embed_model
+    fingerprint = [embed_model.class_name(), embed_model.model_name,
+                   Settings.chunk_size, Settings.chunk_overlap]
+    # Transformations after the parser (e.g. SectionMetadata) change node metadata
+    extra = [type(t).__name__ for t in Settings.transformations[1:]]
+    if extra:
+        fingerprint.append(extra)
+    dimensions = embedding_dimensions(embed_model)
+    if dimensions:
+        fingerprint.append(dimensions)
+    return json.dumps(fingerprint)
+
+
+def read_manifest(persist_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(persist_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(persist_dir: str, manifest: dict) -> None:
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def diff_manifest(folder: str, files: dict, current: dict[str, os.stat_result],
+                  stats: RefreshStats) -> tuple[list[str], list[str]]:
+    """
+    Compare a folder scan with the manifest's file entries, updating them in place.
+    Returns (doc ids to delete, relative paths to (re)load); files to load get
+    fresh entries whose doc_ids are filled in as they are parsed.
+    """
+    stale = []
+    for rel in sorted(set(files) - set(current)):
+        stale.extend(files.pop(rel)["doc_ids"])
+        stats.removed += 1
+
+    to_load = []
+    for rel, stat in current.items():
+        entry = files.get(rel)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            stats.unchanged += 1
+            continue
+        # Size or mtime moved: only the content hash decides whether to re-embed
+        sha256 = file_sha256(os.path.join(folder, rel))
+        if entry and entry["sha256"] == sha256:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            stats.touched += 1
+            stats.unchanged += 1
+            continue
+        if entry:
+            stale.extend(entry["doc_ids"])
+            stats.changed += 1
+        else:
+            stats.added += 1
+        files[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                      "sha256": sha256, "doc_ids": []}
+        to_load.append(rel)
+    return stale, to_load
+
+
+def open_storage(persist_dir: Optional[str] = None) -> StorageContext:
+    """
+    Storage in the binary format: vectors in .npy (scanned as int8 or PQ codes
+    when INDEX_QUANTIZATION is set), nodes in a pack file. Without
+    a persist_dir the storage starts empty; storage persisted as JSON is read
+    and converted on the next persist.
+    """
+    store_cls, options = ((QuantizedVectorStore, {"method": QUANTIZATION}) if QUANTIZATION
+                          else (NumpyVectorStore, {}))
+    if persist_dir is None:
+        return StorageContext.from_defaults(docstore=PackedDocumentStore(),
+                                            vector_store=store_cls(**options))
+    return StorageContext.from_defaults(
+        persist_dir=persist_dir, docstore=PackedDocumentStore.from_persist_dir(persist_dir),
+        vector_store=store_cls.from_persist_dir(persist_dir, **options))
+
+
+def load_index(folder: str, persist_dir: str = DEFAULT_PERSIST_DIR,
+               recursive: bool = False,
+               workers: int = DEFAULT_WORKERS) -> tuple[VectorStoreIndex, RefreshStats]:
+    """
+    Load the persisted index for a folder and bring it up to date with the files
+    on disk. Uses Settings.embed_model and Settings.transformations; new and
+    changed files are parsed and chunked by `workers` processes.
+    Returns (index, RefreshStats).
+    """
+    if not folder:
+        raise ValueError("The 'folder' parameter cannot be null or empty.")
+    start = time.perf_counter()
+    stats = RefreshStats()
+    current = scan_folder(folder, recursive)
+    fingerprint = settings_fingerprint()
+
+    manifest = read_manifest(persist_dir)
+    index = None
+    if manifest and manifest.get("settings") == fingerprint:
+        try:
+            # A PCA-reduced index is unusable without the projection it was built with
+            if load_projection(Settings.embed_model, persist_dir):
+                index = load_index_from_storage(open_storage(persist_dir))
+        except (OSError, ValueError, TypeError):
+            index = None
+    if index is None:
+        # No usable index on disk: start empty and treat every file as added
+        index = VectorStoreIndex([], storage_context=open_storage())
+        manifest = {"version": MANIFEST_VERSION, "settings": fingerprint, "files": {}}
+        stats.rebuilt = True
+        if hasattr(Settings.embed_model, "projection"):
+            Settings.embed_model.projection = None  # refitted on the new corpus
+    files = manifest["files"]
+
+    stale, to_load = diff_manifest(folder, files, current, stats)
+    for doc_id in stale:
+        index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+    by_path = {os.path.abspath(os.path.join(folder, rel)): rel for rel in to_load}
+    batches = iter_nodes(list(by_path), workers)
+    for infos, nodes in with_projection(Settings.embed_model, batches, persist_dir):
+        for doc_id, file_path, _ in infos:
+            # Ids derive from the file name, so drop leftovers of an interrupted run
+            if index.docstore.get_ref_doc_info(doc_id) is not None:
+                index.delete_ref_doc(doc_id, delete_from_docstore=True)
+            rel = by_path.get(os.path.abspath(file_path))
+            if rel is not None:
+                files[rel]["doc_ids"].append(doc_id)
+        # Nodes are embedded in batches while the workers parse the next files
+        index.insert_nodes(nodes)
+        for doc_id, _, doc_hash in infos:
+            index.docstore.set_document_hash(doc_id, doc_hash)
+
+    if stats.dirty:
+        index.storage_context.persist(persist_dir=persist_dir)
+    if stats.dirty or stats.touched:
+        os.makedirs(persist_dir, exist_ok=True)
+        write_manifest(persist_dir, manifest)
+    stats.seconds = time.perf_counter() - start
+    return index, stats
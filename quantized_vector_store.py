@@ -0,0 +1,273 @@
+# quantized_vector_store.py
+# NumpyVectorStore that scans compressed vectors. A text-embedding-3-large
+# vector is 3072 float32s (12 KB), so memory and scan time are dominated by
+# the matrix; here queries scan codes instead:
+#   int8: one signed byte per dimension plus a scale per row (4x smaller)
+#   pq:   product quantization; each of `pq_subspaces` slices of the vector
+#         (8 dimensions by default) is replaced by the byte id of its nearest
+#         k-means centroid (3072 dims in 384 bytes, 32x smaller), and a query
+#         scores a row by summing table lookups
+# The best `rerank * k` candidates are then re-scored with the full-precision
+# rows. After a reload those are read from the memory-mapped .npy, so only the
+# candidate rows are paged in. Codes live in the store's snapshots, so writes
+# stay lock-free for readers. PQ codes are stored one subspace per row
+# (subspaces x rows), so each table lookup reads contiguous bytes.
+import mmap
+import os
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+from numpy_vector_store import SUBSET_RATIO, NumpyVectorStore, _Snapshot, top_k_rows
+
+METHODS = ("int8", "pq")
+DEFAULT_RERANK = int(os.getenv("QUANT_RERANK", "4"))
+# Subspaces per vector; unset means one per PQ_SUBSPACE_DIMS dimensions
+DEFAULT_PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", "0")) or None
+PQ_SUBSPACE_DIMS = 8
+# PQ codebooks are trained once the store holds this many vectors; until then
+# queries scan the full-precision matrix
+PQ_MIN_TRAIN = int(os.getenv("PQ_MIN_TRAIN", "4096"))
+PQ_SAMPLE = 8192
+PQ_ITERATIONS = 10
+PQ_CENTROIDS = 256
+# Rows decoded per step of an int8 scan; small blocks stay in cache
+SCAN_ROWS = 64
+ENCODE_ROWS = 65_536
+
+
+class _Codes(NamedTuple):
+    codes: np.ndarray  # int8: capacity x dim; pq: subspaces x capacity uint8
+    scales: Optional[np.ndarray]  # int8: capacity float32s
+    centroids: Optional[np.ndarray]  # pq: subspaces x 256 x width
+
+    @property
+    def axis(self) -> int:
+        """Axis of `codes` that indexes store rows."""
+        return 0 if self.centroids is None else 1
+
+    def rows(self, index) -> np.ndarray:
+        return self.codes[(slice(None),) * self.axis + (index,)]
+
+    def resized(self, rows, capacity: int) -> "_Codes":
+        """Copy of the given rows into new arrays with room for `capacity` rows."""
+        shape = list(self.codes.shape)
+        shape[self.axis] = capacity
+        codes = np.empty(shape, dtype=self.codes.dtype)
+        kept = self.rows(rows)
+        codes[(slice(None),) * self.axis + (slice(0, kept.shape[self.axis]),)] = kept
+        scales = None
+        if self.scales is not None:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:len(kept)] = self.scales[rows]
+        return self._replace(codes=codes, scales=scales)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (L2) for each vector."""
+    scores = vectors @ centroids.T * 2 - (centroids * centroids).sum(axis=1)
+    return scores.argmax(axis=1)
+
+
+def train_pq(vectors: np.ndarray, subspaces: int, seed: int = 0) -> np.ndarray:
+    """k-means codebooks for each subspace: subspaces x 256 x (dim / subspaces)."""
+    n, dim = vectors.shape
+    if dim % subspaces:
+        raise ValueError(f"Embedding dimension {dim} is not divisible by {subspaces} subspaces.")
+    if n < PQ_CENTROIDS:
+        raise ValueError(f"At least {PQ_CENTROIDS} vectors are needed to train PQ codebooks.")
+    rng = np.random.default_rng(seed)
+    if n > PQ_SAMPLE:
+        vectors = vectors[np.sort(rng.choice(n, PQ_SAMPLE, replace=False))]
+        n = PQ_SAMPLE
+    width = dim // subspaces
+    centroids = np.empty((subspaces, PQ_CENTROIDS, width), dtype=np.float32)
+    for j in range(subspaces):
+        part = np.ascontiguousarray(vectors[:, j * width:(j + 1) * width])
+        center = part[rng.choice(n, PQ_CENTROIDS, replace=False)].copy()
+        for _ in range(PQ_ITERATIONS):
+            assign = _nearest(part, center)
+            counts = np.bincount(assign, minlength=PQ_CENTROIDS)
+            filled = counts > 0
+            sums = np.stack([np.bincount(assign, weights=part[:, d], minlength=PQ_CENTROIDS)
+                             for d in range(width)], axis=1)
+            # Empty clusters keep their previous centroid
+            center[filled] = sums[filled] / counts[filled, None]
+        centroids[j] = center
+    return centroids
+
+
+class QuantizedVectorStore(NumpyVectorStore):
+    """
+    NumpyVectorStore searching int8 or PQ codes, with optional re-ranking of
+    `rerank * k` candidates by exact cosine similarity (rerank=0 disables it).
+    """
+
+    method: str = "int8"
+    rerank: int = DEFAULT_RERANK
+    pq_subspaces: Optional[int] = DEFAULT_PQ_SUBSPACES
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        if self.method not in METHODS:
+            raise ValueError(f"Invalid quantization method: {self.method!r} "
+                             f"(expected one of {', '.join(METHODS)})")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "QuantizedVectorStore"
+
+    def memory_bytes(self) -> int:
+        """Bytes of the structure scanned by queries (codes, or the matrix before training)."""
+        snapshot = self._snapshot
+        if snapshot.codes is None:
+            return snapshot.count * snapshot.matrix.shape[1] * 4
+        codes = snapshot.codes
+        row = codes.codes.shape[1 - codes.axis] + (4 if codes.scales is not None else 0)
+        return snapshot.count * row
+
+    # Encoding
+
+    def _encode(self, codes: _Codes, vectors: np.ndarray, first: int) -> None:
+        """Write the codes of `vectors` into rows first, first + 1, ... of `codes`."""
+        for start in range(0, len(vectors), ENCODE_ROWS):
+            block = vectors[start:start + ENCODE_ROWS]
+            rows = slice(first + start, first + start + len(block))
+            if codes.centroids is None:
+                scale = np.abs(block).max(axis=1) / 127
+                scale[scale == 0] = 1.0
+                codes.codes[rows] = np.rint(block / scale[:, None])
+                codes.scales[rows] = scale
+            else:
+                width = codes.centroids.shape[2]
+                for j, center in enumerate(codes.centroids):
+                    codes.codes[j, rows] = _nearest(block[:, j * width:(j + 1) * width], center)
+
+    def _encode_snapshot(self, snapshot: _Snapshot) -> _Snapshot:
+        """Codes for every published row, training PQ codebooks first."""
+        if not snapshot.count:
+            return snapshot
+        capacity, dim = snapshot.matrix.shape
+        if self.method == "int8":
+            codes = _Codes(np.empty((capacity, dim), dtype=np.int8),
+                           np.empty(capacity, dtype=np.float32), None)
+        else:
+            if snapshot.count - snapshot.dead < PQ_MIN_TRAIN:
+                return snapshot._replace(codes=None)
+            live = np.flatnonzero(snapshot.alive[:snapshot.count])
+            subspaces = self.pq_subspaces or max(1, dim // PQ_SUBSPACE_DIMS)
+            centroids = train_pq(np.asarray(snapshot.matrix[live]), subspaces)
+            codes = _Codes(np.empty((subspaces, capacity), dtype=np.uint8), None, centroids)
+        self._encode(codes, snapshot.matrix[:snapshot.count], 0)
+        return snapshot._replace(codes=codes)
+
+    def _append(self, snapshot: _Snapshot, nodes) -> _Snapshot:
+        grown = super()._append(snapshot, nodes)
+        codes = snapshot.codes
+        if codes is None:
+            return self._encode_snapshot(grown)
+        capacity = grown.matrix.shape[0]
+        if codes.codes.shape[codes.axis] < capacity:
+            # Readers keep the old arrays, as with the matrix
+            codes = codes.resized(slice(0, snapshot.count), capacity)
+        self._encode(codes, grown.matrix[snapshot.count:grown.count], snapshot.count)
+        return grown._replace(codes=codes)
+
+    def _compact(self, snapshot: _Snapshot) -> _Snapshot:
+        compacted = super()._compact(snapshot)
+        codes = snapshot.codes
+        if codes is None:
+            return compacted
+        rows = np.flatnonzero(snapshot.alive[:snapshot.count])
+        return compacted._replace(codes=codes.resized(rows, compacted.matrix.shape[0]))
+
+    # Search
+
+    def _scores(self, snapshot: _Snapshot, queries: np.ndarray) -> np.ndarray:
+        """Approximate scores of every published row for each query."""
+        codes, count = snapshot.codes, snapshot.count
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        if codes.centroids is None:
+            for start in range(0, count, SCAN_ROWS):
+                stop = min(start + SCAN_ROWS, count)
+                scores[:, start:stop] = queries @ codes.codes[start:stop].astype(np.float32).T
+            scores *= codes.scales[:count]
+            return scores
+        subspaces, _, width = codes.centroids.shape
+        # Per query, the dot product of each subspace slice with each centroid
+        tables = np.einsum("qmw,mkw->qmk", queries.reshape(len(queries), subspaces, width),
+                           codes.centroids)
+        for i, table in enumerate(tables):
+            row_scores = scores[i]
+            row_scores[:] = 0
+            for j in range(subspaces):
+                row_scores += np.take(table[j], codes.codes[j, :count])
+        return scores
+
+    def _top_rows(self, snapshot: _Snapshot, queries: np.ndarray, mask: Optional[np.ndarray],
+                  k: int) -> tuple[np.ndarray, np.ndarray]:
+        if snapshot.codes is None or (mask is not None
+                                      and mask.sum() < SUBSET_RATIO * snapshot.count):
+            # A selective filter leaves few enough rows to score them exactly
+            return super()._top_rows(snapshot, queries, mask, k)
+        scores = self._scores(snapshot, queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        if self.rerank <= 0:
+            return top_k_rows(scores, k)
+        best, candidates = top_k_rows(scores, self.rerank * k)
+        k = min(k, candidates.shape[1])
+        top_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        top_rows = np.zeros((len(queries), k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            # Ascending rows read the memory-mapped matrix front to back
+            rows = np.sort(candidates[i][np.isfinite(best[i])])
+            exact = snapshot.matrix[rows] @ query
+            order = np.argsort(-exact, kind="stable")[:k]
+            top_scores[i, :len(order)] = exact[order]
+            top_rows[i, :len(order)] = rows[order]
+        return top_scores, top_rows
+
+    # Persistence: codes go to <name>.codes.npz next to the matrix
+
+    def _persist_rows(self, stem: str, snapshot: _Snapshot, rows: np.ndarray) -> None:
+        path = stem + ".codes.npz"
+        codes = snapshot.codes
+        if codes is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        arrays = {"method": np.array(self.method),
+                  "codes": np.ascontiguousarray(codes.rows(rows))}
+        if codes.scales is not None:
+            arrays["scales"] = codes.scales[rows]
+        if codes.centroids is not None:
+            arrays["centroids"] = codes.centroids
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs=None,
+                          **kwargs: Any) -> "QuantizedVectorStore":
+        """Load the store; codes are read back, or re-encoded if missing or stale."""
+        store = super().from_persist_path(persist_path, fs, **kwargs)
+        snapshot = store._snapshot
+        path = os.path.splitext(persist_path)[0] + ".codes.npz"
+        codes = None
+        if os.path.exists(path):
+            with np.load(path) as data:
+                subspaces = len(data["centroids"]) if "centroids" in data else None
+                if (str(data["method"]) == store.method
+                        and store.pq_subspaces in (None, subspaces)):
+                    codes = _Codes(data["codes"], data["scales"] if "scales" in data else None,
+                                   data["centroids"] if "centroids" in data else None)
+            if codes is not None and codes.codes.shape[codes.axis] != snapshot.count:
+                codes = None
+        store._snapshot = (snapshot._replace(codes=codes) if codes is not None
+                           else store._encode_snapshot(snapshot))
+        # Re-ranking reads scattered rows; read-ahead would page in the whole file
+        mapping = getattr(snapshot.matrix, "_mmap", None)
+        if mapping is not None and store._snapshot.codes is not None:
+            mapping.madvise(mmap.MADV_RANDOM)
+        return store
@@ -0,0 +1,217 @@
+# query_service.py
+# Async HTTP service for the example_query_app index. The index is loaded once
+# at startup; every request runs embed -> retrieve -> synthesize with the
+# async LlamaIndex APIs, so concurrent clients overlap instead of queueing
+# behind one blocking call. Calls to the embedding and LLM backends are each
+# bounded by a semaphore and every answer reports where its time went.
+#
+#   uvicorn query_service:app --port 8000
+#   curl -s localhost:8000/query -d '{"question": "What is Cloud Club?"}' \
+#        -H 'Content-Type: application/json'
+#   curl -sN localhost:8000/query/stream -d '{"question": "Who is Byte?"}' \
+#        -H 'Content-Type: application/json'
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from llama_index.core import Settings, get_response_synthesizer
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import QueryBundle
+from pydantic import BaseModel, Field
+
+from index_watcher import WATCH_ENABLED, IndexWatcher
+from llm_factory import get_embedding_model, get_llm
+from metadata_index import SectionMetadata
+from persistent_index import DEFAULT_PERSIST_DIR, load_index
+from scoped_retriever import ScopedRetriever, split_scope
+from semantic_cache import SemanticCache
+
+DEFAULT_FOLDER = os.getenv("SERVICE_DATA_FOLDER", "data")
+DEFAULT_TOP_K = int(os.getenv("SERVICE_TOP_K", "2"))
+# Requests allowed to talk to each backend at once; the rest wait their turn
+MAX_EMBED_CONCURRENCY = int(os.getenv("SERVICE_MAX_EMBED", "16"))
+MAX_LLM_CONCURRENCY = int(os.getenv("SERVICE_MAX_LLM", "4"))
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    top_k: int = Field(default=DEFAULT_TOP_K, ge=1, le=50)
+
+
+def cache_scope(top_k: int, scope: str) -> str:
+    # Answers are cached per top_k and question scope, since they cite those sources
+    return f"{top_k}{scope}"
+
+
+class QueryService:
+    """Index, models and per-backend concurrency bounds shared by all requests."""
+
+    def __init__(self, index, embed_model, llm, max_embed: int = MAX_EMBED_CONCURRENCY,
+                 max_llm: int = MAX_LLM_CONCURRENCY, cache: Optional[SemanticCache] = None):
+        self.index = index
+        self.embed_model = embed_model
+        self.llm = llm
+        self.cache = cache if cache is not None else SemanticCache()
+        self._embed_slots = asyncio.Semaphore(max_embed)
+        self._llm_slots = asyncio.Semaphore(max_llm)
+        self._synthesizer = get_response_synthesizer(llm=llm)
+        self._stream_synthesizer = get_response_synthesizer(llm=llm, streaming=True)
+
+    @asynccontextmanager
+    async def _stage(self, timings: dict, name: str, slots: Optional[asyncio.Semaphore] = None):
+        # Time spent waiting for a backend slot is reported as "queue"
+        start = time.perf_counter()
+        if slots is not None:
+            await slots.acquire()
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            if slots is not None:
+                slots.release()
+            timings["queue"] = timings.get("queue", 0.0) + acquired - start
+            timings[name] = time.perf_counter() - acquired
+
+    async def retrieve(self, request: QueryRequest, timings: dict):
+        """Embed and retrieve. Returns (query bundle, nodes, cached Response or None)."""
+        # Scope terms (file:, type:, ...) filter the search instead of being embedded
+        question, scope = split_scope(request.question)
+        async with self._stage(timings, "embed", self._embed_slots):
+            embedding = await self.embed_model.aget_query_embedding(question)
+        bundle = QueryBundle(request.question, embedding=embedding)
+        cached, _ = self.cache.lookup(embedding, scope=cache_scope(request.top_k, scope))
+        if cached is not None:
+            return bundle, cached.source_nodes, cached
+        async with self._stage(timings, "retrieve"):
+            retriever = ScopedRetriever(self.index, similarity_top_k=request.top_k)
+            nodes = await retriever.aretrieve(bundle)
+        return bundle, nodes, None
+
+    async def answer(self, request: QueryRequest, timings: dict) -> tuple[Response, bool]:
+        bundle, nodes, cached = await self.retrieve(request, timings)
+        if cached is not None:
+            return cached, True
+        async with self._stage(timings, "synthesize", self._llm_slots):
+            response = await self._synthesizer.asynthesize(bundle, nodes)
+        self.cache.add(bundle.embedding, response,
+                       scope=cache_scope(request.top_k, split_scope(request.question)[1]))
+        return response, False
+
+    async def stream(self, bundle: QueryBundle, nodes: list, timings: dict, scope: str = ""):
+        """
+        Yield answer tokens; the LLM slot is held until the stream ends or is
+        dropped. The full answer is cached under `scope` (see cache_scope).
+        """
+        async with self._stage(timings, "synthesize", self._llm_slots):
+            response = await self._stream_synthesizer.asynthesize(bundle, nodes)
+            text = ""
+            async for token in response.async_response_gen():
+                text += token
+                yield token
+        self.cache.add(bundle.embedding, Response(text, nodes, response.metadata), scope=scope)
+
+
+def _sources(nodes: list) -> list[dict]:
+    return [{"node_id": n.node.node_id, "score": n.score,
+             "file_name": n.node.metadata.get("file_name")} for n in nodes]
+
+
+def _milliseconds(timings: dict) -> dict:
+    return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+
+
+def create_app(folder: str = DEFAULT_FOLDER, embed_model=None, llm=None,
+               persist_dir: str = DEFAULT_PERSIST_DIR, max_embed: int = MAX_EMBED_CONCURRENCY,
+               max_llm: int = MAX_LLM_CONCURRENCY, watch: bool = WATCH_ENABLED) -> FastAPI:
+    """
+    Build the FastAPI app. Models default to the factory's (LLM_TYPE, with
+    the embedding cache and query micro-batching); the index is loaded or
+    refreshed from `folder` (persisted in `persist_dir`) at startup and, with
+    `watch`, kept in sync with it while the service runs.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        Settings.embed_model = embed_model or get_embedding_model(cache=True, batch=True)
+        Settings.llm = llm or get_llm()
+        # Same transformations as example_query_app, which shares the persisted
+        # index: any difference changes the fingerprint and rebuilds it
+        Settings.transformations = [Settings.node_parser, SectionMetadata()]
+        # Loading may embed new files, which is blocking work. It runs on a
+        # worker thread, so parse in-process rather than fork a pool from it
+        index, refresh = await asyncio.to_thread(load_index, folder, persist_dir, workers=1)
+        # The index only changes on a watcher refresh, which clears the cache,
+        # so the cache does not scan the folder itself
+        app.state.service = QueryService(index, Settings.embed_model, Settings.llm,
+                                         max_embed, max_llm, SemanticCache())
+        app.state.refresh = str(refresh)
+        watcher = None
+        if watch:
+            loop = asyncio.get_running_loop()
+
+            def on_refresh(stats) -> None:
+                # Runs on the watcher thread; the cache is only touched on the loop
+                loop.call_soon_threadsafe(app.state.service.cache.invalidate)
+                app.state.refresh = str(stats)
+
+            watcher = IndexWatcher(index, folder, persist_dir=persist_dir,
+                                   on_refresh=on_refresh)
+            watcher.start()
+        yield
+        if watcher is not None:
+            watcher.stop()
+
+    app = FastAPI(title="LlamaIndex query service", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health() -> dict:
+        service = app.state.service
+        return {"status": "ok", "nodes": len(service.index.docstore.docs),
+                "index": app.state.refresh}
+
+    @app.post("/query")
+    async def query(request: QueryRequest) -> dict:
+        timings = {}
+        start = time.perf_counter()
+        response, cached = await app.state.service.answer(request, timings)
+        timings["total"] = time.perf_counter() - start
+        return {"answer": str(response), "cached": cached,
+                "sources": _sources(response.source_nodes),
+                "timings_ms": _milliseconds(timings)}
+
+    @app.post("/query/stream")
+    async def query_stream(request: QueryRequest) -> StreamingResponse:
+        # Newline-delimited JSON: sources first, then {"token": ...} lines and
+        # finally the timings. A client disconnect cancels the LLM stream.
+        service = app.state.service
+        timings = {}
+        start = time.perf_counter()
+        bundle, nodes, cached = await service.retrieve(request, timings)
+        scope = split_scope(request.question)[1]
+
+        async def lines():
+            yield json.dumps({"cached": cached is not None, "sources": _sources(nodes)}) + "\n"
+            if cached is not None:
+                yield json.dumps({"token": str(cached)}) + "\n"
+            else:
+                first = None
+                async for token in service.stream(bundle, nodes, timings,
+                                                  scope=cache_scope(request.top_k, scope)):
+                    if first is None:
+                        first = time.perf_counter()
+                        timings["first_token"] = first - start
+                    yield json.dumps({"token": token}) + "\n"
+            timings["total"] = time.perf_counter() - start
+            yield json.dumps({"timings_ms": _milliseconds(timings)}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,126 @@
+# scoped_retriever.py
+# Questions scoped to part of the corpus, e.g.
+#
+#   file:story.txt Who lives in Byteville?
+#   type:md section:"The Toastmaster Uprising: A Hilarious AI Takeover" Who is Jeff?
+#   folder:data after:2025-01-01 What did the AIs demand?
+#
+# The scope becomes MetadataFilters over the metadata that
+# metadata_index.SectionMetadata records at ingestion. The filters are applied
+# before scoring: the vector store searches only the matching chunks
+# (NumpyVectorStore through its bitmap index, Chroma through its `where`
+# clause) and BM25 scores only them. Filtering the top k afterwards returns
+# fewer than k chunks, or none, when the scope is small.
+import dataclasses
+import re
+import time
+from datetime import date
+from typing import List, Optional
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import (FilterOperator, MetadataFilter,
+                                                  MetadataFilters)
+
+from hybrid_retriever import BM25Index, HybridRetriever
+
+# Scope keyword -> metadata key it matches
+SCOPE_KEYS = {"file": "file_name", "folder": "folder", "type": "extension",
+              "section": "heading"}
+# Date bounds on the file's modification time when its current content was
+# ingested (YYYY-MM-DD, local midnight); see SectionMetadata
+DATE_KEYS = {"after": FilterOperator.GTE, "before": FilterOperator.LT}
+
+_SCOPE = re.compile(r'(?<!\S)(%s):(?:"([^"]*)"|(\S+))' % "|".join([*SCOPE_KEYS, *DATE_KEYS]))
+
+
+def parse_scope(query_str: str) -> tuple[str, Optional[MetadataFilters]]:
+    """
+    Split `key:value` scope terms off a question. Returns (question, filters),
+    filters being None without a scope. Repeating a keyword matches any of its
+    values; different keywords must all match. Terms that do not parse (a bad
+    date) are left in the question.
+    """
+    values: dict[str, list] = {}
+    bounds = []
+
+    def take(match: re.Match) -> str:
+        keyword = match.group(1)
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        if keyword in DATE_KEYS:
+            try:
+                day = date.fromisoformat(value)
+            except ValueError:
+                return match.group(0)
+            bounds.append(MetadataFilter(key="mtime", operator=DATE_KEYS[keyword],
+                                         value=int(time.mktime(day.timetuple()))))
+        else:
+            key = SCOPE_KEYS[keyword]
+            if keyword == "type":
+                value = value.lstrip(".").lower()
+            values.setdefault(key, []).append(value)
+        return ""
+
+    question = " ".join(_SCOPE.sub(take, query_str).split())
+    filters = [MetadataFilter(key=key, value=found[0]) if len(found) == 1
+               else MetadataFilter(key=key, operator=FilterOperator.IN, value=found)
+               for key, found in values.items()] + bounds
+    if not filters:
+        return query_str, None
+    return question or query_str, MetadataFilters(filters=filters)
+
+
+def split_scope(query_str: str) -> tuple[str, str]:
+    """
+    (question without its scope terms, canonical form of the scope), e.g. for
+    SemanticCacheQueryEngine's split_scope: the question is what gets embedded.
+    """
+    question, filters = parse_scope(query_str)
+    return question, filters.model_dump_json() if filters else ""
+
+
+class ScopedRetriever(BaseRetriever):
+    """
+    Vector retrieval (hybrid with BM25 when `bm25` is given) over the chunks
+    matching the scope terms of each question (see parse_scope); questions
+    without a scope search everything. An embedding already on the query
+    bundle is reused, so callers should embed the question without its scope
+    terms (split_scope). The synthesizer still gets the full question, scope
+    terms included, which tells the LLM where the context comes from.
+    """
+
+    def __init__(self, index: VectorStoreIndex,
+                 similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+                 bm25: Optional[BM25Index] = None,
+                 callback_manager: Optional[CallbackManager] = None):
+        self._index = index
+        self._similarity_top_k = similarity_top_k
+        self._bm25 = bm25
+        self._unscoped = self._retriever(None)
+        super().__init__(callback_manager=callback_manager)
+
+    def _retriever(self, filters: Optional[MetadataFilters]) -> BaseRetriever:
+        if self._bm25 is not None:
+            return HybridRetriever(self._index, self._bm25,
+                                   similarity_top_k=self._similarity_top_k, filters=filters)
+        return VectorIndexRetriever(self._index, similarity_top_k=self._similarity_top_k,
+                                    filters=filters)
+
+    def _scoped(self, query_bundle: QueryBundle) -> tuple[BaseRetriever, QueryBundle]:
+        query_str, filters = parse_scope(query_bundle.query_str)
+        if filters is None:
+            return self._unscoped, query_bundle
+        # The scope terms are not part of what is searched for
+        return self._retriever(filters), dataclasses.replace(
+            query_bundle, query_str=query_str, custom_embedding_strs=None)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        retriever, query_bundle = self._scoped(query_bundle)
+        return retriever.retrieve(query_bundle)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        retriever, query_bundle = self._scoped(query_bundle)
+        return await retriever.aretrieve(query_bundle)
@@ -0,0 +1,202 @@
+# semantic_cache.py
+# Semantic answer cache that sits in front of a query engine. Each question is
+# embedded once; if a previous question is similar enough (cosine similarity
+# above a threshold) its answer, including source nodes, is returned instead of
+# running retrieval and synthesis again. Entries are dropped when the watched
+# data folder changes (checked at most every `check_interval` seconds) or when
+# invalidate() is called, e.g. from IndexWatcher's on_refresh.
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.response.schema import (RESPONSE_TYPE,
+                                                    AsyncStreamingResponse,
+                                                    Response, StreamingResponse)
+from llama_index.core.schema import QueryBundle
+
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Seconds between scans of the watched folder; a scan stats every file
+DEFAULT_CHECK_INTERVAL = float(os.getenv("SEMANTIC_CACHE_CHECK_INTERVAL", "2"))
+
+
+def folder_fingerprint(folder: str) -> str:
+    """Hash of every file's relative path, size and mtime under a folder."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, folder)}\0{stat.st_size}\0"
+                          f"{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticCache:
+    """
+    In-memory store of (normalized question embedding, response) pairs. A
+    question only matches entries of the same scope (e.g. its metadata filters).
+    Safe to invalidate from another thread, such as IndexWatcher's.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = 1000,
+                 folder: Optional[str] = None, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.folder = folder
+        self.check_interval = check_interval
+        self._fingerprint = folder_fingerprint(folder) if folder else None
+        self._next_check = time.monotonic() + check_interval
+        self._vectors: Optional[np.ndarray] = None
+        self._responses: list = []
+        self._scopes: list = []
+        self._next = 0  # ring-buffer position once max_entries is reached
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._vectors = None
+        self._responses = []
+        self._scopes = []
+        self._next = 0
+
+    def _check_folder(self) -> None:
+        if self.folder is None or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_interval
+        fingerprint = folder_fingerprint(self.folder)
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._clear()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding, scope: str = "") -> tuple[Optional[Any], float]:
+        """Return (cached response or None, best similarity)."""
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_folder()
+            if scope not in self._scopes:
+                return None, 0.0
+            scores = self._vectors[:len(self._responses)] @ vector
+            scores[np.array(self._scopes) != scope] = -np.inf
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score >= self.threshold:
+                return self._responses[best], score
+        return None, score
+
+    def add(self, embedding, response: Any, scope: str = "") -> None:
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._add(vector, response, scope)
+
+    def _add(self, vector: np.ndarray, response: Any, scope: str) -> None:
+        if self._vectors is None:
+            self._vectors = np.empty((16, vector.shape[0]), dtype=np.float32)
+        count = len(self._responses)
+        if count < self.max_entries:
+            if count == self._vectors.shape[0]:
+                grown = np.empty((min(self.max_entries, count * 2), vector.shape[0]),
+                                 dtype=np.float32)
+                grown[:count] = self._vectors
+                self._vectors = grown
+            self._vectors[count] = vector
+            self._responses.append(response)
+            self._scopes.append(scope)
+        else:
+            # Full: overwrite the oldest entry
+            self._vectors[self._next] = vector
+            self._responses[self._next] = response
+            self._scopes[self._next] = scope
+            self._next = (self._next + 1) % self.max_entries
+
+
+class SemanticCacheQueryEngine(BaseQueryEngine):
+    """
+    Query engine wrapper that answers near-duplicate questions from a
+    SemanticCache. The question embedding is passed on to the inner engine so
+    a cache miss does not embed the question twice. Streaming answers are
+    cached once their stream has been read to the end; hits are plain Responses.
+    `split_scope` maps a question to (text to embed, cache scope); by default
+    the whole question is embedded and shares one scope.
+    """
+
+    def __init__(self, query_engine: BaseQueryEngine, embed_model: BaseEmbedding,
+                 cache: Optional[SemanticCache] = None,
+                 split_scope: Optional[Callable[[str], tuple[str, str]]] = None):
+        super().__init__(callback_manager=query_engine.callback_manager)
+        self.query_engine = query_engine
+        self.embed_model = embed_model
+        self.cache = cache if cache is not None else SemanticCache()
+        self.split_scope = split_scope or (lambda query_str: (query_str, ""))
+        self.last_hit = False
+        self.last_similarity = 0.0
+
+    def _get_prompt_modules(self) -> Dict[str, Any]:
+        return {"query_engine": self.query_engine}
+
+    def _prepare(self, query_bundle: QueryBundle, embedding, scope: str) -> Optional[Any]:
+        query_bundle.embedding = embedding
+        cached, self.last_similarity = self.cache.lookup(embedding, scope)
+        self.last_hit = cached is not None
+        return cached
+
+    def _query(self, query_bundle: QueryBundle) -> RESPONSE_TYPE:
+        question, scope = self.split_scope(query_bundle.query_str)
+        embedding = query_bundle.embedding or self.embed_model.get_query_embedding(question)
+        cached = self._prepare(query_bundle, embedding, scope)
+        if cached is not None:
+            return cached
+        return self._remember(embedding, scope, self.query_engine.query(query_bundle))
+
+    async def _aquery(self, query_bundle: QueryBundle) -> RESPONSE_TYPE:
+        question, scope = self.split_scope(query_bundle.query_str)
+        embedding = query_bundle.embedding or await self.embed_model.aget_query_embedding(
+            question)
+        cached = self._prepare(query_bundle, embedding, scope)
+        if cached is not None:
+            return cached
+        return self._remember(embedding, scope, await self.query_engine.aquery(query_bundle))
+
+    def _remember(self, embedding, scope: str, response: RESPONSE_TYPE) -> RESPONSE_TYPE:
+        if isinstance(response, StreamingResponse):
+            response.response_gen = self._tee(embedding, scope, response, response.response_gen)
+        elif isinstance(response, AsyncStreamingResponse):
+            response.response_gen = self._atee(embedding, scope, response,
+                                               response.response_gen)
+        else:
+            self.cache.add(embedding, response, scope)
+        return response
+
+    def _tee(self, embedding, scope, response, tokens):
+        text = ""
+        for token in tokens:
+            text += token
+            yield token
+        # Only reached when the stream completed (not on abort)
+        self.cache.add(embedding, Response(text, response.source_nodes, response.metadata),
+                       scope)
+
+    async def _atee(self, embedding, scope, response, tokens):
+        text = ""
+        async for token in tokens:
+            text += token
+            yield token
+        self.cache.add(embedding, Response(text, response.source_nodes, response.metadata),
+                       scope)
@@ -0,0 +1,150 @@
+# sharded_retriever.py
+# Retrieval over documents sharded into several Chroma collections. The query
+# is embedded once and the same embedding is sent to every shard at the same
+# time (the Chroma client blocks, so each shard query runs in a worker thread),
+# which makes latency track the slowest shard instead of the sum. Shards that
+# miss the per-shard deadline or fail are left out of that query's results;
+# their hits are merged by score into one global top k otherwise. A shard whose
+# call is still running past an earlier deadline is skipped (and counted as a
+# timeout) until that call returns, so a hung shard holds at most one thread.
+import asyncio
+import heapq
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery
+
+logger = logging.getLogger(__name__)
+
+# Seconds a shard may take before its results are dropped from the query
+DEFAULT_SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "2.0"))
+
+# Runs the shard queries; a shard past its deadline keeps its thread until
+# the Chroma call returns
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SHARD_THREADS", "16")),
+                               thread_name_prefix="shard")
+
+
+@dataclass
+class ShardStats:
+    queries: int = 0
+    timeouts: dict = field(default_factory=dict)  # shard name -> count
+    errors: dict = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return f"queries={self.queries} timeouts={self.timeouts} errors={self.errors}"
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Top `similarity_top_k` nodes across several vector stores (one per shard),
+    queried concurrently with one query embedding. Scores must be comparable
+    across shards, i.e. the same embedding model and distance everywhere.
+    """
+
+    def __init__(self, shards: dict[str, BasePydanticVectorStore], similarity_top_k: int = 3,
+                 shard_timeout: float = DEFAULT_SHARD_TIMEOUT,
+                 embed_model: Optional[BaseEmbedding] = None,
+                 callback_manager: Optional[CallbackManager] = None):
+        if not shards:
+            raise ValueError("ShardedRetriever needs at least one shard.")
+        self._shards = dict(shards)
+        self._similarity_top_k = similarity_top_k
+        self._shard_timeout = shard_timeout
+        self._embed_model = embed_model or Settings.embed_model
+        self._stats = ShardStats()
+        self._lock = threading.Lock()
+        self._overdue: dict[str, Future] = {}  # shard name -> call past its deadline
+        super().__init__(callback_manager=callback_manager)
+
+    @property
+    def stats(self) -> ShardStats:
+        return self._stats
+
+    def _vector_query(self, embedding: list) -> VectorStoreQuery:
+        return VectorStoreQuery(query_embedding=embedding,
+                                similarity_top_k=self._similarity_top_k)
+
+    def _still_overdue(self, name: str) -> Optional[TimeoutError]:
+        with self._lock:
+            future = self._overdue.get(name)
+            if future is None:
+                return None
+            if future.done():
+                del self._overdue[name]
+                return None
+        return TimeoutError(f"shard {name} is still answering a query past its deadline")
+
+    def _mark_overdue(self, name: str, future: Future) -> TimeoutError:
+        with self._lock:
+            self._overdue[name] = future
+        return TimeoutError(f"shard {name} took over {self._shard_timeout}s")
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(
+                query_bundle.embedding_strs)
+        query = self._vector_query(query_bundle.embedding)
+        results = {name: self._still_overdue(name) for name in self._shards}
+        futures = {name: _executor.submit(store.query, query)
+                   for name, store in self._shards.items() if results[name] is None}
+        # The shards start together, so one wait bounds each of them
+        wait(futures.values(), timeout=self._shard_timeout)
+        for name, future in futures.items():
+            if not future.done():
+                results[name] = self._mark_overdue(name, future)
+            elif future.exception() is not None:
+                results[name] = future.exception()
+            else:
+                results[name] = future.result()
+        return self._merge(results)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = await self._embed_model.aget_agg_embedding_from_queries(
+                query_bundle.embedding_strs)
+        query = self._vector_query(query_bundle.embedding)
+
+        async def run(name: str, store: BasePydanticVectorStore):
+            overdue = self._still_overdue(name)
+            if overdue is not None:
+                raise overdue
+            future = _executor.submit(store.query, query)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), self._shard_timeout)
+            except asyncio.TimeoutError:
+                raise self._mark_overdue(name, future) from None
+
+        outcomes = await asyncio.gather(
+            *(run(name, store) for name, store in self._shards.items()), return_exceptions=True)
+        return self._merge(dict(zip(self._shards, outcomes)))
+
+    def _merge(self, results: dict) -> List[NodeWithScore]:
+        """Global top k of the shards that answered; raises if none did."""
+        hits, failures = [], {}
+        for name, result in results.items():
+            if isinstance(result, BaseException):
+                failures[name] = result
+                continue
+            hits.extend(NodeWithScore(node=node, score=score)
+                        for node, score in zip(result.nodes or [], result.similarities or []))
+        with self._lock:
+            self._stats.queries += 1
+            for name, error in failures.items():
+                counts = (self._stats.timeouts if isinstance(error, TimeoutError)
+                          else self._stats.errors)
+                counts[name] = counts.get(name, 0) + 1
+        for name, error in failures.items():
+            logger.warning("Shard %s left out of the query: %s", name, error)
+        if failures and len(failures) == len(results):
+            raise next(iter(failures.values()))
+        return heapq.nlargest(self._similarity_top_k, hits, key=lambda hit: hit.score or 0.0)